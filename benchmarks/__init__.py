@@ -0,0 +1,6 @@
+"""Offline performance benchmarks: ``python -m benchmarks``.
+
+Everything runs against ``FakeMediaServer`` on 127.0.0.1 through the stub
+``BenchIE`` extractor, so no network access is needed. Results go to a JSON
+file that ``--compare`` can diff against an earlier run.
+"""
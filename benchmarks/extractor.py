@@ -0,0 +1,29 @@
+"""yt-dlp extractor for ``FakeMediaServer`` URLs, so the real extraction path runs offline."""
+
+from yt_dlp.extractor import import_extractors
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.globals import extractors
+
+
+class BenchIE(InfoExtractor):
+    IE_NAME = "bench"
+    _VALID_URL = r"(?P<base>http://127\.0\.0\.1:\d+)/(?P<kind>watch|playlist)/(?P<id>[\w-]+)"
+
+    def _real_extract(self, url):
+        base, kind, item_id = self._match_valid_url(url).group("base", "kind", "id")
+        if kind == "playlist":
+            data = self._download_json(f"{base}/api/playlist/{item_id}", item_id)
+            entries = [self.url_result(f"{base}/watch/{e['id']}", BenchIE, e["id"], e["title"])
+                       for e in data["entries"]]
+            return self.playlist_result(entries, item_id, data["title"])
+
+        data = self._download_json(f"{base}/api/video/{item_id}", item_id)
+        formats = [{k: v for k, v in f.items() if k != "path"} for f in data["formats"]]
+        return {"id": item_id, "title": data["title"], "duration": data["duration"], "formats": formats}
+
+
+def register():
+    """Put BenchIE ahead of the generic extractor; YoutubeDL instances built afterwards use it."""
+    import_extractors()
+    if "BenchIE" not in extractors.value:
+        extractors.value = {"BenchIE": BenchIE, **extractors.value}
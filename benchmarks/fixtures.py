@@ -0,0 +1,94 @@
+"""Synthetic format lists and generated media files for the benchmarks."""
+
+import os
+import random
+import shutil
+import subprocess
+
+# (height, fps, H.264 / VP9 / AV1 video bitrates in kbps), roughly what YouTube offers
+VIDEO_LADDER = [
+    (144, 30, 80, 70, 60), (240, 30, 160, 140, 110), (360, 30, 350, 280, 230),
+    (480, 30, 700, 550, 420), (720, 30, 1400, 1100, 850), (720, 60, 2300, 1800, 1400),
+    (1080, 30, 2700, 2100, 1650), (1080, 60, 4300, 3300, 2600), (1440, 60, 0, 9000, 7000),
+    (2160, 60, 0, 18000, 14000),
+]
+VIDEO_CODECS = ("avc1.64001F", "vp09.00.40.08", "av01.0.08M.08")
+AUDIO_STREAMS = [("mp4a.40.5", "m4a", 48), ("mp4a.40.2", "m4a", 128), ("opus", "webm", 50),
+                 ("opus", "webm", 70), ("opus", "webm", 160)]
+
+
+def synthetic_formats(duration, languages=1, seed=0):
+    """A YouTube-like ``formats`` list: storyboards, audio per language, the video ladder, HLS.
+
+    One language gives ~45 formats, about what a typical video has; videos with
+    many dubbed audio tracks reach several hundred.
+    """
+    rng = random.Random(seed)
+    formats = [{"format_id": f"sb{i}", "ext": "mhtml", "vcodec": "none", "acodec": "none",
+                "protocol": "mhtml", "height": 27 * (i + 1)} for i in range(4)]
+
+    for lang in range(languages):
+        for n, (acodec, ext, abr) in enumerate(AUDIO_STREAMS):
+            fmt = {"format_id": f"{139 + n}-{lang}", "ext": ext, "vcodec": "none", "acodec": acodec,
+                   "abr": abr * rng.uniform(0.9, 1.1), "language": f"l{lang}", "protocol": "https"}
+            if rng.random() < 0.8:
+                fmt["filesize"] = int(fmt["abr"] * 125 * duration)
+            formats.append(fmt)
+
+    for height, fps, *bitrates in VIDEO_LADDER:
+        for vcodec, kbps in zip(VIDEO_CODECS, bitrates):
+            if not kbps:
+                continue
+            vbr = kbps * rng.uniform(0.85, 1.15)
+            fmt = {"format_id": f"{vcodec[:4]}-{height}p{fps}", "ext": "webm" if vcodec.startswith("vp09") else "mp4",
+                   "vcodec": vcodec, "acodec": "none", "height": height, "width": height * 16 // 9, "fps": fps,
+                   "protocol": "https"}
+            # Like YouTube, some streams only report tbr, some a size, some only an approximate size
+            roll = rng.random()
+            if roll < 0.5:
+                fmt["vbr"] = vbr
+                fmt["filesize"] = int(vbr * 125 * duration)
+            elif roll < 0.8:
+                fmt["tbr"] = vbr
+                fmt["filesize_approx"] = int(vbr * 125 * duration)
+            else:
+                fmt["tbr"] = vbr
+            formats.append(fmt)
+        if bitrates[0]:
+            formats.append({"format_id": f"hls-{height}p{fps}", "ext": "mp4", "vcodec": VIDEO_CODECS[0],
+                            "acodec": "mp4a.40.2", "height": height, "width": height * 16 // 9, "fps": fps,
+                            "tbr": bitrates[0] + 128, "protocol": "m3u8_native"})
+    return formats
+
+
+def write_random_file(path, size, seed=0):
+    """``size`` bytes of incompressible data, written in 4 MiB blocks."""
+    rng = random.Random(seed)
+    block = rng.randbytes(4 * 1024 * 1024)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[:remaining])
+            remaining -= len(block)
+    return path
+
+
+def find_ffmpeg(location=None):
+    """Path of the ffmpeg binary (``location`` may be the binary or its folder), or None."""
+    if location:
+        candidate = os.path.join(location, "ffmpeg") if os.path.isdir(location) else location
+        return candidate if os.path.isfile(candidate) else shutil.which(candidate)
+    return shutil.which("ffmpeg")
+
+
+def generate_av_pair(ffmpeg, media_dir, seconds):
+    """Encode a test-pattern video-only MP4 and a tone AAC M4A of ``seconds``; returns their names."""
+    video, audio = "merge-video.mp4", "merge-audio.m4a"
+    encoders = subprocess.run([ffmpeg, "-hide_banner", "-encoders"], capture_output=True, text=True).stdout
+    vcodec = ["-c:v", "libx264", "-preset", "ultrafast"] if "libx264" in encoders else ["-c:v", "mpeg4", "-q:v", "5"]
+    common = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y"]
+    subprocess.run([*common, "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={seconds}",
+                    *vcodec, "-an", os.path.join(media_dir, video)], check=True)
+    subprocess.run([*common, "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+                    "-c:a", "aac", "-b:a", "128k", "-vn", os.path.join(media_dir, audio)], check=True)
+    return video, audio
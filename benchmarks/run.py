@@ -0,0 +1,387 @@
+"""Benchmark cases and the command line that runs them and writes the results file."""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import yt_dlp
+
+from downloader.engine import DownloadEngine
+from downloader.formats import FormatIndex, PlaylistSummary
+from downloader.options import DEFAULT_WORKERS, DownloadOptions
+from downloader.pipeline import PipelinedYoutubeDL, deferred_job, run_postprocess
+from downloader.presets import ALL_RESOLUTIONS, BITRATE_MAP
+from downloader.progress import ProgressChannel
+
+from . import extractor
+from .fixtures import find_ffmpeg, generate_av_pair, synthetic_formats, write_random_file
+from .server import FakeMediaServer
+
+MB = 1024 * 1024
+HIGHER_IS_BETTER = {"MB/s"}
+CASES = ("estimate", "hook", "fetch", "single", "playlist", "renew", "merge")
+RENEW_SEGMENTS = 4  # the renew case's server throttles each URL after this share of the file
+
+
+class Results:
+    """Named measurements, written as ``{"meta": ..., "results": {name: {"value", "unit", ...}}}``."""
+
+    def __init__(self, meta):
+        self.meta = meta
+        self.values = {}
+
+    def add(self, name, value, unit, **extra):
+        self.values[name] = {"value": round(value, 4), "unit": unit, **extra}
+        detail = ", ".join(f"{k}={v}" for k, v in extra.items())
+        print(f"  {name:<40} {value:>12.4g} {unit}" + (f"  ({detail})" if detail else ""))
+
+    def add_samples(self, name, samples, unit, scale=1.0):
+        """Record the median of ``samples`` (seconds), scaled to ``unit``."""
+        scaled = [s * scale for s in samples]
+        self.add(name, statistics.median(scaled), unit, min=round(min(scaled), 4), n=len(scaled))
+
+    def skip(self, name, reason):
+        self.values[name] = {"value": None, "skipped": reason}
+        print(f"  {name:<40} skipped: {reason}")
+
+    def to_json(self):
+        return {"meta": self.meta, "results": self.values}
+
+
+def _timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+class _TimedChannel(ProgressChannel):
+    """Progress channel that counts yt-dlp callbacks and the time spent handling them."""
+
+    def __init__(self, is_audio=False):
+        super().__init__(is_audio)
+        self.calls = 0
+        self.seconds = 0.0
+
+    def stream_hook(self, d):
+        started = time.perf_counter()
+        super().stream_hook(d)
+        self.seconds += time.perf_counter() - started
+        self.calls += 1
+
+
+# ── CPU-only cases ───────────────────────────────────────────
+
+def bench_estimate(results, repeat):
+    """FormatIndex build (once per fetch) and the per-click estimate lookups of the GUI."""
+    duration = 600
+    for label, languages in (("typical", 1), ("dubbed", 12)):
+        formats = synthetic_formats(duration, languages)
+        samples = _timed(lambda: FormatIndex(formats, duration), repeat * 20)
+        results.add_samples(f"estimate.index_build.{label}", samples, "us", scale=1e6)
+    results.values["estimate.index_build.typical"]["formats"] = len(synthetic_formats(duration, 1))
+
+    index = FormatIndex(synthetic_formats(duration), duration)
+    keys = [(r, p) for r in ALL_RESOLUTIONS for p in BITRATE_MAP]
+    rounds = 2000
+    samples = _timed(lambda: [index.estimate(*key) for _ in range(rounds) for key in keys], repeat)
+    results.add_samples("estimate.lookup", samples, "ns", scale=1e9 / (rounds * len(keys)))
+
+    infos = [{"formats": synthetic_formats(duration, seed=n), "duration": duration} for n in range(50)]
+
+    def fold():
+        summary = PlaylistSummary("bench", len(infos))
+        for info in infos:
+            summary.add(info)
+
+    results.add_samples("estimate.playlist_add", _timed(fold, repeat), "us", scale=1e6 / len(infos))
+
+
+def bench_hook(results, repeat):
+    """Cost of one yt-dlp progress callback through the engine hook, and of draining it in the UI."""
+    calls = 100_000
+    info = {"id": "bench0", "title": "Bench video"}
+    events = [{"status": "downloading", "downloaded_bytes": n * 65536, "total_bytes": calls * 65536,
+               "speed": 12.5 * MB, "eta": calls - n, "elapsed": n / 100, "filename": "bench.mp4",
+               "tmpfilename": "bench.mp4.part", "info_dict": info} for n in range(calls)]
+    hook_samples, drain_samples = [], []
+    for _ in range(repeat):
+        channel = ProgressChannel()
+        channel.register("bench0", 1, "Bench video")
+        hook = DownloadEngine._progress_hook(channel, threading.Event())
+        started = time.perf_counter()
+        for d in events:
+            hook(d)
+        hook_samples.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        channel.snapshot()
+        drain_samples.append(time.perf_counter() - started)
+    results.add_samples("hook.callback", hook_samples, "ns", scale=1e9 / calls)
+    results.add_samples("hook.snapshot_per_event", drain_samples, "ns", scale=1e9 / calls)
+
+
+# ── Cases against the fake media server ──────────────────────
+
+def _progressive(path, size, height=720):
+    return {"format_id": f"prog-{height}", "path": path, "ext": "mp4", "vcodec": "avc1.64001F",
+            "acodec": "mp4a.40.2", "height": height, "width": height * 16 // 9, "filesize": size}
+
+
+def bench_fetch(results, server, repeat):
+    """Metadata fetch latency through the engine: cold (first on a new engine) and warm."""
+    duration = 600
+    formats = [_progressive("missing.bin", 0), *synthetic_formats(duration)]
+    for f in formats:
+        f.setdefault("path", "missing.bin")
+    urls = [server.add_video(f"fetch{n}", f"Fetch {n}", duration, formats) for n in range(max(repeat * 5, 20))]
+    playlist = server.add_playlist("fetchlist", "Fetch list", [f"fetch{n}" for n in range(20)])
+
+    engine = DownloadEngine()
+    try:
+        started = time.perf_counter()
+        engine.fetch_listing(urls[0])
+        results.add("fetch.cold", (time.perf_counter() - started) * 1e3, "ms")
+        samples = []
+        for url in urls[1:]:
+            started = time.perf_counter()
+            engine.fetch_listing(url)
+            samples.append(time.perf_counter() - started)
+        results.add_samples("fetch.warm", samples, "ms", scale=1e3)
+
+        def resolve_playlist():
+            listing = engine.fetch_listing(playlist)
+            engine.resolve_entries(listing["entries"], lambda *_: None)
+
+        results.add_samples("fetch.playlist_resolve_20", _timed(resolve_playlist, repeat), "ms", scale=1e3)
+    finally:
+        engine.close()
+
+
+def bench_single_stream(results, server, workdir, size_mb, repeat):
+    """One large progressive stream, over one connection and segmented."""
+    size = size_mb * MB
+    write_random_file(os.path.join(server.media_dir, "single.bin"), size)
+    url = server.add_video("single", "Single stream", 600, [_progressive("single.bin", size)])
+    out_dir = os.path.join(workdir, "single")
+    for connections in (1, 4):
+        samples, hook_share, hook_calls = [], [], 0
+        engine = DownloadEngine()
+        try:
+            for _ in range(repeat):
+                shutil.rmtree(out_dir, ignore_errors=True)
+                channel = _TimedChannel()
+                options = DownloadOptions(out_dir, connections=connections)
+                started = time.perf_counter()
+                engine.download(url, options, progress=channel)
+                elapsed = time.perf_counter() - started
+                samples.append(elapsed)
+                hook_share.append(channel.seconds / elapsed * 100)
+                hook_calls = channel.calls
+        finally:
+            engine.close()
+        rates = [size / MB / s for s in samples]
+        # Hook cost rides along as detail: as a share of wall time it is too small to compare on its own
+        results.add(f"throughput.single.c{connections}", statistics.median(rates), "MB/s",
+                    min=round(min(rates), 2), n=len(rates), callbacks=hook_calls,
+                    hook_share_pct=round(statistics.median(hook_share), 4))
+    shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def bench_playlist(results, server, workdir, videos, size_mb, repeat):
+    """A playlist of progressive streams on the engine's worker pool."""
+    size = size_mb * MB
+    write_random_file(os.path.join(server.media_dir, "entry.bin"), size, seed=1)
+    ids = [f"entry{n}" for n in range(videos)]
+    for n, video_id in enumerate(ids):
+        server.add_video(video_id, f"Entry {n}", 60, [_progressive("entry.bin", size)])
+    url = server.add_playlist("bench", "Bench playlist", ids)
+    out_dir = os.path.join(workdir, "playlist")
+    engine = DownloadEngine()
+    samples = []
+    try:
+        for _ in range(repeat):
+            shutil.rmtree(out_dir, ignore_errors=True)
+            started = time.perf_counter()
+            result = engine.download(url, DownloadOptions(out_dir, workers=DEFAULT_WORKERS))
+            samples.append(time.perf_counter() - started)
+            if result.failures:
+                raise RuntimeError(f"playlist benchmark failed: {result.failures[0]}")
+    finally:
+        engine.close()
+        shutil.rmtree(out_dir, ignore_errors=True)
+    rates = [videos * size / MB / s for s in samples]
+    results.add(f"throughput.playlist_{videos}x{size_mb}mb", statistics.median(rates), "MB/s",
+                min=round(min(rates), 2), n=len(rates), workers=DEFAULT_WORKERS)
+
+
+def bench_renew(results, workdir, size_mb, throttle):
+    """One stream from a server that throttles each URL partway through, so the engine must renew it.
+
+    Runs once per connection count: the time is dominated by how long a
+    slowdown takes to be detected, which doesn't vary between runs.
+    """
+    size = size_mb * MB
+    media_dir = os.path.join(workdir, "media")
+    write_random_file(os.path.join(media_dir, "renew.bin"), size, seed=2)
+    out_dir = os.path.join(workdir, "renew")
+    with FakeMediaServer(media_dir, throttle, throttle_after=size // RENEW_SEGMENTS) as server:
+        url = server.add_video("renew", "Renewed stream", 600, [_progressive("renew.bin", size)])
+        for connections in (1, 4):
+            shutil.rmtree(out_dir, ignore_errors=True)
+            engine = DownloadEngine()
+            try:
+                started = time.perf_counter()
+                result = engine.download(url, DownloadOptions(out_dir, connections=connections))
+                elapsed = time.perf_counter() - started
+            finally:
+                engine.close()
+            renewals = result.record["renewals"]
+            if not renewals:
+                raise RuntimeError("renew benchmark: the throttled URL was never renewed")
+            results.add(f"throughput.renew.c{connections}", size / MB / elapsed, "MB/s", renewals=renewals)
+    shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def bench_merge(results, server, workdir, ffmpeg, seconds, repeat):
+    """ffmpeg merge of separate video and audio streams, the job the post-processing pool runs."""
+    video, audio = generate_av_pair(ffmpeg, server.media_dir, seconds)
+    url = server.add_video("merge", "Merge", seconds, [
+        {"format_id": "v720", "path": video, "ext": "mp4", "vcodec": "avc1.64001F", "acodec": "none",
+         "height": 720, "width": 1280, "filesize": os.path.getsize(os.path.join(server.media_dir, video))},
+        {"format_id": "a128", "path": audio, "ext": "m4a", "vcodec": "none", "acodec": "mp4a.40.2", "abr": 128,
+         "filesize": os.path.getsize(os.path.join(server.media_dir, audio))},
+    ])
+    out_dir = os.path.join(workdir, "merge")
+    engine = DownloadEngine()
+    try:
+        opts = engine.build_opts(DownloadOptions(out_dir), lambda d: None)
+        opts.update(defer_postprocessing=True, ffmpeg_location=ffmpeg)
+        with PipelinedYoutubeDL(opts) as ydl:
+            job = deferred_job(ydl.extract_info(url, download=True))
+    finally:
+        engine.close()
+    if job is None:
+        raise RuntimeError("no merge job was produced; is ffmpeg usable?")
+    job["params"]["keepvideo"] = True  # keep the inputs so the merge can be repeated
+    results.add_samples(f"merge.{seconds}s_720p", _timed(lambda: run_postprocess(job), repeat), "s")
+    shutil.rmtree(out_dir, ignore_errors=True)
+
+
+# ── Command line ─────────────────────────────────────────────
+
+def _meta(args, ffmpeg):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "yt_dlp": yt_dlp.version.__version__,
+        "ffmpeg": ffmpeg,
+        "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+    }
+
+
+def compare(old, new, max_regression=None):
+    """Print old vs new for every shared measurement; return the names that regressed too far."""
+    regressed = []
+    print(f"\nCompared with {old['meta'].get('commit') or '?'} ({old['meta'].get('timestamp')}):")
+    for name, entry in new["results"].items():
+        before = old["results"].get(name, {}).get("value")
+        after = entry.get("value")
+        if not before or after is None:
+            continue
+        change = (after - before) / before * 100
+        worse = -change if entry["unit"] in HIGHER_IS_BETTER else change
+        flag = ""
+        if max_regression is not None and worse > max_regression:
+            flag = "  REGRESSION"
+            regressed.append(name)
+        print(f"  {name:<40} {before:>12.4g} -> {after:<12.4g} {entry['unit']:<5} {change:+6.1f}%{flag}")
+    return regressed
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Offline benchmarks: a local fake media server stands in for YouTube.",
+    )
+    parser.add_argument("-o", "--output", default="benchmark_results.json",
+                        help="results file (JSON, default: benchmark_results.json)")
+    parser.add_argument("--compare", metavar="OLD_JSON", help="print the change against an earlier results file")
+    parser.add_argument("--max-regression", type=float, metavar="PCT",
+                        help="with --compare, exit 1 if any measurement got worse by more than PCT percent")
+    parser.add_argument("--quick", action="store_true", help="small sizes and one repeat, for a smoke run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (default: 3)")
+    parser.add_argument("--size-mb", type=int, default=128, help="single-stream file size (default: 128)")
+    parser.add_argument("--playlist-videos", type=int, default=8, help="playlist length (default: 8)")
+    parser.add_argument("--playlist-mb", type=int, default=16, help="size of each playlist video (default: 16)")
+    parser.add_argument("--merge-seconds", type=int, default=60, help="length of the merged clip (default: 60)")
+    parser.add_argument("--throttle", type=float, metavar="MBIT",
+                        help="per-connection server rate in Mbit/s (default: unthrottled)")
+    parser.add_argument("--ffmpeg-location", help="ffmpeg binary or its folder (default: from PATH)")
+    parser.add_argument("--only", action="append", choices=CASES, help="run only these cases (repeatable)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.quick:
+        args.repeat, args.size_mb, args.playlist_videos, args.playlist_mb, args.merge_seconds = 1, 16, 4, 4, 10
+    cases = set(args.only or CASES)
+    ffmpeg = find_ffmpeg(args.ffmpeg_location)
+    results = Results(_meta(args, ffmpeg))
+    extractor.register()
+
+    if "estimate" in cases:
+        bench_estimate(results, args.repeat)
+    if "hook" in cases:
+        bench_hook(results, args.repeat)
+
+    throttle = args.throttle * 1_000_000 / 8 if args.throttle else None
+    with tempfile.TemporaryDirectory(prefix="ytdl-bench-") as workdir:
+        media_dir = os.path.join(workdir, "media")
+        os.makedirs(media_dir)
+        with FakeMediaServer(media_dir, throttle) as server:
+            if "fetch" in cases:
+                bench_fetch(results, server, args.repeat)
+            if "single" in cases:
+                bench_single_stream(results, server, workdir, args.size_mb, args.repeat)
+            if "playlist" in cases:
+                bench_playlist(results, server, workdir, args.playlist_videos, args.playlist_mb, args.repeat)
+            if "renew" in cases:
+                bench_renew(results, workdir, args.size_mb, throttle)
+            if "merge" in cases:
+                if ffmpeg:
+                    bench_merge(results, server, workdir, ffmpeg, args.merge_seconds, args.repeat)
+                else:
+                    results.skip("merge", "ffmpeg not found")
+
+    data = results.to_json()
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressed = compare(json.load(f), data, args.max_regression)
+        if regressed:
+            print(f"{len(regressed)} measurement(s) regressed by more than {args.max_regression:g}%", file=sys.stderr)
+            return 1
+    return 0
@@ -0,0 +1,189 @@
+"""Local HTTP server standing in for YouTube: JSON metadata plus media files with Range support.
+
+``/api/video/<id>`` and ``/api/playlist/<id>`` return the JSON the stub
+extractor turns into info dicts; ``/media/<name>`` serves files from the
+media directory, honouring ``Range`` and pacing every response to
+``throttle`` bytes/s per connection (None = as fast as loopback goes).
+
+Like a CDN's signed URLs, every ``/api/video`` response gives the media
+URLs a fresh ``sig`` parameter. With ``throttle_after``, a signature that
+has served that many bytes (over all its connections) is throttled: the
+rest of its responses are paced to ``throttled_rate`` bytes/s, until the
+client fetches the metadata again and moves on to a new signature.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote
+
+CHUNK_SIZE = 64 * 1024
+_RANGE = re.compile(r"bytes=(\d+)-(\d*)$")
+
+
+class FakeMediaServer:
+    """Serves registered videos/playlists and the files in ``media_dir`` on 127.0.0.1."""
+
+    def __init__(self, media_dir, throttle=None, throttle_after=None, throttled_rate=64 * 1024):
+        self.media_dir = media_dir
+        self.throttle = throttle
+        self.throttle_after = throttle_after  # bytes one signature serves before it is throttled
+        self.throttled_rate = throttled_rate
+        self.videos = {}  # id -> JSON-able info (formats' "path" become absolute URLs)
+        self.playlists = {}  # id -> (title, [video ids])
+        self.requests = 0
+        self.signatures = 0  # media URL signatures handed out
+        self._served = {}  # signature -> bytes served under it
+        self._served_lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_video(self, video_id, title, duration, formats):
+        """Register a video; each format's ``path`` is a file name under ``media_dir``."""
+        self.videos[video_id] = {"id": video_id, "title": title, "duration": duration, "formats": formats}
+        return f"{self.base_url}/watch/{video_id}"
+
+    def add_playlist(self, playlist_id, title, video_ids):
+        self.playlists[playlist_id] = (title, list(video_ids))
+        return f"{self.base_url}/playlist/{playlist_id}"
+
+    def sign(self):
+        with self._served_lock:
+            self.signatures += 1
+            return str(self.signatures)
+
+    def serve(self, signature, nbytes):
+        """Count ``nbytes`` sent under ``signature``; True once the signature is throttled."""
+        with self._served_lock:
+            served = self._served[signature] = self._served.get(signature, 0) + nbytes
+        return self.throttle_after is not None and served > self.throttle_after
+
+    def start(self):
+        server = self
+
+        class Handler(_Handler):
+            owner = server
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True, name="fake-media-server")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    owner = None  # the FakeMediaServer, set on a per-server subclass
+    protocol_version = "HTTP/1.1"  # keep-alive, like a CDN
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.owner.requests += 1
+        path, _, query = self.path.partition("?")
+        kind, _, name = unquote(path).lstrip("/").partition("/")
+        if kind == "api":
+            self._send_api(name)
+        elif kind == "media" and "/" not in name and name:
+            self._send_file(os.path.join(self.owner.media_dir, name), parse_qs(query).get("sig", [""])[0])
+        else:
+            self._send_error(404)
+
+    def _send_error(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _send_api(self, name):
+        kind, _, item_id = name.partition("/")
+        if kind == "video" and item_id in self.owner.videos:
+            video = self.owner.videos[item_id]
+            signature = self.owner.sign()
+            formats = [{**f, "url": f"{self.owner.base_url}/media/{f['path']}?sig={signature}"}
+                       for f in video["formats"]]
+            payload = {**video, "formats": formats}
+        elif kind == "playlist" and item_id in self.owner.playlists:
+            title, ids = self.owner.playlists[item_id]
+            payload = {"id": item_id, "title": title,
+                       "entries": [{"id": i, "title": self.owner.videos[i]["title"]} for i in ids]}
+        else:
+            return self._send_error(404)
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_file(self, path, signature):
+        if not os.path.isfile(path):
+            return self._send_error(404)
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = _RANGE.match(self.headers.get("Range", ""))
+        if match:
+            start = int(match[1])
+            end = min(int(match[2]) if match[2] else size - 1, size - 1)
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                return self.end_headers()
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", f'"{size:x}-{int(os.path.getmtime(path)):x}"')
+        self.end_headers()
+
+        throttle = self.owner.throttle
+        remaining = end - start + 1
+        sent = 0
+        began = time.monotonic()
+        throttled_sent, throttled_since = 0, None
+        try:
+            with open(path, "rb") as f:
+                f.seek(start)
+                while remaining > 0:
+                    block = f.read(min(CHUNK_SIZE, remaining))
+                    if not block:
+                        break
+                    self.wfile.write(block)
+                    remaining -= len(block)
+                    sent += len(block)
+                    if throttle:
+                        ahead = sent / throttle - (time.monotonic() - began)
+                        if ahead > 0:
+                            time.sleep(ahead)
+                    if self.owner.serve(signature, len(block)):
+                        if throttled_since is None:
+                            throttled_since = time.monotonic()
+                        throttled_sent += len(block)
+                        ahead = throttled_sent / self.owner.throttled_rate - (time.monotonic() - throttled_since)
+                        if ahead > 0:
+                            time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # the client gave up on the range (e.g. cancel)
@@ -0,0 +1,5 @@
+"""Download engine behind the YouTube Downloader GUI and batch mode.
+
+Nothing in this package imports tkinter or customtkinter; the GUI lives in
+``downloader.gui`` and is only imported when the window is launched.
+"""
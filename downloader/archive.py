@@ -0,0 +1,93 @@
+"""Index of completed downloads, used to skip unchanged videos on repeat syncs."""
+
+import os
+import sqlite3
+import threading
+import time
+
+from .cache import app_data_dir
+
+
+class DownloadArchive:
+    """SQLite index of finished downloads, keyed by (video ID, variant, output folder).
+
+    ``variant`` identifies what was asked for (mode, resolution, preset or
+    audio format), so changing the quality of a mirrored playlist counts as a
+    change and downloads again. A record only counts as complete while the
+    file it points to still exists with the recorded size.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS downloads ("
+                " video_id TEXT NOT NULL,"
+                " variant TEXT NOT NULL,"
+                " output_dir TEXT NOT NULL,"
+                " format_id TEXT,"
+                " path TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " completed_at REAL NOT NULL,"
+                " PRIMARY KEY (video_id, variant, output_dir))"
+            )
+
+    @staticmethod
+    def _normalize_dir(output_dir):
+        return os.path.normcase(os.path.abspath(output_dir))
+
+    def lookup(self, video_id, variant, output_dir):
+        """Return the archived record as a dict, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT format_id, path, size, completed_at FROM downloads"
+                " WHERE video_id = ? AND variant = ? AND output_dir = ?",
+                (video_id, variant, self._normalize_dir(output_dir)),
+            ).fetchone()
+        if row is None:
+            return None
+        format_id, path, size, completed_at = row
+        return {"format_id": format_id, "path": path, "size": size, "completed_at": completed_at}
+
+    def is_complete(self, video_id, variant, output_dir):
+        """True if the video was downloaded with this variant and the file is still intact."""
+        if not video_id:
+            return False
+        record = self.lookup(video_id, variant, output_dir)
+        if record is None:
+            return False
+        try:
+            return os.path.getsize(record["path"]) == record["size"]
+        except OSError:
+            return False
+
+    def record(self, video_id, variant, output_dir, format_id, path, size):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads"
+                " (video_id, variant, output_dir, format_id, path, size, completed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (video_id, variant, self._normalize_dir(output_dir), format_id, path, size, time.time()),
+            )
+
+    def forget(self, video_id, variant, output_dir):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM downloads WHERE video_id = ? AND variant = ? AND output_dir = ?",
+                (video_id, variant, self._normalize_dir(output_dir)),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_default_archive():
+    """Open the per-user archive, or return None if it can't be created."""
+    path = os.path.join(app_data_dir(), "archive.sqlite3")
+    try:
+        return DownloadArchive(path)
+    except (OSError, sqlite3.Error):
+        return None  # without an archive every run downloads everything
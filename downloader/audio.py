@@ -0,0 +1,135 @@
+"""Audio mode conversion: stream copy when the source codec fits the target, transcode otherwise.
+
+``AudioExtractPP`` replaces yt-dlp's FFmpegExtractAudio for the formats the
+app offers. yt-dlp only copies when the codec name equals the target (so
+Opus into OGG is re-encoded); here every codec the target container can
+hold is copied as is. The path taken and the time spent end up in the
+info dict under ``audio_conversion`` for the UI to report.
+"""
+
+import os
+import tempfile
+import time
+
+from yt_dlp.globals import postprocessors
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.postprocessor.ffmpeg import ACODECS, FFmpegExtractAudioPP
+from yt_dlp.utils import PostProcessingError, prepend_extension, replace_extension
+
+from .library import link_or_copy
+
+# Target format -> source codecs (as ffprobe names them) its container holds without re-encoding
+COPY_CODECS = {
+    "mp3": ("mp3",),
+    "m4a": ("aac", "alac"),
+    "ogg": ("opus", "vorbis"),
+    "flac": ("flac",),
+    "wav": ("pcm_s16le", "pcm_s24le", "pcm_s32le", "pcm_f32le"),
+}
+
+# Target format -> yt-dlp ACODECS entry used when a transcode can't be avoided
+TRANSCODE_CODECS = {"mp3": "mp3", "m4a": "m4a", "ogg": "vorbis", "flac": "flac", "wav": "wav"}
+
+COPY, TRANSCODE = "copy", "transcode"
+
+
+class AudioExtractPP(FFmpegExtractAudioPP):
+    """Extract the audio track to ``preferredcodec``, copying the stream whenever possible."""
+
+    def __init__(self, downloader=None, preferredcodec="mp3", preferredquality=None, nopostoverwrites=False):
+        super().__init__(downloader, TRANSCODE_CODECS[preferredcodec], preferredquality, nopostoverwrites)
+        self.target = preferredcodec
+
+    @PostProcessor._restrict_to(images=False)
+    def run(self, information):
+        started = time.perf_counter()
+        path = information["filepath"]
+        filecodec = self.get_audio_codec(path)
+        if filecodec is None:
+            raise PostProcessingError("unable to obtain file audio codec with ffprobe")
+
+        if filecodec in COPY_CODECS[self.target]:
+            method, acodec = COPY, "copy"
+            extension = self.target
+            # ADTS AAC needs its headers rewritten to go into an MP4 container
+            more_opts = ["-bsf:a", "aac_adtstoasc"] if filecodec == "aac" else []
+        else:
+            method = TRANSCODE
+            extension, acodec, codec_opts = ACODECS[TRANSCODE_CODECS[self.target]]
+            # Formats without an encoder name (WAV) are selected by their options instead
+            more_opts = self._quality_args(acodec) if acodec else list(codec_opts)
+            if acodec == "aac" and self._features.get("fdk"):
+                acodec, more_opts = "libfdk_aac", []
+
+        orig_path = path
+        new_path = replace_extension(path, extension, information["ext"])
+        # Never written in place: a cancelled run must not truncate an output an earlier run finished
+        temp_path = prepend_extension(new_path, "temp")
+        if new_path == path:
+            if method == COPY:
+                self.to_screen(f"Not converting audio {path}; file is already in target format {self.target}")
+                information["audio_conversion"] = self._report(COPY, filecodec, started)
+                return [], information
+            orig_path = prepend_extension(path, "orig")
+
+        self.to_screen(f"Destination: {new_path} ({'stream copy' if method == COPY else 'transcode'} from {filecodec})")
+        self.run_ffmpeg(path, temp_path, acodec, more_opts)
+
+        os.replace(path, orig_path)
+        os.replace(temp_path, new_path)
+        information["filepath"] = new_path
+        information["ext"] = extension
+        if information.get("filetime") is not None:
+            self.try_utime(new_path, time.time(), information["filetime"], errnote="Cannot update utime of audio file")
+        information["audio_conversion"] = self._report(method, filecodec, started)
+        return [orig_path], information
+
+    def _report(self, method, source_codec, started):
+        return {"method": method, "source_codec": source_codec, "target": self.target,
+                "seconds": round(time.perf_counter() - started, 3)}
+
+
+def derive_audio(ydl, source, info):
+    """Produce ``info``'s audio file from ``source``, a local video of the same video, without downloading.
+
+    ``info`` is the format-selected info dict of the audio request; the
+    AudioExtract options come from ``ydl``'s params, so the result is what
+    a download would have produced (stream copy when the codec fits). The
+    source is linked into a scratch folder first: extraction deletes its
+    input, which must never be the library's own file. Returns the info
+    dict of the new file.
+    """
+    options = next(pp for pp in ydl.params["postprocessors"] if pp["key"] == "AudioExtract")
+    pp = AudioExtractPP(ydl, **{k: v for k, v in options.items() if k != "key"})
+    target = replace_extension(ydl.prepare_filename(info), pp.target, info.get("ext"))
+    source_ext = os.path.splitext(source)[1][1:]
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # In the output folder, so linking and the final rename stay on one filesystem
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(target), prefix=".derive-") as scratch:
+        work = os.path.join(scratch, f"source.{source_ext}")
+        link_or_copy(source, work)
+        _, result = pp.run({**info, "filepath": work, "ext": source_ext})
+        os.replace(result["filepath"], target)
+    result["filepath"] = target
+    return result
+
+
+def conversion_of(info):
+    """The ``audio_conversion`` record of a processed info dict, or None."""
+    downloads = (info or {}).get("requested_downloads") or [info or {}]
+    return downloads[0].get("audio_conversion")
+
+
+def describe_conversions(conversions):
+    """Summarize [(method, seconds)] as e.g. "2 stream-copied (0.8 s), 1 transcoded (12.4 s)"."""
+    parts = []
+    for method, label in ((COPY, "stream-copied"), (TRANSCODE, "transcoded")):
+        times = [seconds for m, seconds in conversions if m == method]
+        if times:
+            parts.append(f"{len(times)} {label} ({sum(times):.1f} s)")
+    return ", ".join(parts)
+
+
+# Registered under the key presets.format_options uses, so YoutubeDL (also in
+# post-processing pool processes) can build it from the "postprocessors" param
+postprocessors.value["AudioExtractPP"] = AudioExtractPP
@@ -0,0 +1,277 @@
+"""Global bandwidth limit shared by every download the app runs.
+
+One ``BandwidthLimiter`` (a token bucket) is shared by all jobs and all of
+their connections. Each job gets a ``JobMeter`` that takes tokens for every
+block it reads and keeps a short sliding window of its own throughput, so
+concurrent jobs can be compared. Tokens go to the job that has been granted
+the least so far, so a job with eight connections doesn't starve one with a
+single connection; a job that doesn't use its share leaves it to the others.
+The limit can change at any time, including from an optional time-of-day
+``BandwidthSchedule``; waiting connections pick up the new rate within
+``MAX_WAIT`` seconds without being restarted.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+BURST_SECONDS = 0.5  # bucket capacity, in seconds of the current rate
+MIN_BURST = 256 * 1024
+MAX_WAIT = 0.2  # longest single sleep, so rate changes and cancels apply quickly
+SCHEDULE_CHECK_INTERVAL = 1.0
+RATE_WINDOW = 2.0  # seconds of history behind JobMeter.rate
+
+
+def mbit_to_bytes(mbit):
+    """Mbit/s (what links are sold in) to bytes/s; None stays unlimited."""
+    return None if mbit is None else mbit * 1_000_000 / 8
+
+
+def format_limit(bytes_per_sec):
+    if bytes_per_sec is None:
+        return "Unlimited"
+    return f"{bytes_per_sec * 8 / 1_000_000:g} Mbit/s"
+
+
+def _parse_clock(text):
+    """Minutes since midnight for "HH:MM" or "HH" (00:00 to 24:00)."""
+    hours, colon, minutes = text.strip().partition(":")
+    if not colon:
+        minutes = "0"
+    if not (hours.isdigit() and minutes.isdigit() and len(minutes) <= 2):
+        raise ValueError(f"invalid time {text!r}")
+    value = int(hours) * 60 + int(minutes)
+    if int(minutes) > 59 or value > 24 * 60:
+        raise ValueError(f"invalid time {text!r}")
+    return value
+
+
+def parse_mbit(text):
+    """Parse a limit in Mbit/s; ``off``/``unlimited`` give None."""
+    text = text.strip().lower()
+    if text in ("off", "unlimited", "none", ""):
+        return None
+    value = float(text)
+    if not math.isfinite(value) or value <= 0:  # a NaN rate would never refill the bucket
+        raise ValueError(f"rate must be a positive number, got {text!r}")
+    return value
+
+
+class BandwidthSchedule:
+    """Time-of-day windows, each with its own limit; outside them the manual limit applies.
+
+    Written as ``"08:00-18:00=20, 18:00-08:00=off"`` (Mbit/s, or ``off`` for
+    unlimited). Windows may wrap past midnight; the first matching one wins.
+    """
+
+    def __init__(self, windows=()):
+        self.windows = list(windows)  # [(start_minute, end_minute, bytes_per_sec or None)]
+
+    @classmethod
+    def parse(cls, text):
+        windows = []
+        for part in text.replace(";", ",").split(","):
+            if not part.strip():
+                continue
+            span, sep, rate = part.partition("=")
+            start, dash, end = span.partition("-")
+            if not sep or not dash:
+                raise ValueError(f"expected HH:MM-HH:MM=Mbit/s, got {part.strip()!r}")
+            windows.append((_parse_clock(start), _parse_clock(end), mbit_to_bytes(parse_mbit(rate))))
+        return cls(windows)
+
+    def __str__(self):
+        def clock(minutes):
+            return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+        def mbit(rate):
+            return "off" if rate is None else f"{rate * 8 / 1_000_000:g}"
+
+        return ", ".join(f"{clock(s)}-{clock(e)}={mbit(r)}" for s, e, r in self.windows)
+
+    def window_at(self, when=None):
+        """Return the (start, end, rate) window covering ``when`` (default: now), or None."""
+        when = when or datetime.now()
+        minute = when.hour * 60 + when.minute
+        for window in self.windows:
+            start, end, _ = window
+            if start <= end:
+                if start <= minute < end:
+                    return window
+            elif minute >= start or minute < end:  # wraps past midnight
+                return window
+        return None
+
+
+class BandwidthLimiter:
+    """Token bucket shared by every connection of every download.
+
+    ``rate`` is the manual limit in bytes/s (None = unlimited). While a
+    schedule window is active its rate is used instead.
+    """
+
+    def __init__(self, rate=None, schedule=None):
+        self._lock = threading.Lock()
+        self._rate = rate
+        self._schedule = schedule
+        self._effective = rate
+        self._scheduled = False
+        self._rate_checked = 0.0
+        self._tokens = 0.0
+        self._last_refill = time.monotonic()
+        self._meters = []
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def set_rate(self, rate):
+        """Change the manual limit; running downloads slow down or speed up right away."""
+        with self._lock:
+            self._rate = rate
+            self._rate_checked = 0.0
+
+    @property
+    def schedule(self):
+        return self._schedule
+
+    def set_schedule(self, schedule):
+        with self._lock:
+            self._schedule = schedule
+            self._rate_checked = 0.0
+
+    def effective_rate(self):
+        """(bytes/s or None, True if it comes from a schedule window)."""
+        with self._lock:
+            return self._current_rate(time.monotonic()), self._scheduled
+
+    def _current_rate(self, now):
+        if now - self._rate_checked >= SCHEDULE_CHECK_INTERVAL:
+            window = self._schedule.window_at() if self._schedule else None
+            self._scheduled = window is not None
+            self._effective = window[2] if window is not None else self._rate
+            self._rate_checked = now
+        return self._effective
+
+    def consume(self, nbytes, cancel_event=None, meter=None):
+        """Block until ``nbytes`` may be transferred; returns early if ``cancel_event`` is set."""
+        waiting = False
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    rate = self._current_rate(now)
+                    if rate is None:
+                        self._tokens = 0.0
+                        self._last_refill = now
+                        return
+                    capacity = max(rate * BURST_SECONDS, MIN_BURST)
+                    self._tokens = min(capacity, self._tokens + (now - self._last_refill) * rate)
+                    self._last_refill = now
+                    if meter is not None and not waiting:
+                        waiting = True
+                        if not meter._waiting:
+                            self._catch_up_limit(meter, 2 * capacity)
+                        meter._waiting += 1
+                    # Blocks bigger than the bucket go through once it is full and leave a debt
+                    needed = min(nbytes, capacity)
+                    if self._tokens >= needed and not self._behind(meter, capacity):
+                        self._tokens -= nbytes
+                        if meter is not None:
+                            meter._granted += nbytes
+                        return
+                    wait = min(max(needed - self._tokens, needed) / rate, MAX_WAIT)
+                if cancel_event is not None:
+                    if cancel_event.wait(wait):
+                        return
+                else:
+                    time.sleep(wait)
+        finally:
+            if waiting:
+                with self._lock:
+                    meter._waiting -= 1
+
+    def _catch_up_limit(self, meter, slack):
+        """Keep a job that was idle within ``slack`` bytes of the others, so it can't hog the link."""
+        others = [m._granted for m in self._meters if m is not meter and m._waiting]
+        if others:
+            meter._granted = max(meter._granted, min(others) - slack)
+
+    def _behind(self, meter, quantum):
+        """True if another waiting job has been granted less than ``meter``'s job (by over a quantum)."""
+        if meter is None:
+            return False
+        return any(other._waiting and other._granted + quantum < meter._granted
+                   for other in self._meters if other is not meter)
+
+    @property
+    def limited(self):
+        return self.effective_rate()[0] is not None
+
+    # ── Per-job accounting ────────────────────────────────────
+
+    def meter(self, label, cancel_event=None):
+        """Register a job; every block it transfers goes through the returned meter."""
+        meter = JobMeter(self, label, cancel_event)
+        with self._lock:
+            # Start level with the running jobs, so a new job shares instead of catching up
+            meter._granted = min((m._granted for m in self._meters), default=0)
+            self._meters.append(meter)
+        return meter
+
+    def _unregister(self, meter):
+        with self._lock:
+            if meter in self._meters:
+                self._meters.remove(meter)
+
+    def job_rates(self):
+        """[(label, bytes/s over the last RATE_WINDOW seconds)] for the running jobs."""
+        with self._lock:
+            meters = list(self._meters)
+        return [(m.label, m.rate()) for m in meters]
+
+
+class JobMeter:
+    """One job's handle on the shared limiter, measuring the job's own throughput."""
+
+    def __init__(self, limiter, label, cancel_event=None):
+        self.limiter = limiter
+        self.label = label
+        self.cancel_event = cancel_event
+        self._lock = threading.Lock()
+        self._history = deque()  # (monotonic time, bytes)
+        self._started = time.monotonic()
+        self._granted = 0  # bytes the limiter has let through; guarded by the limiter's lock
+        self._waiting = 0  # connections of this job blocked in consume()
+
+    @property
+    def limited(self):
+        return self.limiter.limited
+
+    def consume(self, nbytes):
+        if nbytes <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._history.append((now, nbytes))
+            self._trim(now)
+        self.limiter.consume(nbytes, self.cancel_event, self)
+
+    def _trim(self, now):
+        history = self._history
+        cutoff = now - RATE_WINDOW
+        while history and history[0][0] < cutoff:
+            history.popleft()
+
+    def rate(self):
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            total = sum(n for _, n in self._history)
+        # A job younger than the window is averaged over its own lifetime
+        return total / max(min(RATE_WINDOW, now - self._started), 0.1)
+
+    def close(self):
+        self.limiter._unregister(self)
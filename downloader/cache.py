@@ -0,0 +1,122 @@
+"""Persistent metadata cache for extracted video info."""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Entries expire after DEFAULT_TTL seconds and are LRU-evicted past DEFAULT_MAX_BYTES
+DEFAULT_TTL = 6 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def app_data_dir():
+    """Per-user directory for caches and indexes (LOCALAPPDATA on Windows)."""
+    base = (os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+            or os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "YouTubeDownloader")
+
+
+class MetadataCache:
+    """On-disk cache of extracted video info, keyed by video ID.
+
+    Entries expire after ``ttl`` seconds, and the least recently used ones are
+    evicted once the stored JSON exceeds ``max_bytes``. Format URLs are signed
+    and expire on their own schedule, so callers that need downloadable URLs
+    pass ``require_fresh_urls=True`` to treat those entries as misses.
+    """
+
+    URL_EXPIRY_MARGIN = 600  # seconds of headroom before a signed URL counts as stale
+
+    def __init__(self, path, ttl, max_bytes):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                " video_id TEXT PRIMARY KEY,"
+                " info TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " fetched_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " urls_expire_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed_at)")
+
+    def get(self, video_id, require_fresh_urls=False):
+        if not video_id:
+            return None
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT info, fetched_at, urls_expire_at FROM metadata WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            info, fetched_at, urls_expire_at = row
+            if now - fetched_at > self.ttl:
+                self._conn.execute("DELETE FROM metadata WHERE video_id = ?", (video_id,))
+                return None
+            if require_fresh_urls and urls_expire_at is not None and urls_expire_at - self.URL_EXPIRY_MARGIN <= now:
+                return None
+            self._conn.execute("UPDATE metadata SET accessed_at = ? WHERE video_id = ?", (now, video_id))
+        return json.loads(info)
+
+    def put(self, info):
+        """Store a sanitized (JSON-serializable) info dict."""
+        video_id = info.get("id")
+        if not video_id:
+            return
+        data = json.dumps(info, separators=(",", ":"))
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata (video_id, info, size, fetched_at, accessed_at, urls_expire_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, data, len(data), now, now, self._signed_url_expiry(info)),
+            )
+            self._evict_locked()
+
+    def invalidate(self, video_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM metadata WHERE video_id = ?", (video_id,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _evict_locked(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM metadata").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT video_id, size FROM metadata ORDER BY accessed_at").fetchall()
+        for video_id, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM metadata WHERE video_id = ?", (video_id,))
+            total -= size
+
+    @staticmethod
+    def _signed_url_expiry(info):
+        """Earliest ``expire=`` timestamp across the format URLs, or None if unsigned."""
+        expiries = []
+        for f in info.get("formats") or []:
+            for key in ("url", "manifest_url"):
+                match = re.search(r"[?&/]expire[=/](\d+)", f.get(key) or "")
+                if match:
+                    expiries.append(int(match.group(1)))
+        return min(expiries) if expiries else None
+
+
+def open_default_cache():
+    """Open the per-user cache, or return None if it can't be created."""
+    path = os.path.join(app_data_dir(), "metadata.sqlite3")
+    try:
+        return MetadataCache(path, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES)
+    except (OSError, sqlite3.Error):
+        return None  # caching is an optimization; run without it
@@ -0,0 +1,192 @@
+"""Per-job cancellation that reaches every phase of a download.
+
+A ``CancelToken`` is a job's cancel flag. It is a ``threading.Event``, so
+the bandwidth limiter, disk budget and pipeline keep waiting on it as
+before, but setting it also runs the stop functions registered by what the
+job has in flight: ffmpeg processes are terminated, segmented downloads
+close their connections and post-processing on the process pool is told to
+stop. Code running for a job finds its token through ``current()``, set
+with ``scope()`` on each thread that works for the job.
+
+``PartialFiles`` remembers the streams each video of a job downloads, so a
+cancelled job can remove its ``.part`` files, segment state, intermediate
+streams and half-written outputs; an output that was already there before
+the job (a finished file from an earlier run) is kept. A token cancelled with
+``keep_partial=True`` (the app or daemon shutting down while the job stays
+queued) leaves them for the next attempt to resume.
+
+No yt-dlp imports here: the job queue uses tokens without loading it.
+"""
+
+import glob
+import os
+import threading
+from contextlib import contextmanager
+
+WATCH_POLL = 0.1  # seconds between checks of a condition a token follows (see ``watch``)
+
+# Suffixes of the temporary files yt-dlp and SegmentedDownload keep next to a stream
+TEMP_SUFFIXES = (".part", ".part.segments.json", ".part.segments.json.tmp", ".ytdl")
+
+_local = threading.local()
+
+
+class CancelToken(threading.Event):
+    """An Event that stops the job's in-flight work when it is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.keep_partial = False
+        self._lock = threading.Lock()
+        self._stops = {}  # key -> stop function
+        self._next_key = 0
+
+    def cancel(self, keep_partial=False):
+        """Cancel the job; with ``keep_partial`` its partial downloads stay on disk to be resumed."""
+        self.keep_partial = keep_partial
+        self.set()
+
+    def set(self):
+        super().set()
+        with self._lock:
+            stops = list(self._stops.values())
+            self._stops.clear()
+        for stop in stops:
+            try:
+                stop()
+            except Exception:
+                pass  # e.g. the process exited meanwhile; one failure mustn't keep the others running
+
+    def on_cancel(self, stop):
+        """Call ``stop()`` when the token is set (now, if it already is); returns a function that unregisters it."""
+        with self._lock:
+            if not self.is_set():
+                key = self._next_key
+                self._next_key += 1
+                self._stops[key] = stop
+                return lambda: self._unregister(key)
+        stop()
+        return lambda: None
+
+    def _unregister(self, key):
+        with self._lock:
+            self._stops.pop(key, None)
+
+
+def current():
+    """The CancelToken of the job this thread works for, or None."""
+    return getattr(_local, "token", None)
+
+
+@contextmanager
+def scope(token):
+    """Make ``token`` the current thread's token for the duration of the block."""
+    previous = current()
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+@contextmanager
+def stopping(stop):
+    """Call ``stop()`` if the current thread's job is cancelled during the block."""
+    token = current()
+    unregister = token.on_cancel(stop) if token is not None else None
+    try:
+        yield
+    finally:
+        if unregister is not None:
+            unregister()
+
+
+@contextmanager
+def watch(condition):
+    """A CancelToken that is cancelled once ``condition()`` is true, checked every WATCH_POLL seconds."""
+    token = CancelToken()
+    done = threading.Event()
+
+    def follow():
+        while not done.wait(WATCH_POLL):
+            if condition():
+                token.cancel()
+                return
+
+    threading.Thread(target=follow, daemon=True, name="cancel-watch").start()
+    try:
+        yield token
+    finally:
+        done.set()
+
+
+@contextmanager
+def linked(event):
+    """``event`` itself if it is a CancelToken, else a token that follows the plain Event."""
+    if isinstance(event, CancelToken):
+        yield event
+    else:
+        with watch(event.is_set) as token:
+            yield token
+
+
+def outputs(path, extensions=()):
+    """The finished files of a stream downloaded to ``path``: itself and what post-processing derives from it.
+
+    ``extensions`` are the ones post-processing gives the output (Audio
+    mode's format), written next to the stream as ``name.<ext>``.
+    """
+    base = os.path.splitext(path)[0]
+    return [path, *(f"{base}.{extension}" for extension in extensions)]
+
+
+def leftovers(path, extensions=()):
+    """Files a stream downloaded to ``path`` may have left: its ``outputs``, temporary and intermediate files."""
+    base, ext = os.path.splitext(path)
+    paths = [*outputs(path, extensions), *(path + suffix for suffix in TEMP_SUFFIXES),
+             f"{base}.temp{ext}", f"{base}.orig{ext}", *(f"{base}.temp.{extension}" for extension in extensions)]
+    return paths + glob.glob(glob.escape(path) + ".part-Frag*")
+
+
+class PartialFiles:
+    """Files the unfinished videos of a job are writing, by video ID; thread-safe."""
+
+    def __init__(self, extensions=()):
+        self.extensions = tuple(extensions)
+        self._lock = threading.Lock()
+        self._paths = {}  # video ID -> stream and output paths
+        self._seen = set()  # outputs whose existence was checked when first added
+        self._kept = set()  # outputs that existed then: not this job's to delete
+
+    def add(self, video_id, path):
+        """Track ``path``; call it before anything is written there, so earlier outputs are told apart."""
+        with self._lock:
+            self._paths.setdefault(video_id, set()).add(path)
+            for output in outputs(path, self.extensions):
+                if output not in self._seen:
+                    self._seen.add(output)
+                    if os.path.exists(output):
+                        self._kept.add(output)
+
+    def finished(self, video_id):
+        """The video is done: its files are kept."""
+        with self._lock:
+            self._paths.pop(video_id, None)
+
+    def remove(self):
+        """Delete what the unfinished videos left on disk; returns the number of files removed."""
+        with self._lock:
+            paths = set().union(*self._paths.values()) if self._paths else set()
+            self._paths.clear()
+            kept = set(self._kept)
+        removed = 0
+        for path in sorted(paths):
+            for leftover in leftovers(path, self.extensions):
+                if leftover in kept:
+                    continue
+                try:
+                    os.remove(leftover)
+                except OSError:
+                    continue  # not there, or still open elsewhere (Windows)
+                removed += 1
+        return removed
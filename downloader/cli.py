@@ -0,0 +1,249 @@
+"""Headless batch mode: ``python -m youtube_downloader batch urls.txt``."""
+
+import argparse
+import os
+import shutil
+import sys
+import threading
+
+from .archive import open_default_archive
+from .bandwidth import BandwidthLimiter, BandwidthSchedule, mbit_to_bytes, parse_mbit
+from .cache import open_default_cache
+from .cancel import CancelToken
+from .deadline import parse_deadline
+from .diskspace import DEFAULT_RESERVE, DiskBudget, InsufficientSpace
+from .library import open_default_library
+from .metrics import describe_phases, open_default_history
+from .presets import ALL_RESOLUTIONS, AUDIO_FORMATS, BITRATE_MAP
+from .progress import ProgressChannel, format_progress
+from .renewal import DEFAULT_RENEW_BELOW
+from .timerange import TIME_FORMAT_HINT, parse_time, validate_range
+
+
+def read_urls(path):
+    """Read one URL per line, skipping blank lines and ``#`` comments. ``-`` reads stdin."""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with stream:
+        lines = [line.strip() for line in stream]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def _limit_arg(text):
+    try:
+        return parse_mbit(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _time_arg(text):
+    try:
+        return parse_time(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _deadline_arg(text):
+    try:
+        return parse_deadline(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _fraction_arg(text):
+    try:
+        value = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a number: {text!r}")
+    if not 0 <= value < 1:
+        raise argparse.ArgumentTypeError(f"must be from 0 up to 1, got {text!r}")
+    return value
+
+
+def _schedule_arg(text):
+    try:
+        return BandwidthSchedule.parse(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="youtube_downloader batch",
+        description="Download every video or playlist URL listed in a file, without the GUI.",
+    )
+    parser.add_argument("url_file", help="text file with one URL per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", default=".", help="output folder (default: current directory)")
+    parser.add_argument("--mode", choices=["video", "audio"], default="video")
+    parser.add_argument("--quality", type=int, choices=ALL_RESOLUTIONS, default=1080,
+                        help="maximum video height (default: 1080)")
+    parser.add_argument("--preset", choices=list(BITRATE_MAP), default="Best",
+                        help="video bitrate preset (default: Best)")
+    parser.add_argument("--audio-format", choices=AUDIO_FORMATS, default="mp3",
+                        help="audio mode output format (default: mp3)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="playlist videos downloaded at once (default: 3)")
+    parser.add_argument("--connections", type=int, default=None,
+                        help="parallel range requests per stream; 1 disables segmenting (default: 4)")
+    parser.add_argument("--limit", type=_limit_arg, default=None, metavar="MBIT",
+                        help="total bandwidth limit in Mbit/s across all downloads, or 'off' (default: off)")
+    parser.add_argument("--schedule", type=_schedule_arg, default=None, metavar="SPEC",
+                        help="time-of-day limits overriding --limit, e.g. '08:00-18:00=20,18:00-08:00=off'")
+    parser.add_argument("--start", type=_time_arg, default=None, metavar="TIME",
+                        help=f"download each video from TIME on ({TIME_FORMAT_HINT}; default: the beginning)")
+    parser.add_argument("--end", type=_time_arg, default=None, metavar="TIME",
+                        help="download each video up to TIME (default: the end)")
+    parser.add_argument("--deadline", type=_deadline_arg, default=None, metavar="TIME",
+                        help="video mode: lower each URL's resolution/preset as needed to finish by TIME "
+                             "('HH:MM' or 'YYYY-MM-DD HH:MM'); --quality and --preset are the ceiling")
+    parser.add_argument("--renew-below", type=_fraction_arg, default=DEFAULT_RENEW_BELOW, metavar="FRACTION",
+                        help="resolve a stream's URL again and reconnect when its speed stays below FRACTION of "
+                             f"what it reached before; 0 never does (default: {DEFAULT_RENEW_BELOW:g})")
+    parser.add_argument("--force", action="store_true",
+                        help="download again even if the archive says a video is up to date")
+    parser.add_argument("--no-cache", action="store_true", help="don't read or write the metadata cache")
+    parser.add_argument("--no-library", action="store_true",
+                        help="always download, even if the same file already exists in another folder")
+    parser.add_argument("--min-free", type=float, default=DEFAULT_RESERVE / 1_073_741_824, metavar="GB",
+                        help="free space to leave on the output drive; videos that don't fit wait or fail "
+                             "(default: 0.5)")
+    parser.add_argument("--metrics-textfile", metavar="PATH",
+                        help="keep Prometheus metrics in PATH (a .prom file for node_exporter's textfile collector)")
+    return parser
+
+
+class _ProgressPrinter:
+    """Redraws a single progress line on a terminal from a background thread; silent otherwise."""
+
+    INTERVAL = 0.2  # seconds between redraws
+
+    def __init__(self, stream, audio_format):
+        self._stream = stream
+        self._audio_format = audio_format
+        self._enabled = stream.isatty()
+        self._stop = threading.Event()
+        self._thread = None
+        self._channel = None
+
+    def start(self, channel):
+        self._channel = channel
+        if not self._enabled:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._stream.write("\r" + " " * (shutil.get_terminal_size().columns - 1) + "\r")
+            self._stream.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.INTERVAL):
+            snapshot = self._channel.snapshot()
+            if snapshot is None:
+                continue
+            status_text, speed_text = format_progress(snapshot, self._audio_format)
+            width = shutil.get_terminal_size().columns - 1
+            line = f"{status_text}  |  {speed_text}"[:width]
+            self._stream.write("\r" + line.ljust(width))
+            self._stream.flush()
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        validate_range(args.start, args.end)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        import yt_dlp
+    except ImportError:
+        print("yt-dlp is not installed.\n\nPlease run:\n  pip install yt-dlp", file=sys.stderr)
+        return 1
+    from .engine import DEFAULT_CONNECTIONS, DEFAULT_WORKERS, DownloadEngine, DownloadOptions
+
+    try:
+        urls = read_urls(args.url_file)
+    except OSError as e:
+        print(f"Cannot read URL list: {e}", file=sys.stderr)
+        return 1
+    if not urls:
+        print("No URLs to download.", file=sys.stderr)
+        return 1
+
+    options = DownloadOptions(
+        output_dir=args.output,
+        mode=args.mode.capitalize(),
+        quality=args.quality,
+        preset=args.preset,
+        audio_format=args.audio_format,
+        workers=max(1, args.workers or DEFAULT_WORKERS),
+        connections=max(1, args.connections or DEFAULT_CONNECTIONS),
+        force_refresh=args.force,
+        clip_start=args.start,
+        clip_end=args.end,
+        deadline=args.deadline,
+        renew_below=args.renew_below,
+    )
+    try:
+        os.makedirs(options.output_dir, exist_ok=True)
+    except OSError as e:
+        print(f"Cannot create folder {options.output_dir}: {e}", file=sys.stderr)
+        return 1
+
+    printer = _ProgressPrinter(sys.stderr, options.audio_format)
+    cache = None if args.no_cache else open_default_cache()
+    archive = open_default_archive()
+    library = None if args.no_library else open_default_library()
+    limiter = BandwidthLimiter(mbit_to_bytes(args.limit), args.schedule)
+    history = open_default_history(args.metrics_textfile)
+    engine = DownloadEngine(metadata_cache=cache, archive=archive, limiter=limiter, history=history,
+                            library=library, disk_budget=DiskBudget(int(args.min_free * 1_073_741_824)))
+    cancel_event = CancelToken()
+    failed = 0
+    try:
+        for number, url in enumerate(urls, start=1):
+            print(f"[{number}/{len(urls)}] {url}", file=sys.stderr)
+            channel = ProgressChannel(options.is_audio)
+            printer.start(channel)
+            try:
+                result = engine.download(url, options, cancel_event, channel)
+            except yt_dlp.utils.DownloadCancelled:
+                raise  # handled below: stops the whole batch
+            except Exception as e:
+                printer.stop()
+                # Anything else (a disk error, a server without Range support...) fails this URL only
+                expected = isinstance(e, (yt_dlp.utils.DownloadError, InsufficientSpace))
+                print(f"  failed: {e}" if expected else f"  failed: {type(e).__name__}: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            printer.stop()
+            for title, error in result.failures:
+                print(f"  failed: {title}: {error}", file=sys.stderr)
+            print(f"  done: {result.summary()}", file=sys.stderr)
+            if result.audio_summary():
+                print(f"  audio: {result.audio_summary()}", file=sys.stderr)
+            if result.metrics:
+                print(f"  timing: {describe_phases(result.metrics.record())}", file=sys.stderr)
+            if result.failures:
+                failed += 1
+    except (KeyboardInterrupt, yt_dlp.utils.DownloadCancelled):
+        cancel_event.cancel(keep_partial=True)  # a rerun resumes the partial files
+        printer.stop()
+        print("Cancelled.", file=sys.stderr)
+        return 130
+    finally:
+        engine.close()
+        if cache:
+            cache.close()
+        if archive:
+            archive.close()
+        if library:
+            library.close()
+
+    return 1 if failed else 0
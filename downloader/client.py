@@ -0,0 +1,394 @@
+"""Client of daemon mode: the desktop app's queue, runner and engine, backed by a daemon's API.
+
+``python youtube_downloader.py --connect http://host:8765`` starts the
+window with these in place of the local JobQueue, QueueRunner,
+DownloadEngine, BandwidthLimiter and MetricsHistory, so the GUI code
+reads the same either way. One background thread follows the daemon's
+``/events`` stream and keeps local copies of the job list and the
+bandwidth state, so the UI thread never waits on the network to redraw;
+only the user's own actions (queue, retry, fetch...) are requests. The
+daemon's token is read from ``YTDL_DAEMON_TOKEN``, or from the file a
+daemon run by the same user saved it in.
+
+Nothing here imports yt-dlp: a client machine only needs the GUI stack.
+"""
+
+import dataclasses
+import json
+import threading
+import urllib.error
+import urllib.request
+
+from .jobqueue import CANCELLED, DONE, PENDING, RUNNING, QueuedJob
+from .progress import ProgressSnapshot
+
+REQUEST_TIMEOUT = 30.0  # seconds; /fetch extracts on the daemon and can take a while
+EVENTS_TIMEOUT = 60.0  # seconds without a line (the daemon pings every 15) before reconnecting
+RECONNECT_DELAYS = (1.0, 2.0, 5.0, 10.0)  # seconds before each attempt to reconnect /events
+
+
+class DaemonError(OSError):
+    """A request to the daemon failed: unreachable, or answered with an error."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class DaemonClient:
+    """JSON requests to one daemon."""
+
+    def __init__(self, base_url, token=None):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+
+    def _open(self, method, path, body=None, timeout=REQUEST_TIMEOUT):
+        if body is None and method in ("POST", "PUT"):
+            body = {}  # the daemon takes only JSON bodies on these
+        data = None if body is None else json.dumps(body).encode()
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            request.add_header("Content-Type", "application/json")
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        try:
+            return urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error") or e.reason
+            except (ValueError, AttributeError, OSError):
+                message = e.reason
+            raise DaemonError(str(message), e.code) from None
+        except (urllib.error.URLError, OSError) as e:
+            reason = getattr(e, "reason", e)
+            raise DaemonError(f"Cannot reach the download daemon at {self.base_url}: {reason}") from None
+
+    def request(self, method, path, body=None):
+        with self._open(method, path, body) as response:
+            try:
+                return json.loads(response.read())
+            except (ValueError, OSError) as e:
+                raise DaemonError(f"Bad response from the download daemon: {e}") from None
+
+    def stream(self, method, path, body=None, timeout=REQUEST_TIMEOUT):
+        """The open response of a line-by-line endpoint; iterate ``read_lines`` over it and close it."""
+        return self._open(method, path, body, timeout)
+
+
+def read_lines(response):
+    """Decoded JSON objects from a streaming response, until the daemon closes it."""
+    for line in response:
+        if line.strip():
+            yield json.loads(line)
+
+
+class RemoteResult:
+    """The parts of a DownloadResult the window shows, rebuilt from ``DownloadResult.to_dict``."""
+
+    def __init__(self, data):
+        self.total = data.get("total", 0)
+        self.skipped = data.get("skipped", 0)
+        self.failures = [tuple(f) for f in data.get("failures") or []]
+        self.reused = data.get("reused") or []
+        self.record = data.get("record")
+        self._summary = data.get("summary", "")
+        self._audio_summary = data.get("audio_summary", "")
+
+    @property
+    def downloaded(self):
+        return self.total - self.skipped - len(self.failures)
+
+    def summary(self):
+        return self._summary
+
+    def audio_summary(self):
+        return self._audio_summary
+
+
+class RemoteProgress:
+    """ProgressChannel stand-in: the latest snapshot the daemon sent for one job."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest = None
+
+    def update(self, fields):
+        snapshot = ProgressSnapshot(**{k: v for k, v in fields.items() if k in ProgressSnapshot._fields})
+        with self._lock:
+            self._latest = snapshot
+
+    def snapshot(self):
+        """The snapshot received since the last call, or None if nothing new arrived."""
+        with self._lock:
+            snapshot, self._latest = self._latest, None
+        return snapshot
+
+
+class RemoteQueue:
+    """JobQueue stand-in: reads come from the copy the event stream keeps; changes are requests."""
+
+    _ORDER = {RUNNING: 0, PENDING: 1}
+
+    def __init__(self, client):
+        self.client = client
+        self.mine = set()  # IDs of jobs queued from this window; only these drive its progress bar
+        self._lock = threading.Lock()
+        self._jobs = {}  # ID -> QueuedJob
+
+    def store(self, data):
+        """Record a job as the daemon sent it; returns the QueuedJob."""
+        job = QueuedJob.from_dict(data)
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def replace_all(self, jobs):
+        with self._lock:
+            self._jobs = {job.id: job for job in map(QueuedJob.from_dict, jobs)}
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def add(self, url, options):
+        job = self.store(self.client.request("POST", "/jobs", {"url": url, "options": dataclasses.asdict(options)}))
+        with self._lock:
+            self.mine.add(job.id)
+        return job
+
+    def retry(self, job_id):
+        return self.store(self.client.request("POST", f"/jobs/{job_id}/retry"))
+
+    def cancel(self, job_id):
+        return self.store(self.client.request("POST", f"/jobs/{job_id}/cancel"))
+
+    def remove(self, job_id):
+        self.client.request("DELETE", f"/jobs/{job_id}")
+        self.forget(job_id)
+
+    def clear_finished(self):
+        self.client.request("POST", "/jobs/clear")
+        with self._lock:
+            self._jobs = {job_id: job for job_id, job in self._jobs.items() if job.state != DONE}
+
+    def jobs(self, limit=200):
+        """Running and pending jobs (in run order), then the rest, most recently updated first."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        jobs.sort(key=lambda job: (self._ORDER.get(job.state, 2),
+                                   job.next_attempt_at if job.state == PENDING else -job.updated_at, job.id))
+        return jobs[:limit]
+
+    def counts(self):
+        counts = {}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.state] = counts.get(job.state, 0) + 1
+        return counts
+
+    def close(self):
+        pass
+
+
+class RemoteLimiter:
+    """BandwidthLimiter stand-in showing the daemon's limit; changes are sent off the UI thread."""
+
+    def __init__(self, client):
+        self.client = client
+        self._state = {"rate": None, "scheduled": False, "jobs": []}
+
+    def update(self, state):
+        self._state = state
+
+    def effective_rate(self):
+        state = self._state
+        return state.get("rate"), state.get("scheduled", False)
+
+    def job_rates(self):
+        return [tuple(entry) for entry in self._state.get("jobs") or []]
+
+    def set_rate(self, rate):
+        self._send({"rate": rate})
+
+    def set_schedule(self, schedule):
+        self._send({"schedule": str(schedule) if schedule else None})
+
+    def _send(self, body):
+        def send():
+            try:
+                self.update(self.client.request("PUT", "/bandwidth", body))
+            except DaemonError:
+                pass  # the label keeps showing the daemon's actual limit
+
+        threading.Thread(target=send, daemon=True, name="bandwidth-update").start()
+
+
+class RemoteHistory:
+    """MetricsHistory stand-in reading the daemon's job history."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def recent(self, limit=50):
+        return self.client.request("GET", f"/history?limit={int(limit)}")
+
+
+class RemoteEngine:
+    """DownloadEngine stand-in for Fetch: metadata is extracted on the daemon."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def warm_up(self):
+        pass
+
+    def close(self):
+        pass
+
+    def fetch_listing(self, url):
+        return self.client.request("POST", "/fetch", {"url": url})
+
+    def resolve_entries(self, entries, on_resolved, cancel_event=None, workers=None):
+        """Stream per-entry info from the daemon; ``on_resolved`` is called on this thread as each arrives."""
+        response = self.client.stream("POST", "/resolve", {"entries": entries})
+        with response:
+            for line in read_lines(response):
+                if cancel_event is not None and cancel_event.is_set():
+                    return  # closing the connection stops the daemon's resolving too
+                error = line.get("error")
+                on_resolved(line["index"], line.get("info"), DaemonError(error) if error else None)
+
+
+class RemoteRunner:
+    """QueueRunner stand-in: follows the daemon's ``/events`` stream on a background thread.
+
+    ``on_start(job, channel)`` and ``on_finish(job, result)`` are called
+    for jobs queued from this window, one job at a time like a local runner
+    with one slot: if two of them run at once on the daemon, the second is
+    shown when the first finishes. ``on_connection(error)`` is called with
+    None when the stream (re)connects and with the DaemonError when it is
+    lost; ``on_jobs_changed()`` after any job changed.
+    """
+
+    def __init__(self, client, job_queue, limiter, on_start=None, on_finish=None, on_connection=None,
+                 on_jobs_changed=None):
+        self.client = client
+        self.queue = job_queue
+        self.limiter = limiter
+        self.on_start = on_start
+        self.on_finish = on_finish
+        self.on_connection = on_connection
+        self.on_jobs_changed = on_jobs_changed
+        self._shown = None  # (job ID, RemoteProgress) of the job on the progress bar
+        self._response = None
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def current(self):
+        shown = self._shown
+        return self.queue.get(shown[0]) if shown else None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="daemon-events")
+            self._thread.start()
+
+    def wake(self):
+        pass  # the daemon starts queued jobs itself
+
+    def cancel(self, job_id):
+        return self.queue.cancel(job_id)
+
+    def cancel_current(self):
+        shown = self._shown
+        if shown:
+            self.queue.cancel(shown[0])
+
+    def stop(self, timeout=None):
+        """Stop following the daemon; its jobs keep running there.
+
+        Doesn't wait for the event thread: it may sit in a read until the next
+        ping, and it has nothing to save.
+        """
+        self._stopping.set()
+        response = self._response
+        if response is not None:
+            try:
+                response.close()
+            except OSError:
+                pass
+
+    def _run(self):
+        failures = 0
+        while not self._stopping.is_set():
+            try:
+                self._response = self.client.stream("GET", "/events", timeout=EVENTS_TIMEOUT)
+                failures = 0
+                if self.on_connection:
+                    self.on_connection(None)
+                with self._response:
+                    for event in read_lines(self._response):
+                        self._handle(event)
+            except (DaemonError, OSError, ValueError) as e:
+                if self._stopping.is_set():
+                    return
+                if self.on_connection:
+                    self.on_connection(e if isinstance(e, DaemonError) else DaemonError(str(e)))
+            finally:
+                self._response = None
+            delay = RECONNECT_DELAYS[min(failures, len(RECONNECT_DELAYS) - 1)]
+            failures += 1
+            self._stopping.wait(delay)
+
+    def _handle(self, event):
+        kind = event.get("event")
+        if kind == "progress":
+            if self._shown is None and event.get("job_id") in self.queue.mine:
+                self._follow_own_jobs()  # it started before the request queuing it had returned
+            shown = self._shown
+            if shown and shown[0] == event.get("job_id"):
+                shown[1].update(event["snapshot"])
+            return
+        if kind == "bandwidth":
+            self.limiter.update(event)
+            return
+        if kind == "ping":
+            return
+        if kind == "jobs":
+            self.queue.replace_all(event["jobs"])
+        elif kind == "removed":
+            self.queue.forget(event["job_id"])
+        elif kind in ("job", "started", "finished"):
+            job = self.queue.store(event["job"])
+            if kind == "finished" and self._shown and self._shown[0] == job.id:
+                self._finish_shown(job, RemoteResult(event["result"]) if event.get("result") else None)
+        self._follow_own_jobs()
+        if self.on_jobs_changed:
+            self.on_jobs_changed()
+
+    def _finish_shown(self, job, result):
+        self._shown = None
+        if self.on_finish:
+            self.on_finish(job, result)
+
+    def _follow_own_jobs(self):
+        """Show one of this window's running jobs; report the shown one if it ended while disconnected."""
+        if self._shown:
+            job = self.queue.get(self._shown[0])
+            if job is not None and job.state == RUNNING:
+                return
+            if job is None:
+                job = QueuedJob(self._shown[0], "", None, CANCELLED, 0, 0, 0.0)
+            self._finish_shown(job, None)
+        running = [job for job in self.queue.jobs() if job.state == RUNNING and job.id in self.queue.mine]
+        if running:
+            channel = RemoteProgress()
+            self._shown = (running[0].id, channel)
+            if self.on_start:
+                self.on_start(running[0], channel)
+
@@ -0,0 +1,673 @@
+"""Daemon mode: one shared download engine behind a small HTTP/JSON API.
+
+    python -m youtube_downloader daemon [--port 8765] [--jobs 2]
+
+Every client (the desktop app started with ``--connect``, scripts, curl)
+submits to the same persistent JobQueue. One QueueRunner runs at most
+``--jobs`` of them at a time against the shared bandwidth limit, disk
+budget, archive and library, so another user is another client, not
+another downloader competing for the link.
+
+    GET    /status                  job counts and the runner's size
+    GET    /jobs                    running and waiting jobs, then finished ones
+    POST   /jobs                    {"url": ..., "options": {DownloadOptions fields}} -> the queued job
+    GET    /jobs/<id>
+    POST   /jobs/<id>/cancel        interrupt a running job, or withdraw a waiting one
+    POST   /jobs/<id>/retry         run a failed or cancelled job again now
+    DELETE /jobs/<id>
+    POST   /jobs/clear              remove finished jobs
+    POST   /fetch                   {"url": ...} -> a video's info, or a playlist's flat listing
+    POST   /resolve                 {"entries": [...]} -> one {"index", "info" or "error"} line per entry
+    GET    /events                  job changes, progress and bandwidth, one JSON object per line
+    GET    /bandwidth               the limit in force and each running job's rate
+    PUT    /bandwidth               {"rate": bytes/s or null, "schedule": "08:00-18:00=20" or null}
+    GET    /history?limit=N         the most recent job records
+
+``/events`` starts with a ``jobs`` event listing every job, then sends
+``job`` (changed), ``removed``, ``started``, ``finished`` (with the
+DownloadResult), ``progress`` (a ProgressSnapshot of a running job),
+``bandwidth`` and, when idle, ``ping`` events. A client that falls
+``EVENT_BACKLOG`` events behind is disconnected and reconnects for a fresh
+``jobs`` list.
+
+Any web page open in the user's browser can send requests to 127.0.0.1,
+so nothing is trusted for coming from there. Every request needs the token
+as ``Authorization: Bearer <token>`` (``--token`` or ``YTDL_DAEMON_TOKEN``;
+without one the daemon makes one and saves it in the app data folder, where
+clients of the same user find it). Requests with an ``Origin`` header (sent
+by browsers) or with a Host name the daemon doesn't listen on (DNS
+rebinding) are refused, request bodies must be ``application/json``, and
+downloads stay inside ``--root`` (the user's Downloads folder) unless the
+daemon was started with ``--any-folder``.
+"""
+
+import argparse
+import hmac
+import ipaddress
+import json
+import math
+import os
+import queue
+import secrets
+import signal
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .archive import open_default_archive
+from .bandwidth import BandwidthLimiter, BandwidthSchedule, mbit_to_bytes, parse_mbit
+from .cache import app_data_dir, open_default_cache
+from .diskspace import DEFAULT_RESERVE, DiskBudget
+from .jobqueue import PENDING, QueueRunner, open_default_queue, options_from_dict
+from .library import open_default_library
+from .metrics import open_default_history
+from .presets import ALL_RESOLUTIONS, AUDIO_FORMATS, BITRATE_MAP
+from .timerange import validate_range
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_JOBS = 2  # jobs downloading at once, whichever clients queued them
+MAX_WORKERS = 8  # per-job playlist workers and per-stream connections a client may ask for
+TOKEN_ENV = "YTDL_DAEMON_TOKEN"
+TOKEN_FILE = "daemon-token"  # in the app data folder, readable by its user only
+DEFAULT_ROOT = os.path.join(os.path.expanduser("~"), "Downloads")
+PUMP_INTERVAL = 0.25  # seconds between progress snapshots of the running jobs
+PING_INTERVAL = 15.0  # seconds of silence on /events before a ping
+EVENT_BACKLOG = 1000  # unsent events per /events client before it is dropped
+MAX_BODY = 16 * 1_048_576  # request body limit; /resolve bodies list a whole playlist
+HISTORY_LIMIT = 100
+
+
+class ApiError(Exception):
+    """An error answered with ``status`` and ``{"error": message}``."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def token_path():
+    return os.path.join(app_data_dir(), TOKEN_FILE)
+
+
+def read_token():
+    """The token from ``YTDL_DAEMON_TOKEN``, else the one a daemon of this user saved; None if neither."""
+    token = os.environ.get(TOKEN_ENV)
+    if token:
+        return token
+    try:
+        with open(token_path(), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def create_token():
+    """A new random token, saved where ``read_token`` finds it. Raises OSError if it can't be saved."""
+    token = secrets.token_urlsafe(32)
+    path = token_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+        f.write(token + "\n")
+    return token
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value):
+    """A finite int or float; JSON as Python reads it also has true/false, NaN and Infinity."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def parse_options(data, root=None):
+    """DownloadOptions from a client's JSON, checked like the GUI and batch mode check theirs.
+
+    With a ``root``, ``output_dir`` is taken relative to it and may not leave
+    it; otherwise it must be absolute. Raises ValueError.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("options must be an object")
+    if not isinstance(data.get("output_dir"), str) or not data["output_dir"]:
+        raise ValueError("options.output_dir is required")
+    options = options_from_dict(data)
+    if root is not None:
+        root = os.path.realpath(root)
+        output_dir = os.path.realpath(os.path.join(root, options.output_dir))
+        if os.path.commonpath([root, output_dir]) != root:
+            raise ValueError(f"output_dir must be inside {root}")
+        options.output_dir = output_dir
+    elif not os.path.isabs(options.output_dir):
+        raise ValueError("output_dir must be an absolute path")
+    if options.mode not in ("Video", "Audio"):
+        raise ValueError("mode must be 'Video' or 'Audio'")
+    if not _is_int(options.quality) or options.quality not in ALL_RESOLUTIONS:
+        raise ValueError(f"quality must be one of {', '.join(map(str, ALL_RESOLUTIONS))}")
+    if options.preset not in BITRATE_MAP:
+        raise ValueError(f"preset must be one of {', '.join(BITRATE_MAP)}")
+    if options.audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"audio_format must be one of {', '.join(AUDIO_FORMATS)}")
+    for name in ("workers", "connections"):
+        value = getattr(options, name)
+        if not _is_int(value) or not 1 <= value <= MAX_WORKERS:
+            raise ValueError(f"{name} must be an integer from 1 to {MAX_WORKERS}")
+    for name in ("clip_start", "clip_end", "deadline"):
+        value = getattr(options, name)
+        if value is not None and (not _is_number(value) or value < 0):
+            raise ValueError(f"{name} must be a non-negative number of seconds")
+    if not _is_number(options.renew_below) or not 0 <= options.renew_below < 1:
+        raise ValueError("renew_below must be a number from 0 (never renew) up to 1")
+    if options.format_selection is not None and not isinstance(options.format_selection, str):
+        raise ValueError("format_selection must be a string")
+    options.force_refresh = bool(options.force_refresh)
+    validate_range(options.clip_start, options.clip_end)
+    return options
+
+
+class EventHub:
+    """Fans events out to every ``/events`` client; publishing never blocks on a slow one."""
+
+    def __init__(self, backlog=EVENT_BACKLOG):
+        self.backlog = backlog
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self):
+        """A queue of encoded event lines; None in it means the client fell behind and must reconnect."""
+        subscriber = queue.Queue(self.backlog)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event):
+        line = json.dumps(event, separators=(",", ":")).encode() + b"\n"
+        with self._lock:
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.put_nowait(line)
+                except queue.Full:
+                    # Missed events can't be replayed: drop what is queued and have it start over
+                    self._subscribers.discard(subscriber)
+                    with subscriber.mutex:
+                        subscriber.queue.clear()
+                    subscriber.put_nowait(None)
+
+
+class DownloadService:
+    """The engine, queue and runner shared by every API client."""
+
+    def __init__(self, engine, job_queue, limiter, history=None, jobs=DEFAULT_JOBS, root=None):
+        self.engine = engine
+        self.queue = job_queue
+        self.limiter = limiter
+        self.history = history
+        self.root = root
+        self.hub = EventHub()
+        self.runner = QueueRunner(job_queue, engine, on_start=self._on_start, on_finish=self._on_finish, jobs=jobs)
+        self._channels = {}  # running job ID -> ProgressChannel, drained only by the pump thread
+        self._channels_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._pump = threading.Thread(target=self._pump_progress, daemon=True, name="progress-pump")
+
+    def start(self):
+        self.runner.start()
+        self._pump.start()
+
+    def close(self, timeout=None):
+        """Stop the runner (running jobs go back to the queue) and the progress pump."""
+        self._stop.set()
+        self.runner.stop(timeout)
+
+    # ── Jobs ──────────────────────────────────────────────────
+
+    def submit(self, url, options):
+        if not isinstance(url, str) or not url.strip():
+            raise ValueError("url is required")
+        job = self.queue.add(url.strip(), parse_options(options, self.root))
+        self._publish_job(job)
+        self.runner.wake()
+        return job
+
+    def job(self, job_id):
+        job = self.queue.get(job_id)
+        if job is None:
+            raise ApiError(404, f"No job {job_id}")
+        return job
+
+    def cancel(self, job_id):
+        self.job(job_id)
+        job = self.runner.cancel(job_id)
+        self._publish_job(job)  # a running job is reported again when it has stopped
+        return job
+
+    def retry(self, job_id):
+        self.job(job_id)
+        job = self.queue.retry(job_id)
+        self._publish_job(job)
+        self.runner.wake()
+        return job
+
+    def remove(self, job_id):
+        self.job(job_id)
+        self.queue.remove(job_id)
+        if self.queue.get(job_id) is not None:
+            raise ApiError(409, "A running job can't be removed; cancel it first")
+        self.hub.publish({"event": "removed", "job_id": job_id})
+
+    def clear_finished(self):
+        self.queue.clear_finished()
+        self.hub.publish({"event": "jobs", "jobs": [job.to_dict() for job in self.queue.jobs()]})
+
+    def status(self):
+        return {"counts": self.queue.counts(), "running": [job.id for job in self.runner.running()],
+                "jobs": self.runner.jobs}
+
+    def _publish_job(self, job):
+        self.hub.publish({"event": "job", "job": job.to_dict()})
+
+    # ── Runner callbacks (runner threads) ─────────────────────
+
+    def _on_start(self, job, channel):
+        with self._channels_lock:
+            self._channels[job.id] = channel
+        self.hub.publish({"event": "started", "job": job.to_dict()})
+
+    def _on_finish(self, job, result):
+        with self._channels_lock:
+            self._channels.pop(job.id, None)
+        self.hub.publish({"event": "finished", "job": job.to_dict(),
+                          "result": result.to_dict() if result is not None else None})
+
+    # ── Progress and bandwidth (pump thread) ──────────────────
+
+    def bandwidth(self):
+        rate, scheduled = self.limiter.effective_rate()
+        schedule = self.limiter.schedule
+        return {"rate": rate, "scheduled": scheduled, "schedule": str(schedule) if schedule else None,
+                "jobs": [[label, round(job_rate)] for label, job_rate in self.limiter.job_rates()]}
+
+    def set_bandwidth(self, data):
+        if not isinstance(data, dict):
+            raise ValueError("expected an object")
+        if "rate" in data:
+            rate = data["rate"]
+            if rate is not None and (not _is_number(rate) or rate <= 0):
+                raise ValueError("rate must be a positive number of bytes/s, or null")
+            self.limiter.set_rate(rate)
+        if "schedule" in data:
+            text = data["schedule"]
+            self.limiter.set_schedule(BandwidthSchedule.parse(text) if text else None)
+        state = self.bandwidth()
+        self.hub.publish({"event": "bandwidth", **state})
+        return state
+
+    def _pump_progress(self):
+        """Snapshot every running job's channel once per interval; the single consumer of each."""
+        last_bandwidth = None
+        while not self._stop.wait(PUMP_INTERVAL):
+            with self._channels_lock:
+                channels = list(self._channels.items())
+            for job_id, channel in channels:
+                snapshot = channel.snapshot()
+                if snapshot is not None:
+                    self.hub.publish({"event": "progress", "job_id": job_id, "snapshot": snapshot._asdict()})
+            bandwidth = self.bandwidth()
+            if bandwidth != last_bandwidth:
+                last_bandwidth = bandwidth
+                self.hub.publish({"event": "bandwidth", **bandwidth})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None  # the DownloadService, set on a per-server subclass
+    token = None
+    listen_host = DEFAULT_HOST
+    protocol_version = "HTTP/1.1"
+    server_version = "youtube-downloader"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            self._check_request(method)
+            status, payload = self._route(method, parts, parse_qs(url.query))
+        except ApiError as e:
+            status, payload = e.status, {"error": str(e)}
+        except ValueError as e:
+            status, payload = 400, {"error": str(e)}
+        except (BrokenPipeError, ConnectionResetError):
+            return  # a streaming client went away
+        if status is not None:
+            self._send_json(status, payload)
+
+    def _check_request(self, method):
+        """Refuse what a web page in the user's browser could get its browser to send."""
+        if self.headers.get("Origin") is not None:
+            error = ApiError(403, "Cross-origin requests are not allowed")
+        elif not self._allowed_host(_host_name(self.headers.get("Host", ""))):
+            error = ApiError(403, "Unexpected Host header")
+        elif not self._authorized():
+            error = ApiError(401, "Missing or wrong token")
+        elif method in ("POST", "PUT") and self.headers.get_content_type() != "application/json":
+            error = ApiError(415, "The request body must be application/json")
+        else:
+            return
+        self.close_connection = True  # its body is left unread
+        raise error
+
+    def _allowed_host(self, name):
+        """A rebound DNS name reaches us as the attacker's host name; the names we listen on don't."""
+        if _is_loopback(name):
+            return True
+        if _is_loopback(self.listen_host):
+            return False
+        return _is_ip_address(name) or name == self.listen_host.lower()
+
+    def _authorized(self):
+        expected = f"Bearer {self.token}".encode()
+        return hmac.compare_digest(self.headers.get("Authorization", "").encode(), expected)
+
+    def _route(self, method, parts, query):
+        """(status, JSON payload), or (None, None) once a streaming response has been sent."""
+        service = self.service
+        route = (method, *parts[:1])
+        if route == ("GET", "status") and len(parts) == 1:
+            return 200, service.status()
+        if route == ("GET", "events") and len(parts) == 1:
+            self._stream_events()
+            return None, None
+        if route == ("POST", "fetch") and len(parts) == 1:
+            return 200, self._fetch(self._read_json())
+        if route == ("POST", "resolve") and len(parts) == 1:
+            self._stream_resolve(self._read_json())
+            return None, None
+        if route == ("GET", "history") and len(parts) == 1:
+            return 200, self._history(query)
+        if parts == ["bandwidth"] and method in ("GET", "PUT"):
+            return 200, service.bandwidth() if method == "GET" else service.set_bandwidth(self._read_json())
+        if parts[:1] != ["jobs"]:
+            raise ApiError(404, f"No such endpoint: {method} {self.path}")
+
+        if parts == ["jobs"] and method == "GET":
+            return 200, [job.to_dict() for job in service.queue.jobs()]
+        if parts == ["jobs"] and method == "POST":
+            body = self._read_json()
+            if not isinstance(body, dict):
+                raise ValueError("expected an object with url and options")
+            return 201, service.submit(body.get("url"), body.get("options")).to_dict()
+        if parts == ["jobs", "clear"] and method == "POST":
+            service.clear_finished()
+            return 200, {}
+        if len(parts) in (2, 3) and parts[1].isdigit():
+            job_id = int(parts[1])
+            action = (method, *parts[2:])
+            if action == ("GET",):
+                return 200, service.job(job_id).to_dict()
+            if action == ("DELETE",):
+                service.remove(job_id)
+                return 200, {}
+            if action == ("POST", "cancel"):
+                return 200, service.cancel(job_id).to_dict()
+            if action == ("POST", "retry"):
+                return 200, service.retry(job_id).to_dict()
+        raise ApiError(404, f"No such endpoint: {method} {self.path}")
+
+    def _fetch(self, body):
+        url = body.get("url") if isinstance(body, dict) else None
+        if not isinstance(url, str) or not url.strip():
+            raise ValueError("url is required")
+        try:
+            return self.service.engine.fetch_listing(url.strip())
+        except Exception as e:
+            raise ApiError(502, str(e)) from None
+
+    def _history(self, query):
+        if self.service.history is None:
+            return []
+        try:
+            limit = min(int(query.get("limit", [HISTORY_LIMIT])[0]), 1000)
+        except ValueError:
+            raise ValueError("limit must be an integer") from None
+        try:
+            return self.service.history.recent(limit)
+        except OSError as e:
+            raise ApiError(500, f"Cannot read the history: {e}") from None
+
+    # ── Bodies and responses ──────────────────────────────────
+
+    def _read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise ValueError("Invalid Content-Length") from None
+        if length > MAX_BODY:
+            raise ApiError(413, "Request body too large")
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ValueError("The request body is not valid JSON") from None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self):
+        """Send the headers of a response written line by line until the connection closes."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def _stream_events(self):
+        hub = self.service.hub
+        subscriber = hub.subscribe()  # before the listing, so no change falls in between
+        try:
+            self._start_stream()
+            jobs = [job.to_dict() for job in self.service.queue.jobs()]
+            self.wfile.write(json.dumps({"event": "jobs", "jobs": jobs}, separators=(",", ":")).encode() + b"\n")
+            while True:
+                try:
+                    line = subscriber.get(timeout=PING_INTERVAL)
+                except queue.Empty:
+                    line = b'{"event":"ping"}\n'
+                if line is None:
+                    return  # fell behind; the client reconnects and gets a fresh listing
+                self.wfile.write(line)
+        finally:
+            hub.unsubscribe(subscriber)
+
+    def _stream_resolve(self, body):
+        entries = body.get("entries") if isinstance(body, dict) else None
+        if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+            raise ValueError("entries must be a list of playlist entries")
+        self._start_stream()
+        cancel_event = threading.Event()
+
+        def on_resolved(index, info, error):
+            line = {"index": index, "info": info} if info is not None else {"index": index, "error": str(error)}
+            try:
+                self.wfile.write(json.dumps(line, separators=(",", ":")).encode() + b"\n")
+            except OSError:
+                cancel_event.set()  # the client stopped listening (e.g. fetched another URL)
+
+        self.service.engine.resolve_entries(entries, on_resolved, cancel_event)
+
+
+def make_server(service, token, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    if not token:
+        raise ValueError("the daemon requires a token")
+    handler = type("Handler", (_Handler,), {"service": service, "token": token, "listen_host": host})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True  # /events streams don't hold up shutdown
+    return server
+
+
+def _host_name(header):
+    """The name in a Host header, lowercased and without the port ("[::1]:8765" -> "::1")."""
+    header = header.strip().lower()
+    if header.startswith("["):
+        return header[1:].partition("]")[0]
+    return header.rpartition(":")[0] if header.count(":") == 1 else header
+
+
+def _is_ip_address(host):
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_loopback(host):
+    if host.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _limit_arg(text):
+    try:
+        return parse_mbit(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _schedule_arg(text):
+    try:
+        return BandwidthSchedule.parse(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="youtube_downloader daemon",
+        description="Serve one shared download queue to several clients over a local HTTP/JSON API.",
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument("--token", default=None,
+                        help=f"the 'Authorization: Bearer TOKEN' every request needs (default: ${TOKEN_ENV}, "
+                             f"else the one saved in the app data folder, made on first start)")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                        help=f"jobs downloading at once across all clients (default: {DEFAULT_JOBS})")
+    parser.add_argument("--root", default=None, metavar="DIR",
+                        help="keep every download inside DIR; clients' output folders are relative to it "
+                             f"(default: {DEFAULT_ROOT})")
+    parser.add_argument("--any-folder", action="store_true",
+                        help="let clients download to any absolute path this user can write to, instead of --root")
+    parser.add_argument("--limit", type=_limit_arg, default=None, metavar="MBIT",
+                        help="total bandwidth limit in Mbit/s across all downloads, or 'off' (default: off)")
+    parser.add_argument("--schedule", type=_schedule_arg, default=None, metavar="SPEC",
+                        help="time-of-day limits overriding --limit, e.g. '08:00-18:00=20,18:00-08:00=off'")
+    parser.add_argument("--no-cache", action="store_true", help="don't read or write the metadata cache")
+    parser.add_argument("--no-library", action="store_true",
+                        help="always download, even if the same file already exists in another folder")
+    parser.add_argument("--min-free", type=float, default=DEFAULT_RESERVE / 1_073_741_824, metavar="GB",
+                        help="free space to leave on the output drive (default: 0.5)")
+    parser.add_argument("--metrics-textfile", metavar="PATH",
+                        help="keep Prometheus metrics in PATH (a .prom file for node_exporter's textfile collector)")
+    return parser
+
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.any_folder and args.root:
+        parser.error("--root and --any-folder exclude each other")
+    root = None if args.any_folder else os.path.realpath(args.root or DEFAULT_ROOT)
+    if root is not None:
+        try:
+            os.makedirs(root, exist_ok=True)
+        except OSError as e:
+            print(f"Cannot create folder {root}: {e}", file=sys.stderr)
+            return 1
+    token = args.token or read_token()
+    token_note = None
+    if not token:
+        try:
+            token = create_token()
+            token_note = f"New token saved in {token_path()}"
+        except OSError as e:
+            token = secrets.token_urlsafe(32)
+            token_note = f"Cannot save the token ({e}); clients must send: {token}"
+
+    try:
+        import yt_dlp  # noqa: F401
+    except ImportError:
+        print("yt-dlp is not installed.\n\nPlease run:\n  pip install yt-dlp", file=sys.stderr)
+        return 1
+    from .engine import DownloadEngine
+
+    cache = None if args.no_cache else open_default_cache()
+    archive = open_default_archive()
+    library = None if args.no_library else open_default_library()
+    limiter = BandwidthLimiter(mbit_to_bytes(args.limit), args.schedule)
+    history = open_default_history(args.metrics_textfile)
+    engine = DownloadEngine(metadata_cache=cache, archive=archive, limiter=limiter, history=history,
+                            library=library, disk_budget=DiskBudget(int(args.min_free * 1_073_741_824)))
+    engine.warm_up()
+    # Its own queue file: the desktop app's runner must not claim the daemon's jobs
+    job_queue = open_default_queue("daemon-queue.sqlite3")
+    service = DownloadService(engine, job_queue, limiter, history, args.jobs, root)
+    try:
+        server = make_server(service, token, args.host, args.port)
+    except OSError as e:
+        print(f"Cannot listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 1
+
+    signal.signal(signal.SIGTERM, _terminate)
+    service.start()
+    waiting = job_queue.counts().get(PENDING, 0)
+    print(f"Listening on http://{args.host}:{server.server_address[1]}"
+          + (f", resuming {waiting} queued job{'s' if waiting != 1 else ''}" if waiting else ""), file=sys.stderr)
+    if token_note:
+        print(token_note, file=sys.stderr)
+    print(f"Downloading into {root}" if root else "Downloading into any folder clients name", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping; running jobs stay queued.", file=sys.stderr)
+    finally:
+        server.server_close()
+        service.close(timeout=10.0)
+        job_queue.close()
+        engine.close()
+        for resource in (cache, archive, library):
+            if resource:
+                resource.close()
+    return 0
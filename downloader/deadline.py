@@ -0,0 +1,236 @@
+"""Deadline mode: pick each video's resolution and preset so the whole job finishes in time.
+
+The chosen resolution and preset are the ceiling. Whenever a video is
+about to start, the videos not started yet are planned against the bytes
+the link can still move before the deadline: all of them get the highest
+rung of the quality ladder (resolution first, then preset) whose total
+fits, and what is left over lifts videos early in the order further up.
+Throughput is measured from the job's own progress events over a sliding
+window, so each plan follows the link as it speeds up or slows down.
+Until enough has been measured, the median throughput of recent jobs in
+the history stands in; with no history, the first videos are fetched at
+the lowest rung while the link is probed. Sizes are the FormatIndex
+estimates the GUI shows.
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from .formats import FormatIndex
+from .metrics import OK, PARTIAL
+from .presets import ALL_RESOLUTIONS, BITRATE_MAP
+from .timerange import clip_share
+
+WINDOW = 30.0  # seconds of transfer the throughput is measured over
+MIN_MEASURED = 5.0  # seconds of transfer before the measurement replaces the prior...
+MIN_MEASURED_BYTES = 8 * 1_048_576  # ...or this much over at least a second, when probing with small videos
+SAFETY = 0.9  # share of the projected byte budget that is planned, for estimate error and merging
+PRIOR_JOBS = 20  # recent history records the prior throughput is taken from
+PRIOR_MIN_BYTES = 50 * 1_048_576  # smaller jobs are mostly start-up time and say little about the link
+PROJECTION_INTERVAL = 1.0  # seconds between projected-finish updates
+
+
+def quality_ladder(max_resolution, max_preset):
+    """(resolution, preset) rungs from lowest to highest, up to and including the given ones."""
+    presets = list(BITRATE_MAP)
+    ladder = []
+    for resolution in ALL_RESOLUTIONS:
+        if resolution > max_resolution:
+            break
+        for preset in presets:
+            if resolution == max_resolution and presets.index(preset) > presets.index(max_preset):
+                break
+            ladder.append((resolution, preset))
+    return ladder or [(max_resolution, max_preset)]
+
+
+def parse_deadline(text, now=None):
+    """Epoch seconds for "06:30" (its next occurrence) or "2026-10-19 06:30". Raises ValueError."""
+    now = now or datetime.now()
+    text = text.strip()
+    for pattern in ("%H:%M", "%Y-%m-%d %H:%M"):
+        try:
+            parsed = datetime.strptime(text, pattern)
+        except ValueError:
+            continue
+        if pattern == "%H:%M":
+            parsed = now.replace(hour=parsed.hour, minute=parsed.minute, second=0, microsecond=0)
+            if parsed <= now:
+                parsed += timedelta(days=1)
+        return parsed.timestamp()
+    raise ValueError(f"Invalid deadline {text!r}: use HH:MM or YYYY-MM-DD HH:MM")
+
+
+def prior_throughput(history):
+    """Median bytes/s of recent sizeable jobs in a MetricsHistory, or None."""
+    if history is None:
+        return None
+    try:
+        records = history.recent(PRIOR_JOBS)
+    except OSError:
+        return None
+    rates = [r["throughput"] for r in records
+             if r.get("status") in (OK, PARTIAL) and r.get("bytes", 0) >= PRIOR_MIN_BYTES and r.get("throughput")]
+    return statistics.median(rates) if rates else None
+
+
+class ThroughputMeter:
+    """Job-wide download rate over the last WINDOW seconds, fed with yt-dlp progress events."""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._files = {}  # file name -> bytes reported so far
+        self._videos = {}  # video ID -> bytes downloaded
+        self._total = 0
+        self._samples = deque()  # (time, total bytes), oldest first
+
+    def stream_hook(self, d):
+        if d.get("status") not in ("downloading", "finished") or d.get("downloaded_bytes") is None:
+            return
+        if d["status"] == "finished" and d.get("elapsed") is None:
+            return  # already on disk, nothing was transferred
+        key = d.get("tmpfilename") or d.get("filename")
+        video_id = (d.get("info_dict") or {}).get("id")
+        now = self._clock()
+        with self._lock:
+            delta = d["downloaded_bytes"] - self._files.get(key, 0)
+            self._files[key] = d["downloaded_bytes"]
+            if delta <= 0:
+                return
+            self._total += delta
+            self._videos[video_id] = self._videos.get(video_id, 0) + delta
+            self._samples.append((now, self._total))
+            # Keep the last sample before the window so the window is always covered
+            while len(self._samples) > 2 and self._samples[1][0] <= now - WINDOW:
+                self._samples.popleft()
+
+    def rate(self):
+        """Bytes/s over the window, or None until enough transfer was seen to go by."""
+        with self._lock:
+            if len(self._samples) < 2:
+                return None
+            (t0, b0), (t1, b1) = self._samples[0], self._samples[-1]
+        if t1 - t0 < MIN_MEASURED and (t1 - t0 < 1.0 or b1 - b0 < MIN_MEASURED_BYTES):
+            return None
+        return (b1 - b0) / (t1 - t0)
+
+    def downloaded(self, video_id):
+        with self._lock:
+            return self._videos.get(video_id, 0)
+
+
+class DeadlinePlanner:
+    """Per-video format choices for one deadline-mode job; safe to use from every download thread.
+
+    ``on_projection(finish_at)`` is called at most every PROJECTION_INTERVAL
+    seconds from ``stream_hook`` with the projected finish (epoch seconds),
+    or None while the throughput is unknown.
+    """
+
+    def __init__(self, options, prior_rate=None, on_projection=None, clock=time.time):
+        self.options = options
+        self.deadline = options.deadline
+        self.ladder = quality_ladder(options.quality, options.preset)
+        self.meter = ThroughputMeter()
+        self.prior_rate = prior_rate
+        self.on_projection = on_projection
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sizes = {}  # video ID -> estimated bytes per rung
+        self._indexes = {}  # video ID -> FormatIndex, for the chosen rung's format IDs
+        self._pending = []  # video IDs not started yet, in download order
+        self._planned = {}  # started video ID -> bytes planned for it
+        self._last_projection = 0.0
+
+    def add(self, video_id, info):
+        """Register a video to plan from its full info; add videos in download order."""
+        index = FormatIndex(info.get("formats") or [], info.get("duration") or 0)
+        share = clip_share(self.options.clip_start, self.options.clip_end, index.duration)
+        sizes = [index.estimate(resolution, preset) * share for resolution, preset in self.ladder]
+        with self._lock:
+            self._indexes[video_id] = index
+            self._sizes[video_id] = sizes
+            if video_id not in self._pending and video_id not in self._planned:
+                self._pending.append(video_id)
+
+    def rate(self):
+        measured = self.meter.rate()
+        return measured if measured is not None else self.prior_rate
+
+    def choose(self, video_id, info=None):
+        """(resolution, preset, format IDs or None, label) to download ``video_id`` with, from a fresh plan.
+
+        The label names what will actually be fetched, e.g. "360p Best" for
+        the 480p rung of a video that has nothing between 360p and 720p.
+        """
+        if video_id not in self._sizes and info is not None:
+            self.add(video_id, info)
+        rate = self.rate()
+        with self._lock:
+            if video_id not in self._sizes:
+                resolution, preset = self.ladder[0]  # nothing known about its formats
+                return resolution, preset, None, f"{resolution}p {preset}"
+            if video_id in self._pending:
+                self._pending.remove(video_id)
+            if rate is None:
+                rung = 0  # probing: nothing measured or recorded yet
+            else:
+                rung = self._plan([video_id, *self._pending], self._budget(rate))[video_id]
+            self._planned[video_id] = self._sizes[video_id][rung]
+            index = self._indexes[video_id]
+        resolution, preset = self.ladder[rung]
+        stream = index.video_stream(resolution, preset)
+        height = stream.height if stream is not None and stream.height else resolution
+        return resolution, preset, index.format_selector(resolution, preset), f"{height}p {preset}"
+
+    def finish(self, video_id):
+        """The video is done (or failed, or was skipped): it no longer counts against the budget."""
+        with self._lock:
+            self._planned.pop(video_id, None)
+            if video_id in self._pending:
+                self._pending.remove(video_id)
+
+    def projection(self):
+        """Projected finish (epoch seconds) if the rest goes as planned now, or None if the rate is unknown."""
+        rate = self.rate()
+        if not rate:
+            return None
+        with self._lock:
+            plan = self._plan(self._pending, self._budget(rate))
+            remaining = self._in_flight() + sum(self._sizes[v][rung] for v, rung in plan.items())
+        return self._clock() + remaining / rate
+
+    def stream_hook(self, d):
+        self.meter.stream_hook(d)
+        now = self._clock()
+        if self.on_projection is not None and now - self._last_projection >= PROJECTION_INTERVAL:
+            self._last_projection = now
+            self.on_projection(self.projection())
+
+    def _in_flight(self):
+        return sum(max(planned - self.meter.downloaded(v), 0) for v, planned in self._planned.items())
+
+    def _budget(self, rate):
+        """Bytes the videos not started yet may take: what the link moves by the deadline, less the running ones."""
+        return rate * max(self.deadline - self._clock(), 0) * SAFETY - self._in_flight()
+
+    def _plan(self, video_ids, budget):
+        """Rung per video so the total fits ``budget``; the lowest rung for all if even that doesn't fit."""
+        sizes = [self._sizes[v] for v in video_ids]
+        top = len(self.ladder) - 1
+        base = next((rung for rung in range(top, -1, -1) if sum(s[rung] for s in sizes) <= budget), 0)
+        plan = [base] * len(sizes)
+        slack = budget - sum(s[base] for s in sizes)
+        # Leftover budget lifts videos further up, earliest first
+        for n, s in enumerate(sizes):
+            for rung in range(top, base, -1):
+                extra = s[rung] - s[base]
+                if extra <= slack:
+                    plan[n] = rung
+                    slack -= extra
+                    break
+        return dict(zip(video_ids, plan))
@@ -0,0 +1,210 @@
+"""Disk-space admission control shared by every download job.
+
+Before a video is downloaded, its job reserves the space the video will
+take at its peak: the downloaded streams plus the merged (or extracted)
+output, which exist side by side until post-processing deletes the
+streams. Sizes come from the same estimates the GUI shows. A video that
+doesn't fit waits while other videos' temporary files are what stands in
+the way, and is refused with ``InsufficientSpace`` when it can't fit even
+once they are done, so a large playlist doesn't fill the drive halfway and
+leave ``.part`` files behind. As streams download, their actual byte
+counts replace the estimate.
+"""
+
+import os
+import shutil
+import threading
+
+from .formats import FormatIndex, estimate_stream_size, format_size
+from .timerange import clip_share
+
+DEFAULT_RESERVE = 512 * 1024 * 1024  # free space never handed out to downloads
+WAIT_POLL = 0.5  # seconds between free-space checks while waiting (other programs free space too)
+
+# Bytes per second of Audio mode output that doesn't keep the source's bitrate
+AUDIO_OUTPUT_RATE = {"wav": 176_400, "flac": 110_000, "mp3": 32_000}  # 16-bit stereo PCM; ~60%; VBR -V0
+
+
+class InsufficientSpace(OSError):
+    """A download needs more space than the drive has, even after other downloads finish."""
+
+    def __init__(self, path, needed, available, reserve):
+        self.path = path
+        self.needed = needed
+        self.available = max(available, 0)
+        super().__init__(f"Not enough disk space in {path}: needs about {format_size(needed)}, "
+                         f"{format_size(self.available)} available (keeping {format_size(reserve)} free)")
+
+
+def estimate_need(info, options):
+    """(stream bytes, output bytes) one video of ``info`` takes with ``options``; 0 where unknown."""
+    index = FormatIndex(info.get("formats") or [], info.get("duration") or 0)
+    share = clip_share(options.clip_start, options.clip_end, index.duration)
+    if options.is_audio:
+        source = estimate_stream_size(index.audio_stream, index.duration, "abr") if index.audio_stream else 0
+        rate = AUDIO_OUTPUT_RATE.get(options.audio_format)
+        output = rate * index.duration if rate else source
+        return source * share, output * share
+    size = index.estimate(options.quality, options.preset) * share
+    return size, size  # merging remuxes: the output is about the size of its streams
+
+
+def job_need(total, count, concurrent):
+    """Peak bytes of a job of ``count`` videos totalling ``total``, with ``concurrent`` in flight at once."""
+    if count <= 0:
+        return 0
+    return total + total / count * min(concurrent, count)
+
+
+def _existing(path):
+    """``path`` or its nearest existing parent; the output folder may not have been created yet."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+class Reservation:
+    """Space held for one video until it is finished (or has failed)."""
+
+    def __init__(self, device, streams, output):
+        self.device = device
+        self.streams = streams
+        self.output = output
+        self._written = {}  # file name -> bytes on disk so far
+
+    @property
+    def written(self):
+        return sum(self._written.values())
+
+    @property
+    def outstanding(self):
+        """Bytes the video may still add to the drive, temporary files included."""
+        return max(self.streams + self.output - self.written, 0)
+
+    @property
+    def returned_at_most(self):
+        """Upper bound on the bytes the drive gets back once the video is done (negative: it still grows).
+
+        Until its streams are down the video will still add ``output -
+        written``. After that the merge or extraction writes the output,
+        which isn't tracked; at best it is complete and the streams,
+        about to be deleted, are all the video gives back.
+        """
+        if self.written >= self.streams:
+            return self.written
+        return self.written - self.output
+
+    def stream_progress(self, filename, nbytes):
+        self._written[filename] = nbytes
+        written = self.written
+        if written > self.streams:
+            # The estimate was low: assume the output is off by the same factor
+            self.output = self.output * written / self.streams if self.streams else written
+            self.streams = written
+
+
+class DiskBudget:
+    """Free space handed out to downloads, per drive, never going below ``reserve`` bytes."""
+
+    def __init__(self, reserve=DEFAULT_RESERVE):
+        self.reserve = reserve
+        self._cond = threading.Condition()
+        self._held = []
+        self._waiting = []  # [device] per acquire in progress, in arrival order: first come, first served
+
+    def _check(self, path, device, needed):
+        """True if ``needed`` fits now, False if it will once others finish; raises if it never will."""
+        free = shutil.disk_usage(_existing(path)).free - self.reserve
+        others = [r for r in self._held if r.device == device]
+        if free - sum(r.outstanding for r in others) >= needed:
+            return True
+        available = free + sum(r.returned_at_most for r in others)
+        if available < needed:
+            raise InsufficientSpace(path, needed, available, self.reserve)
+        return False
+
+    def check(self, path, needed):
+        """Admission check without reserving (e.g. before queuing): True if it fits now, False if it must wait.
+
+        Raises InsufficientSpace if it won't fit at all.
+        """
+        with self._cond:
+            return self._check(path, os.stat(_existing(path)).st_dev, needed)
+
+    def acquire(self, path, streams, output, cancel_event=None, on_wait=None):
+        """Reserve a video's peak space on ``path``'s drive, waiting while others hold what it needs.
+
+        ``on_wait(True)`` / ``on_wait(False)`` are called when waiting starts
+        and ends. Returns the Reservation, or None if ``cancel_event`` was set
+        while waiting; raises InsufficientSpace if it won't ever fit.
+        """
+        device = os.stat(_existing(path)).st_dev
+        ticket = [device]
+        waited = False
+        try:
+            with self._cond:
+                self._waiting.append(ticket)
+                try:
+                    while not (self._first(ticket) and self._check(path, device, streams + output)):
+                        if not waited and on_wait:
+                            on_wait(True)
+                        waited = True
+                        self._cond.wait(WAIT_POLL)
+                        if cancel_event is not None and cancel_event.is_set():
+                            return None
+                    reservation = Reservation(device, streams, output)
+                    self._held.append(reservation)
+                    return reservation
+                finally:
+                    self._waiting.remove(ticket)
+                    self._cond.notify_all()
+        finally:
+            if waited and on_wait:
+                on_wait(False)
+
+    def _first(self, ticket):
+        return next(t for t in self._waiting if t[0] == ticket[0]) is ticket
+
+    def release(self, reservation):
+        with self._cond:
+            if reservation in self._held:
+                self._held.remove(reservation)
+                self._cond.notify_all()
+
+
+class JobSpace:
+    """One job's reservations, by video ID, reconciled against yt-dlp progress events."""
+
+    def __init__(self, budget, path):
+        self.budget = budget
+        self.path = path
+        self._reservations = {}
+
+    def reserve(self, video_id, streams, output, cancel_event=None, on_wait=None):
+        """Reserve space for a video; False if cancelled while waiting (see ``DiskBudget.acquire``)."""
+        reservation = self.budget.acquire(self.path, streams, output, cancel_event, on_wait)
+        if reservation is None:
+            return False
+        self._reservations[video_id] = reservation
+        return True
+
+    def release(self, video_id):
+        reservation = self._reservations.pop(video_id, None)
+        if reservation is not None:
+            self.budget.release(reservation)
+
+    def stream_hook(self, d):
+        """Count a yt-dlp progress event's bytes against its video's reservation."""
+        reservation = self._reservations.get((d.get("info_dict") or {}).get("id"))
+        if reservation is None or d.get("status") not in ("downloading", "finished"):
+            return
+        nbytes = d.get("downloaded_bytes") or d.get("total_bytes") or 0
+        reservation.stream_progress(d.get("filename"), nbytes)
+
+    def close(self):
+        for video_id in list(self._reservations):
+            self.release(video_id)
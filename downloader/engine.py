@@ -0,0 +1,610 @@
+"""GUI-free download engine shared by the desktop app and batch mode."""
+
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field, replace
+from urllib.parse import parse_qs, urlparse
+
+import yt_dlp
+
+from . import cancel
+from .audio import conversion_of, derive_audio, describe_conversions
+from .deadline import DeadlinePlanner, prior_throughput
+from .diskspace import JobSpace, estimate_need
+from .library import DERIVED, link_or_copy
+from .metrics import CANCELLED, FAILED, OK, PARTIAL, JobMetrics
+from .options import DEFAULT_CONNECTIONS, DEFAULT_WORKERS, DownloadOptions  # noqa: F401  re-exported
+from .pipeline import TIMING_KEY, PipelinedYoutubeDL, PostprocessPipeline, deferred_job, postprocess_timing
+from .presets import format_options
+from .progress import ProgressChannel
+from .timerange import validate_range
+from .ydlpool import YoutubeDLPool
+
+RESOLVE_WORKERS = 4  # concurrent metadata extractions when resolving playlist entries
+CANCEL_WAIT = 10.0  # seconds a cancelled playlist waits for its post-processing jobs to stop
+STREAM_RETRIES = 10  # yt-dlp's command-line default; its API default is no retries at all
+
+
+@dataclass
+class DownloadResult:
+    total: int
+    failures: list = field(default_factory=list)  # [(title, error message)]
+    skipped: int = 0  # already in the archive and intact on disk
+    audio_conversions: list = field(default_factory=list)  # [(AudioExtractPP method, seconds)]
+    metrics: JobMetrics = None  # phase timings of the job, also appended to the engine's history
+    reused: list = field(default_factory=list)  # per video served from the library: LINK, COPY or DERIVED
+
+    @property
+    def downloaded(self):
+        return self.total - self.skipped - len(self.failures)
+
+    @property
+    def record(self):
+        """The job's history record (see ``JobMetrics.record``), or None."""
+        return self.metrics.record() if self.metrics else None
+
+    def audio_summary(self):
+        """How Audio mode files were produced, e.g. "2 stream-copied (0.8 s)"; "" if none were."""
+        return describe_conversions(self.audio_conversions)
+
+    def summary(self):
+        parts = [f"{self.downloaded} downloaded"]
+        if self.reused:
+            parts[0] += f" ({len(self.reused)} from the library)"
+        if self.skipped:
+            parts.append(f"{self.skipped} already up to date")
+        if self.failures:
+            parts.append(f"{len(self.failures)} failed")
+        return ", ".join(parts)
+
+    def to_dict(self):
+        """JSON-able form for API clients (see ``client.RemoteResult``)."""
+        return {"total": self.total, "skipped": self.skipped, "failures": [list(f) for f in self.failures],
+                "reused": list(self.reused), "summary": self.summary(), "audio_summary": self.audio_summary(),
+                "record": self.record}
+
+
+def video_id_from_url(url):
+    """Return the YouTube video ID for a single-video URL, or None."""
+    youtube_ie = yt_dlp.extractor.get_info_extractor("Youtube")
+    if not youtube_ie.suitable(url):
+        return None
+    return youtube_ie.get_temp_id(url)
+
+
+class DownloadEngine:
+    """Fetches video info and runs downloads with yt-dlp.
+
+    Progress is published to a ``ProgressChannel`` from the download threads;
+    the caller drains it on its own thread, so nothing here touches a GUI.
+    With a ``BandwidthLimiter``, every job is metered against the shared limit.
+    Playlist merges and audio extraction run on ``pipeline``, a process pool
+    started on first use. Metadata extraction borrows long-lived instances
+    from ``ydl_pool``; call ``close()`` when done with the engine. Every
+    job's phase timings are appended to ``history`` (a MetricsHistory).
+    With a ``library`` (MediaLibrary), a video whose file already exists in
+    another folder is linked from there, and Audio mode extracts from a
+    local copy of the video instead of downloading. With a ``disk_budget``
+    (DiskBudget), each video reserves its estimated space before it starts.
+    Options with a time range download only that part of each video.
+    Options with a deadline pick each video's resolution and preset from the
+    measured throughput so the job finishes in time (see ``deadline``).
+    A job cancelled with a ``cancel.CancelToken`` stops in every phase
+    (ffmpeg included) and removes its partial files.
+    """
+
+    def __init__(self, metadata_cache=None, archive=None, limiter=None, pipeline=None, ydl_pool=None,
+                 history=None, library=None, disk_budget=None):
+        self.metadata_cache = metadata_cache
+        self.archive = archive
+        self.library = library
+        self.disk_budget = disk_budget
+        self.limiter = limiter
+        self.history = history
+        self.pipeline = pipeline or PostprocessPipeline()
+        self.ydl_pool = ydl_pool or YoutubeDLPool()
+
+    def warm_up(self):
+        """Load extractors and build a pooled instance so the first fetch doesn't pay for it."""
+        self.ydl_pool.warm()
+        video_id_from_url("https://www.youtube.com/watch?v=")
+
+    def close(self):
+        self.pipeline.close()
+        self.ydl_pool.close()
+
+    # ── Fetch ─────────────────────────────────────────────────
+
+    def fetch_info(self, url):
+        """Return the sanitized info dict for a single video, reading through the cache."""
+        video_id = video_id_from_url(url)
+        info = self.metadata_cache.get(video_id) if self.metadata_cache else None
+        if info is None:
+            with self.ydl_pool.borrow(noplaylist=True) as ydl:
+                info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+            if self.metadata_cache:
+                self.metadata_cache.put(info)
+        return info
+
+    def fetch_listing(self, url):
+        """Return full info for a single video, or the flat entry list for a playlist.
+
+        Playlists are only enumerated here (one request per page of entries);
+        ``resolve_entries`` fetches the per-entry metadata afterwards.
+        """
+        video_id = video_id_from_url(url)
+        info = self.metadata_cache.get(video_id) if self.metadata_cache and video_id else None
+        if info is not None:
+            return info
+        with self.ydl_pool.borrow(extract_flat="in_playlist") as ydl:
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        if info.get("_type") in ("playlist", "multi_video"):
+            info["entries"] = [e for e in (info.get("entries") or []) if e]
+        elif self.metadata_cache:
+            self.metadata_cache.put(info)
+        return info
+
+    def resolve_entries(self, entries, on_resolved, cancel_event=None, workers=RESOLVE_WORKERS):
+        """Fetch full info for flat playlist entries on a bounded pool.
+
+        ``on_resolved(index, info, error)`` is called on the calling thread as
+        each entry completes, in completion order. Resolved entries land in the
+        metadata cache, so a following download doesn't extract them again.
+        """
+        cancel_event = cancel_event or threading.Event()
+
+        def resolve(entry):
+            if cancel_event.is_set():
+                return None
+            return self.fetch_info(entry.get("url") or entry.get("webpage_url") or entry.get("id"))
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="resolve") as pool:
+            futures = {pool.submit(resolve, entry): index for index, entry in enumerate(entries)}
+            try:
+                for future in as_completed(futures):
+                    if cancel_event.is_set():
+                        break
+                    try:
+                        info = future.result()
+                    except Exception as e:
+                        on_resolved(futures[future], None, e)
+                    else:
+                        on_resolved(futures[future], info, None)
+            except BaseException:
+                cancel_event.set()
+                raise
+            finally:
+                if cancel_event.is_set():
+                    pool.shutdown(cancel_futures=True)
+
+    # ── Download ──────────────────────────────────────────────
+
+    @staticmethod
+    def _progress_hook(channel, cancel_event, job=None, space=None, planner=None):
+        def hook(d):
+            # Cancellation is raised from here, the only code that runs inside yt-dlp's download loop
+            if cancel_event.is_set():
+                raise yt_dlp.utils.DownloadCancelled("Download cancelled by user")
+            channel.stream_hook(d)
+            if job is not None:
+                job.stream_hook(d)
+            if space is not None:
+                space.stream_hook(d)
+            if planner is not None:
+                planner.stream_hook(d)
+        return hook
+
+    def build_opts(self, options, progress_hook, meter=None, files=None):
+        """Build the yt-dlp options shared by every worker of a download job.
+
+        ``files`` (a ``cancel.PartialFiles``) is told every stream yt-dlp downloads.
+        """
+        name = f"%(title)s [{options.clip_label}]" if options.is_clip else "%(title)s"
+        opts = {
+            "outtmpl": os.path.join(options.output_dir, f"{name}.%(ext)s"),
+            "progress_hooks": [progress_hook],
+            "overwrites": True,
+            "windowsfilenames": True,
+            "trim_file_name": 200,
+            "quiet": True,
+            "no_warnings": True,
+            "noprogress": True,  # progress is reported through progress_hook
+            "noplaylist": False,
+            "retries": STREAM_RETRIES,
+            "fragment_retries": STREAM_RETRIES,
+            "segment_connections": options.connections,  # read by SegmentedYoutubeDL
+            "renew_below": options.renew_below,  # read by SegmentedHttpFD and ThrottledHttpFD
+        }
+        if meter is not None:
+            opts["bandwidth_meter"] = meter
+        if files is not None:
+            opts["partial_files"] = files  # read by SegmentedYoutubeDL and PipelinedYoutubeDL
+        if options.is_clip:
+            opts["download_ranges"] = yt_dlp.utils.download_range_func(
+                None, [(options.clip_start or 0, math.inf if options.clip_end is None else options.clip_end)])
+        opts.update(format_options(options.mode, options.quality, options.preset, options.audio_format,
+                                   options.format_selection))
+        return opts
+
+    def download(self, url, options, cancel_event=None, progress=None):
+        """Download a video or playlist into ``options.output_dir``.
+
+        Failed playlist entries are collected in the result instead of aborting
+        the remaining ones. Raises ``yt_dlp.utils.DownloadCancelled`` when
+        ``cancel_event`` is set, ``DownloadError`` for single-video failures
+        and ``InsufficientSpace`` when a single video won't fit on the drive.
+        ``cancel_event`` is best a ``cancel.CancelToken``, which stops the job
+        at once; a plain Event is followed by polling it.
+        """
+        with cancel.linked(cancel_event or cancel.CancelToken()) as token, cancel.scope(token):
+            return self._run_job(url, options, token, progress or ProgressChannel(options.is_audio))
+
+    def _run_job(self, url, options, cancel_event, progress):
+        meter = self.limiter.meter(url, cancel_event) if self.limiter else None
+        space = JobSpace(self.disk_budget, options.output_dir) if self.disk_budget else None
+        job = JobMetrics(url, options.mode, options.variant)
+        files = cancel.PartialFiles((options.audio_format,) if options.is_audio else ())
+        planner = None
+        if options.deadline is not None and not options.is_audio:
+            planner = DeadlinePlanner(options, prior_throughput(self.history),
+                                      on_projection=lambda finish_at: progress.projection(finish_at, options.deadline))
+        try:
+            result = self._download(url, options, cancel_event, progress, meter, job, space, planner, files)
+        except Exception as e:
+            if not cancel_event.is_set():
+                job.finish(FAILED, e)
+                raise
+            job.finish(CANCELLED, e if isinstance(e, yt_dlp.utils.DownloadCancelled) else "Download cancelled by user")
+            if not cancel_event.keep_partial:
+                files.remove()
+            if isinstance(e, yt_dlp.utils.DownloadCancelled):
+                raise
+            # A terminated ffmpeg or closed connection fails with its own error
+            raise yt_dlp.utils.DownloadCancelled("Download cancelled by user") from e
+        except BaseException as e:
+            # E.g. Ctrl+C in batch mode: stop ffmpeg and the workers; a rerun resumes the partial files
+            cancel_event.cancel(keep_partial=True)
+            job.finish(FAILED, e)
+            raise
+        else:
+            job.finish(PARTIAL if result.failures else OK)
+            result.metrics = job
+            return result
+        finally:
+            if meter is not None:
+                meter.close()
+            if space is not None:
+                space.close()
+            self._save_metrics(job)
+
+    def _save_metrics(self, job):
+        if self.history is None:
+            return
+        try:
+            self.history.append(job.record())
+        except OSError:
+            pass  # a full disk or unwritable text file must not fail the download itself
+
+    def _download(self, url, options, cancel_event, progress, meter, job, space, planner=None, files=None):
+        hook = self._progress_hook(progress, cancel_event, job, space, planner)
+        opts = self.build_opts(options, hook, meter, files)
+
+        # A single video that is already archived is skipped without any request
+        video_id = video_id_from_url(url)
+        if self._is_archived(video_id, options):
+            job.total = job.skipped = 1
+            return DownloadResult(total=1, skipped=1)
+
+        # Expand playlists flat so each entry can be scheduled on its own
+        # worker; single videos are downloaded from the extracted info.
+        started = time.perf_counter()
+        info = self._cached_info_for_download(url)
+        if info is None:
+            with self.ydl_pool.borrow(extract_flat="in_playlist") as ydl:
+                info = ydl.extract_info(url, download=False)
+        job.title = info.get("title")
+        if info.get("_type") not in ("playlist", "multi_video"):
+            # Extraction already selected formats with yt-dlp's defaults; drop its picks
+            # (``requested_formats`` would otherwise override the selection for these options)
+            info = yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=True)
+            job.total = 1
+            job.add_phase("extract", time.perf_counter() - started, info.get("id"), info.get("title"))
+            progress.set_total(1)
+            progress.register(info.get("id"), 1, info.get("title"))
+            result = DownloadResult(total=1)
+            try:
+                self._check_range(info, options)
+                with PipelinedYoutubeDL(opts) as ydl:
+                    planned = self._plan_video(ydl, planner, info, options, progress)
+                    final = self._from_library(ydl, info, planned, result)
+                    if final is None:
+                        self._reserve_space(space, info, planned, progress, cancel_event)
+                        final = ydl.process_ie_result(info, download=True)
+                    self._finish_download(final, options, result, job, files)
+            except Exception as e:
+                if not cancel_event.is_set():
+                    job.fail_item(info.get("id"), info.get("title"), e)
+                raise
+            finally:
+                if planner is not None:
+                    planner.finish(info.get("id"))
+            return result
+        job.add_phase("extract", time.perf_counter() - started)  # the playlist listing
+
+        entries = [e for e in (info.get("entries") or []) if e]
+        if not entries:
+            raise yt_dlp.utils.DownloadError("The playlist has no videos.")
+        if options.format_selection:
+            # Format IDs picked for one fetched video don't carry over to the other entries
+            options = replace(options, format_selection=None)
+            opts = self.build_opts(options, hook, meter, files)
+
+        # Only new or changed entries are scheduled; archived ones never touch the network
+        pending = [e for e in entries if not self._is_archived(e.get("id"), options)]
+        result = DownloadResult(total=len(entries), skipped=len(entries) - len(pending))
+        job.total, job.skipped = result.total, result.skipped
+        if planner is not None:
+            self._plan_playlist(pending, planner, job, cancel_event)
+        result.failures = self._download_playlist(pending, opts, options, progress, cancel_event, result, job,
+                                                  space, planner, files)
+        if cancel_event.is_set():
+            raise yt_dlp.utils.DownloadCancelled("Download cancelled by user")
+        return result
+
+    def _is_archived(self, video_id, options):
+        if not self.archive or options.force_refresh:
+            return False
+        return self.archive.is_complete(video_id, options.variant, options.output_dir)
+
+    @staticmethod
+    def _check_range(info, options):
+        """DownloadError if the video ends before the time range starts."""
+        try:
+            validate_range(options.clip_start, options.clip_end, info.get("duration"))
+        except ValueError as e:
+            raise yt_dlp.utils.DownloadError(str(e)) from None
+
+    def _plan_playlist(self, entries, planner, job, cancel_event):
+        """Give the deadline planner every pending entry's formats up front, in download order.
+
+        The full info lands in the metadata cache, so the download doesn't
+        extract it again; entries that fail here are planned when they start.
+        """
+        started = time.perf_counter()
+        resolved = {}
+
+        def on_resolved(index, info, error):
+            if info is not None:
+                resolved[index] = info
+
+        self.resolve_entries(entries, on_resolved, cancel_event)
+        for index in sorted(resolved):
+            planner.add(resolved[index].get("id"), resolved[index])
+        job.add_phase("extract", time.perf_counter() - started)
+        if cancel_event.is_set():
+            raise yt_dlp.utils.DownloadCancelled("Download cancelled by user")
+
+    @staticmethod
+    def _plan_video(ydl, planner, info, options, progress):
+        """Point ``ydl`` at the deadline plan's formats for this video; the options it is downloaded with.
+
+        Without a planner the job's own options are returned unchanged. The
+        archive still records the job's options, so the video isn't fetched
+        again by the next run with the same deadline.
+        """
+        if planner is None:
+            return options
+        resolution, preset, selection, label = planner.choose(info.get("id"), info)
+        planned = replace(options, quality=resolution, preset=preset, format_selection=selection)
+        fmt = format_options(planned.mode, resolution, preset, planned.audio_format, selection)
+        ydl.params.update(fmt)
+        ydl.format_selector = ydl.build_format_selector(fmt["format"])
+        progress.plan(info.get("id"), label)
+        return planned
+
+    @staticmethod
+    def _reserve_space(space, info, options, progress, cancel_event):
+        """Wait until the video fits on the drive, merge space included; InsufficientSpace if it never will."""
+        if space is None:
+            return
+        video_id = info.get("id")
+        streams, output = estimate_need(info, options)
+        if not space.reserve(video_id, streams, output, cancel_event,
+                             on_wait=lambda waiting: progress.waiting(video_id, waiting)):
+            raise yt_dlp.utils.DownloadCancelled("Download cancelled by user")
+
+    def _from_library(self, ydl, info, options, result):
+        """Produce a video's file from the library instead of downloading it; the final info, or None.
+
+        Only format selection runs first (no requests), so the lookup is by
+        the exact streams a download would fetch.
+        """
+        if (not self.library or options.force_refresh or info.get("_type", "video") != "video"
+                or not self.library.has(info.get("id"))):
+            return None
+        selected = ydl.process_ie_result(dict(info), download=False)
+        started = time.time()
+        source = self.library.lookup(selected["id"], selected.get("format_id"), options.artifact_kind)
+        if source is not None:
+            target = ydl.prepare_filename(selected)
+            if options.is_audio:
+                # Named as AudioExtract names its output
+                target = yt_dlp.utils.replace_extension(target, options.audio_format, selected.get("ext"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            method = link_or_copy(source, target)
+            final = {**selected, "filepath": target, TIMING_KEY: {"seconds": 0.0, "finished_at": started}}
+        elif (options.is_audio and not options.is_clip
+              and (source := self.library.find_video(selected["id"])) is not None):
+            method = DERIVED
+            final = derive_audio(ydl, source, selected)
+            final[TIMING_KEY] = {"seconds": round(time.time() - started, 3), "finished_at": time.time()}
+        else:
+            return None
+        result.reused.append(method)
+        return final
+
+    def _finish_download(self, info, options, result, job, files=None):
+        """Archive a finished video, note how its audio was produced and record its timings."""
+        if files is not None:
+            files.finished(info.get("id"))  # kept even if the job is cancelled later
+        self._record_download(info, options)
+        conversion = conversion_of(info)
+        if conversion:
+            result.audio_conversions.append((conversion["method"], conversion["seconds"]))
+        timing = postprocess_timing(info)
+        if timing:
+            # Finalize: yt-dlp moving files into place, the pool handing the result back, archiving
+            job.add_phase("postprocess", timing["seconds"], info.get("id"))
+            job.add_phase("finalize", max(time.time() - timing["finished_at"], 0.0), info.get("id"))
+
+    def _record_download(self, info, options):
+        """Archive and index a finished download using the final (post-processed) file path."""
+        if not (self.archive or self.library) or not info:
+            return
+        downloads = info.get("requested_downloads") or [info]
+        path = downloads[0].get("filepath")
+        if not path or not os.path.isfile(path):
+            return
+        size = os.path.getsize(path)
+        if self.archive:
+            self.archive.record(info.get("id"), options.variant, options.output_dir, info.get("format_id"), path, size)
+        if self.library:
+            self.library.record(info.get("id"), info.get("format_id"), options.artifact_kind, path, size)
+
+    def _download_playlist(self, entries, opts, options, progress, cancel_event, result, job, space,
+                           planner=None, files=None):
+        """Download playlist entries on a bounded pool; return [(title, error)] for failures.
+
+        Each worker only downloads: a finished video's merge/extract job goes
+        to ``self.pipeline`` and the worker moves on to the next entry.
+        """
+        progress.set_total(len(entries))
+        if not entries:
+            return []
+        opts = {**opts, "defer_postprocessing": True}
+
+        local = threading.local()
+        instances = []
+        instances_lock = threading.Lock()
+        failures = []
+        failures_lock = threading.Lock()
+        postprocessing = []  # futures of jobs handed to the pipeline
+
+        def entry_title(entry):
+            return entry.get("title") or entry.get("id") or "Unknown"
+
+        def on_postprocessed(future, entry):
+            # Runs on the process pool's result thread
+            try:
+                if not future.cancelled():
+                    self._finish_download(future.result(), options, result, job, files)
+            except yt_dlp.utils.DownloadCancelled:
+                pass
+            except Exception as e:
+                job.fail_item(entry.get("id"), entry_title(entry), e)
+                with failures_lock:
+                    failures.append((entry_title(entry), str(e)))
+            finally:
+                if space is not None:
+                    space.release(entry.get("id"))  # the streams are gone; the output is on disk now
+                progress.finish(entry.get("id"))
+
+        def download_entry(index, entry):
+            if cancel_event.is_set():
+                return
+            with cancel.scope(cancel_event):
+                download_video(index, entry)
+
+        def download_video(index, entry):
+            # One YoutubeDL per worker thread, reused for every entry it picks up
+            ydl = getattr(local, "ydl", None)
+            if ydl is None:
+                ydl = local.ydl = PipelinedYoutubeDL(opts)
+                with instances_lock:
+                    instances.append(ydl)
+            video_id = entry.get("id")
+            progress.register(video_id, index, entry.get("title"))
+            info = self.metadata_cache.get(video_id, require_fresh_urls=True) if self.metadata_cache else None
+            try:
+                started = time.perf_counter()
+                if info is None:
+                    # Extract on a pooled instance (warm connections); download on this worker's own
+                    with self.ydl_pool.borrow(noplaylist=True) as extractor:
+                        info = extractor.extract_info(entry.get("url") or entry.get("webpage_url") or video_id,
+                                                      download=False, process=False)
+                else:
+                    # Cached from Fetch: drop the formats yt-dlp picked then, as for single videos
+                    info = yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=True)
+                job.add_phase("extract", time.perf_counter() - started, video_id, entry_title(entry))
+                self._check_range(info, options)
+                planned = self._plan_video(ydl, planner, info, options, progress)
+                reused = self._from_library(ydl, info, planned, result)
+                if reused is not None:
+                    self._finish_download(reused, options, result, job, files)
+                    progress.finish(video_id)
+                    return
+                self._reserve_space(space, info, planned, progress, cancel_event)
+                info = ydl.process_ie_result(info, download=True)
+                pp_job = deferred_job(info)
+                if pp_job is not None:
+                    progress.postprocess(video_id)
+                    # Blocks while the pipeline is full, so downloads can't outrun ffmpeg
+                    future = self.pipeline.submit(pp_job, cancel_event)
+                    postprocessing.append(future)
+                    future.add_done_callback(lambda f: on_postprocessed(f, entry))
+                    return
+                self._finish_download(info, options, result, job, files)
+            except BaseException:
+                if space is not None:
+                    space.release(video_id)
+                progress.finish(video_id)
+                raise
+            finally:
+                if planner is not None:
+                    planner.finish(video_id)  # post-processing is local: only the download counts
+            if space is not None:
+                space.release(video_id)
+            progress.finish(video_id)
+
+        try:
+            with ThreadPoolExecutor(max_workers=options.workers, thread_name_prefix="download") as pool:
+                futures = {
+                    pool.submit(download_entry, index, entry): entry
+                    for index, entry in enumerate(entries, start=1)
+                }
+                try:
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                        except yt_dlp.utils.DownloadCancelled:
+                            pass
+                        except Exception as e:
+                            if cancel_event.is_set():
+                                continue  # stopped by the cancel, not a failure of its own
+                            entry = futures[future]
+                            job.fail_item(entry.get("id"), entry_title(entry), e)
+                            with failures_lock:
+                                failures.append((entry_title(entry), str(e)))
+                except BaseException:
+                    # Interrupted (e.g. Ctrl+C in batch mode): stop the workers before the pool joins them
+                    cancel_event.set()
+                    raise
+            if cancel_event.is_set():
+                # The token has withdrawn or stopped them; wait so their files can be removed
+                wait(postprocessing, timeout=CANCEL_WAIT)
+            else:
+                wait(postprocessing)
+        finally:
+            for ydl in instances:
+                ydl.close()
+        with failures_lock:
+            return list(failures)
+
+    def _cached_info_for_download(self, url):
+        """Reuse the info from Fetch when it is a single video whose format URLs are still valid."""
+        if not self.metadata_cache or "list" in parse_qs(urlparse(url).query):
+            return None  # playlist URLs are expanded fresh
+        return self.metadata_cache.get(video_id_from_url(url), require_fresh_urls=True)
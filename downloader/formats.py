@@ -0,0 +1,226 @@
+"""Stream selection and size estimation over a video's yt-dlp format list."""
+
+import threading
+from bisect import bisect_right
+
+from .presets import ALL_RESOLUTIONS, BITRATE_MAP, available_resolutions
+from .timerange import clip_seconds
+
+
+class StreamFormat:
+    """The fields of a yt-dlp format dict the app uses, and nothing else.
+
+    A format dict also carries signed URLs, HTTP headers and, for DASH,
+    sometimes thousands of fragment entries; an index keeps these records
+    instead, and the download reads the full info again (from the metadata
+    cache) when it runs.
+    """
+
+    __slots__ = ("format_id", "height", "vcodec", "acodec", "vbr", "tbr", "abr", "filesize", "filesize_approx")
+
+    def __init__(self, fmt):
+        self.format_id = fmt.get("format_id")
+        self.height = fmt.get("height")
+        self.vcodec = fmt.get("vcodec") or "none"
+        self.acodec = fmt.get("acodec") or "none"
+        self.vbr = fmt.get("vbr")
+        self.tbr = fmt.get("tbr")
+        self.abr = fmt.get("abr")
+        self.filesize = fmt.get("filesize")
+        self.filesize_approx = fmt.get("filesize_approx")
+
+    def __repr__(self):
+        return f"<StreamFormat {self.format_id} {self.height}p {self.vcodec}/{self.acodec}>"
+
+
+def video_bitrate(fmt):
+    """Get video-only bitrate in kbps of a StreamFormat, avoiding tbr which includes audio."""
+    if fmt.vbr:
+        return fmt.vbr
+    # If tbr exists but abr also exists, subtract audio
+    tbr = fmt.tbr or 0
+    abr = fmt.abr or 0
+    if tbr > abr:
+        return tbr - abr
+    return 0
+
+
+def estimate_stream_size(fmt, duration, bitrate_key="vbr"):
+    """Estimate a StreamFormat's size in bytes from filesize fields or bitrate * duration."""
+    size = fmt.filesize or fmt.filesize_approx
+    if size:
+        return size
+    if bitrate_key == "vbr":
+        br = video_bitrate(fmt)
+    else:
+        br = fmt.abr or 0
+    return br * 1000 / 8 * duration
+
+
+class FormatIndex:
+    """Per-video stream choices and size estimates for every (resolution, preset).
+
+    Built once per fetch, off the UI thread: video-only streams are grouped
+    into H.264 and all-codec lists sorted by (height, bitrate), and the stream
+    pick plus estimated size for every entry of ALL_RESOLUTIONS × BITRATE_MAP
+    is computed up front. Selection changes in the GUI are then dictionary
+    lookups, and the download uses the same picks via ``format_selector``.
+    Only StreamFormat records of the audio-only and video-only streams are
+    kept; the caller's format dicts can be dropped once this returns.
+    """
+
+    def __init__(self, formats, duration):
+        self.duration = duration or 0
+        self.available_resolutions = available_resolutions(formats)
+
+        video_only = []
+        audio_only = []
+        for position, f in enumerate(formats):
+            has_video = f.get("vcodec", "none") != "none"
+            has_audio = f.get("acodec", "none") != "none"
+            if has_video and not has_audio and f.get("height") is not None:
+                record = StreamFormat(f)
+                # Negated position: among equal (height, bitrate) the earliest listed stream sorts last,
+                # so the "highest" pick is the one max() over the format list would return
+                video_only.append((record.height, video_bitrate(record), -position, record))
+            elif has_audio and not has_video:
+                audio_only.append(f)
+
+        video_only.sort()
+        h264 = [v for v in video_only if "avc1" in v[3].vcodec]
+        self._video_groups = [
+            (h264, [v[0] for v in h264]),               # preferred: matches the download format string
+            (video_only, [v[0] for v in video_only]),
+        ]
+
+        # Audio: prefer AAC (matching download preference), highest abr
+        aac = [f for f in audio_only if "mp4a" in (f.get("acodec") or "")]
+        preferred_audio = aac or audio_only
+        self.audio_stream = (StreamFormat(max(preferred_audio, key=lambda f: f.get("abr") or 0))
+                             if preferred_audio else None)
+        audio_size = estimate_stream_size(self.audio_stream, self.duration, "abr") if self.audio_stream else 0
+
+        self._picks = {}
+        for resolution in ALL_RESOLUTIONS:
+            for preset in BITRATE_MAP:
+                video_stream = self._pick_video(resolution, preset)
+                size = 0
+                if video_stream is not None and self.duration:
+                    size = estimate_stream_size(video_stream, self.duration, "vbr") + audio_size
+                self._picks[(resolution, preset)] = (video_stream, size)
+
+    def _candidates(self, resolution):
+        """Video-only streams at or below ``resolution``, preferring H.264 if there are any."""
+        for streams, heights in self._video_groups:
+            end = bisect_right(heights, resolution)
+            if end:
+                return streams[:end]
+        return []
+
+    def _pick_video(self, resolution, preset):
+        candidates = self._candidates(resolution)
+        if not candidates:
+            return None
+        if preset == "Best":
+            return candidates[-1][3]  # highest (height, bitrate)
+
+        target_kbps = int(BITRATE_MAP[preset][resolution] * 1000)
+        # Highest (height, bitrate) stream under the bitrate cap
+        for height, br, _, f in reversed(candidates):
+            if 0 < br <= target_kbps:
+                return f
+        # No stream under cap; pick the lowest bitrate at target resolution, earliest listed on a tie
+        at_res = [v for v in candidates if v[0] == resolution]
+        pool = at_res or candidates
+        return min(pool, key=lambda v: (v[1] or float("inf"), -v[2]))[3]
+
+    def estimate(self, resolution, preset):
+        """Estimated Video-mode download size in bytes, or 0 if unknown."""
+        pick = self._picks.get((resolution, preset))
+        return pick[1] if pick else 0
+
+    def video_stream(self, resolution, preset):
+        pick = self._picks.get((resolution, preset))
+        return pick[0] if pick else None
+
+    def clip_seconds(self, start, end):
+        """Length of the part of the video a time range covers."""
+        return clip_seconds(start, end, self.duration)
+
+    def format_selector(self, resolution, preset):
+        """yt-dlp format IDs (video+audio) the estimate was based on, or None."""
+        audio_id = self.audio_stream.format_id if self.audio_stream else None
+        video = self.video_stream(resolution, preset)
+        if video is None or not video.format_id:
+            return None
+        return f"{video.format_id}+{audio_id}" if audio_id else video.format_id
+
+
+class PlaylistSummary:
+    """Running totals over the entries of a playlist as their metadata resolves.
+
+    Offers the same ``estimate``/``available_resolutions`` interface as a
+    FormatIndex so the GUI can show either. Entries are added from a fetch
+    thread while the UI reads, hence the lock; per-entry format lists are
+    folded into sums and not kept.
+    """
+
+    def __init__(self, title, count):
+        self.title = title
+        self.count = count
+        self._lock = threading.Lock()
+        self._sizes = {key: 0 for key in ((r, p) for r in ALL_RESOLUTIONS for p in BITRATE_MAP)}
+        self._resolutions = set()
+        self._durations = []
+        self._resolved = 0
+        self._failed = 0
+
+    def add(self, info):
+        """Fold one resolved entry into the totals (builds its FormatIndex on the caller's thread)."""
+        index = FormatIndex(info.get("formats") or [], info.get("duration") or 0)
+        with self._lock:
+            self._resolved += 1
+            self._durations.append(index.duration)
+            if info.get("formats"):
+                self._resolutions.update(index.available_resolutions)
+            for key in self._sizes:
+                self._sizes[key] += index.estimate(*key)
+
+    def add_failure(self):
+        with self._lock:
+            self._failed += 1
+
+    @property
+    def duration(self):
+        with self._lock:
+            return sum(self._durations)
+
+    def clip_seconds(self, start, end):
+        """Combined length of the parts of the resolved entries a time range covers."""
+        with self._lock:
+            return sum(clip_seconds(start, end, duration) for duration in self._durations)
+
+    @property
+    def resolved(self):
+        """(resolved, failed) entry counts."""
+        with self._lock:
+            return self._resolved, self._failed
+
+    @property
+    def available_resolutions(self):
+        with self._lock:
+            return sorted(self._resolutions) if self._resolutions else [720]
+
+    def estimate(self, resolution, preset):
+        """Combined estimated size of the entries resolved so far."""
+        with self._lock:
+            return self._sizes.get((resolution, preset), 0)
+
+    def format_selector(self, resolution, preset):
+        return None  # each entry picks its own streams
+
+
+def format_size(size_bytes):
+    if size_bytes >= 1_073_741_824:
+        return f"{size_bytes / 1_073_741_824:.1f} GB"
+    return f"{size_bytes / 1_048_576:.0f} MB"
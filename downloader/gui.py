@@ -0,0 +1,1074 @@
+"""Tk/customtkinter desktop front end. Imported only when the window is launched."""
+
+import argparse
+import importlib.util
+import sys
+import os
+import threading
+import time
+import tkinter as tk
+from tkinter import filedialog, messagebox
+
+try:
+    import customtkinter as ctk
+except ImportError:
+    root = tk.Tk()
+    root.withdraw()
+    messagebox.showerror(
+        "Missing Dependency",
+        "customtkinter is not installed.\n\n"
+        "Please run:\n  pip install customtkinter\n\n"
+        "Then restart this application."
+    )
+    sys.exit(1)
+
+from .archive import open_default_archive
+from .bandwidth import BandwidthLimiter, BandwidthSchedule, format_limit, mbit_to_bytes
+from .cache import app_data_dir, open_default_cache
+from .client import DaemonClient, RemoteEngine, RemoteHistory, RemoteLimiter, RemoteQueue, RemoteRunner
+from .daemon import DEFAULT_PORT, TOKEN_ENV, read_token
+from .deadline import parse_deadline
+from .diskspace import DiskBudget, InsufficientSpace, job_need
+from .formats import FormatIndex, PlaylistSummary, format_size
+from .jobqueue import CANCELLED, DONE, FAILED, PENDING, RUNNING, QueueRunner, open_default_queue
+from .library import open_default_library
+from .metrics import describe_phases, describe_record, format_duration, open_default_history
+from .options import DEFAULT_CONNECTIONS, DEFAULT_WORKERS, DownloadOptions
+from .progress import format_progress, format_rate
+from .timerange import format_time, parse_time, validate_range
+from .uiprofile import LoopMonitor, ProfileSession, format_loop_stats
+
+ctk.set_appearance_mode("dark")
+ctk.set_default_color_theme("blue")
+
+
+class YouTubeDownloaderApp:
+    DEFAULT_FOLDER = r"C:\Users\mglas\Documents\Drum Tutorials"
+
+    # Progress is drained from the download threads once per UI frame
+    PROGRESS_FRAME_MS = 50
+
+    # Number of playlist videos downloaded at once (one YoutubeDL per worker)
+    WORKER_CHOICES = ["1", "2", "3", "4", "6", "8"]
+    # Range requests per stream; 1 uses yt-dlp's single-connection downloader
+    CONNECTION_CHOICES = ["1", "2", "4", "8"]
+    # Total bandwidth limit in Mbit/s, shared by every download; changeable while downloading
+    LIMIT_CHOICES = ["Off", "5", "10", "20", "50", "100"]
+    BANDWIDTH_REFRESH_MS = 500
+    HISTORY_JOBS = 100  # most recent jobs listed in the History window
+    QUEUE_REFRESH_MS = 2000  # the Queue window's retry countdowns
+    SHUTDOWN_TIMEOUT = 5.0  # seconds to wait on exit for the running job to stop
+    OVERLAY_REFRESH_MS = 250  # the debug overlay's loop-lag readout
+
+    def __init__(self, root, daemon=None, debug_ui=False):
+        self.root = root
+        self._daemon = daemon  # a DaemonClient: queue, download and fetch on that daemon instead of here
+        self.root.title(f"YouTube Downloader — {daemon.base_url}" if daemon else "YouTube Downloader")
+        self.root.geometry("600x975")
+        self.root.minsize(520, 975)
+        self.root.resizable(True, False)
+
+        self._downloading = False  # a queued job is running
+        self._job_generation = 0  # bumped per job so polling loops of a finished job stop
+        self._fetching = False
+        self._video_duration = 0  # seconds
+        self._available_resolutions = []
+        self._format_index = None  # FormatIndex of the fetched video, built off the UI thread
+        self._fetched_url = None
+        self._clip_range = (None, None)  # (start, end) seconds from the Time Range fields
+        self._clip_error = None  # why the Time Range fields can't be used, or None
+        self._fetch_generation = 0  # bumped per Fetch so stale playlist updates are ignored
+        self._resolve_cancel = threading.Event()
+        self._history_window = None
+        self._runner = None  # started by _load_engine; resumes jobs left from the last session
+        self._queue_window = None
+        self._closing = False
+        if daemon is None:
+            self._metadata_cache = open_default_cache()
+            self._archive = open_default_archive()
+            self._library = open_default_library()
+            self._history = open_default_history()
+            self._queue = open_default_queue()
+            self._limiter = BandwidthLimiter()
+            self._disk_budget = DiskBudget()
+        else:
+            # The daemon keeps all of these; its folders are on its machine, so no local disk check
+            self._metadata_cache = self._archive = self._library = self._disk_budget = None
+            self._history = RemoteHistory(daemon)
+            self._queue = RemoteQueue(daemon)
+            self._limiter = RemoteLimiter(daemon)
+        self._engine = None  # built by _load_engine once yt_dlp is imported
+        self._engine_error = None
+        self._engine_ready = threading.Event()
+        self._progress_channel = None  # drained by _poll_progress while a download runs
+        self._loop_monitor = None  # attached while the debug overlay is shown
+        self._overlay = None
+        self._overlay_after = None
+        self._profile = None  # a running ProfileSession
+
+        self.url_var = tk.StringVar()
+        self.mode_var = tk.StringVar(value="Video")
+        self.quality_var = tk.StringVar(value="720")
+        self.preset_var = tk.StringVar(value="Best")
+        self.audio_format_var = tk.StringVar(value="mp3")
+        self.folder_var = tk.StringVar(value=self.DEFAULT_FOLDER)
+        self.workers_var = tk.StringVar(value=str(DEFAULT_WORKERS))
+        self.connections_var = tk.StringVar(value=str(DEFAULT_CONNECTIONS))
+        self.schedule_var = tk.StringVar()
+        self.force_refresh_var = tk.BooleanVar(value=False)
+
+        self._build_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        # Hidden diagnostics for stutters: loop-lag overlay and profiler
+        self.root.bind_all("<Control-Shift-D>", self._toggle_overlay)
+        self.root.bind_all("<Control-Shift-P>", self._toggle_profiler)
+        if debug_ui:
+            self._toggle_overlay()
+        threading.Thread(target=self._load_engine, daemon=True, name="engine-loader").start()
+
+    # ── GUI construction ─────────────────────────────────────
+
+    def _build_ui(self):
+        # Main card container
+        card = ctk.CTkFrame(self.root, corner_radius=12)
+        card.pack(fill="both", expand=True, padx=16, pady=16)
+        self._card = card
+
+        # Title
+        ctk.CTkLabel(card, text="YouTube Downloader", font=("Segoe UI", 20, "bold")).pack(
+            anchor="w", padx=20, pady=(20, 4)
+        )
+        ctk.CTkLabel(card, text="Download videos, playlists, or audio only", font=("Segoe UI", 12),
+                      text_color="#888").pack(anchor="w", padx=20, pady=(0, 12))
+
+        # URL + Fetch button
+        ctk.CTkLabel(card, text="YouTube URL", font=("Segoe UI", 13, "bold")).pack(anchor="w", padx=20)
+        url_frame = ctk.CTkFrame(card, fg_color="transparent")
+        url_frame.pack(fill="x", padx=20, pady=(4, 12))
+        self.url_entry = ctk.CTkEntry(url_frame, textvariable=self.url_var, placeholder_text="Paste YouTube URL here...",
+                                       height=36, font=("Segoe UI", 12))
+        self.url_entry.pack(side="left", fill="x", expand=True)
+        self.fetch_btn = ctk.CTkButton(url_frame, text="Fetch", command=self._fetch_info,
+                                        width=80, height=36, font=("Segoe UI", 12),
+                                        fg_color="#555", hover_color="#666")
+        self.fetch_btn.pack(side="left", padx=(8, 0))
+
+        # Video info label (hidden until fetch)
+        self.info_label = ctk.CTkLabel(card, text="", font=("Segoe UI", 11), text_color="#aaa", anchor="w")
+
+        # Mode (Video / Audio)
+        self.mode_label = ctk.CTkLabel(card, text="Mode", font=("Segoe UI", 13, "bold"))
+        self.mode_seg = ctk.CTkSegmentedButton(card, values=["Video", "Audio"],
+                                                command=self._on_mode_change, font=("Segoe UI", 12))
+        self.mode_seg.set("Video")
+
+        # Time range (hidden until fetch): only that part of each video is downloaded
+        self.range_label = ctk.CTkLabel(card, text="Time Range (optional)", font=("Segoe UI", 13, "bold"))
+        rframe = ctk.CTkFrame(card, fg_color="transparent")
+        rframe.grid_columnconfigure((0, 1), weight=1, uniform="range")
+        self.clip_start_entry = ctk.CTkEntry(rframe, height=28, font=("Segoe UI", 12),
+                                             placeholder_text="From, e.g. 12:30 (blank: start)")
+        self.clip_start_entry.grid(row=0, column=0, sticky="ew", padx=(0, 6))
+        self.clip_end_entry = ctk.CTkEntry(rframe, height=28, font=("Segoe UI", 12),
+                                           placeholder_text="To, e.g. 15:45 (blank: end)")
+        self.clip_end_entry.grid(row=0, column=1, sticky="ew", padx=(6, 0))
+        for entry in (self.clip_start_entry, self.clip_end_entry):
+            entry.bind("<KeyRelease>", self._on_range_change)
+            entry.bind("<FocusOut>", self._on_range_change)
+        self._range_frame = rframe
+        self._range_border = self.clip_start_entry.cget("border_color")
+
+        # Resolution selector (dynamic, hidden until fetch)
+        self.resolution_label = ctk.CTkLabel(card, text="Resolution", font=("Segoe UI", 13, "bold"))
+        self.quality_seg = None  # built dynamically after fetch
+
+        # Quality preset selector (hidden until fetch in Video mode)
+        self.preset_label = ctk.CTkLabel(card, text="Quality", font=("Segoe UI", 13, "bold"))
+        self.preset_seg = ctk.CTkSegmentedButton(card, values=["Low", "Medium", "High", "Best"],
+                                                   command=self._on_preset_change, font=("Segoe UI", 12))
+        self.preset_seg.set("Best")
+
+        # Size estimate label, and the deadline that lets quality drop to finish in time
+        sframe = ctk.CTkFrame(card, fg_color="transparent")
+        self.size_label = ctk.CTkLabel(sframe, text="", font=("Segoe UI", 12, "bold"), text_color="#4a9eff",
+                                       anchor="w")
+        self.size_label.pack(side="left", fill="x", expand=True)
+        self.deadline_entry = ctk.CTkEntry(sframe, width=150, height=28, font=("Segoe UI", 12),
+                                           placeholder_text="Finish by, e.g. 06:30")
+        self.deadline_entry.pack(side="right")
+        self._size_frame = sframe
+
+        # Audio format selector (hidden until fetch in Audio mode)
+        self.format_label = ctk.CTkLabel(card, text="Format", font=("Segoe UI", 13, "bold"))
+        self.format_seg = ctk.CTkSegmentedButton(card, values=["MP3", "M4A", "WAV", "FLAC", "OGG"],
+                                                  command=self._on_format_change, font=("Segoe UI", 12))
+        self.format_seg.set("MP3")
+
+        # Output folder (always visible)
+        self.saveto_label = ctk.CTkLabel(card, text="Save To", font=("Segoe UI", 13, "bold"))
+        self.saveto_label.pack(anchor="w", padx=20)
+        fframe = ctk.CTkFrame(card, fg_color="transparent")
+        fframe.pack(fill="x", padx=20, pady=(4, 12))
+        self.folder_entry = ctk.CTkEntry(fframe, textvariable=self.folder_var, height=36, font=("Segoe UI", 12))
+        self.folder_entry.pack(side="left", fill="x", expand=True)
+        self.browse_btn = ctk.CTkButton(fframe, text="Browse", command=self._browse_folder, width=80, height=36,
+                                         font=("Segoe UI", 12), fg_color="#555", hover_color="#666")
+        self.browse_btn.pack(side="left", padx=(8, 0))
+        self._folder_frame = fframe
+
+        # Parallel playlist downloads and connections per stream (always visible), side by side
+        pframe = ctk.CTkFrame(card, fg_color="transparent")
+        pframe.pack(fill="x", padx=20, pady=(0, 8))
+        pframe.grid_columnconfigure((0, 1), weight=1, uniform="parallel")
+        self.workers_label = ctk.CTkLabel(pframe, text="Parallel Downloads", font=("Segoe UI", 13, "bold"))
+        self.workers_label.grid(row=0, column=0, sticky="w")
+        self.workers_seg = ctk.CTkSegmentedButton(pframe, values=self.WORKER_CHOICES,
+                                                   command=self._on_workers_change, font=("Segoe UI", 12))
+        self.workers_seg.set(str(DEFAULT_WORKERS))
+        self.workers_seg.grid(row=1, column=0, sticky="ew", padx=(0, 6), pady=(4, 0))
+        self.connections_label = ctk.CTkLabel(pframe, text="Connections per Stream", font=("Segoe UI", 13, "bold"))
+        self.connections_label.grid(row=0, column=1, sticky="w", padx=(6, 0))
+        self.connections_seg = ctk.CTkSegmentedButton(pframe, values=self.CONNECTION_CHOICES,
+                                                       command=self._on_connections_change, font=("Segoe UI", 12))
+        self.connections_seg.set(str(DEFAULT_CONNECTIONS))
+        self.connections_seg.grid(row=1, column=1, sticky="ew", padx=(6, 0), pady=(4, 0))
+
+        # Bandwidth limit and its time-of-day schedule (stay enabled while downloading)
+        lframe = ctk.CTkFrame(card, fg_color="transparent")
+        lframe.pack(fill="x", padx=20, pady=(0, 8))
+        lframe.grid_columnconfigure((0, 1), weight=1, uniform="bandwidth")
+        self.limit_label = ctk.CTkLabel(lframe, text="Bandwidth Limit (Mbit/s)", font=("Segoe UI", 13, "bold"))
+        self.limit_label.grid(row=0, column=0, sticky="w")
+        self.limit_seg = ctk.CTkSegmentedButton(lframe, values=self.LIMIT_CHOICES,
+                                                 command=self._on_limit_change, font=("Segoe UI", 12))
+        self.limit_seg.set("Off")
+        self.limit_seg.grid(row=1, column=0, sticky="ew", padx=(0, 6), pady=(4, 0))
+        self.schedule_label = ctk.CTkLabel(lframe, text="Schedule", font=("Segoe UI", 13, "bold"))
+        self.schedule_label.grid(row=0, column=1, sticky="w", padx=(6, 0))
+        self.schedule_entry = ctk.CTkEntry(lframe, textvariable=self.schedule_var, height=28, font=("Segoe UI", 12),
+                                           placeholder_text="e.g. 08:00-18:00=20")
+        self.schedule_entry.grid(row=1, column=1, sticky="ew", padx=(6, 0), pady=(4, 0))
+        self.schedule_entry.bind("<Return>", self._on_schedule_change)
+        self.schedule_entry.bind("<FocusOut>", self._on_schedule_change)
+        self._schedule_border = self.schedule_entry.cget("border_color")
+        self.force_refresh_chk = ctk.CTkCheckBox(card, text="Re-download videos that are already up to date",
+                                                 variable=self.force_refresh_var, font=("Segoe UI", 12))
+        self.force_refresh_chk.pack(anchor="w", padx=20, pady=(0, 12))
+
+        # Progress
+        self.progress_bar = ctk.CTkProgressBar(card, height=14, corner_radius=7)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(fill="x", padx=20, pady=(8, 2))
+        self.status_label = ctk.CTkLabel(card, text="Ready — paste a URL and click Fetch", font=("Segoe UI", 11), anchor="w")
+        self.status_label.pack(fill="x", padx=20)
+        self.speed_label = ctk.CTkLabel(card, text="", font=("Segoe UI", 11), text_color="#888", anchor="w")
+        self.speed_label.pack(fill="x", padx=20)
+        self.bandwidth_label = ctk.CTkLabel(card, text="", font=("Segoe UI", 11), text_color="#888", anchor="w")
+        self.bandwidth_label.pack(fill="x", padx=20)
+
+        # Buttons
+        bframe = ctk.CTkFrame(card, fg_color="transparent")
+        bframe.pack(pady=(12, 20))
+        self.download_btn = ctk.CTkButton(bframe, text="Download", command=self._start_download,
+                                           width=120, height=40, font=("Segoe UI", 13, "bold"),
+                                           state="disabled")
+        self.download_btn.pack(side="left", padx=6)
+        self.cancel_btn = ctk.CTkButton(bframe, text="Cancel", command=self._cancel_download,
+                                         width=100, height=40, font=("Segoe UI", 13),
+                                         fg_color="#555", hover_color="#666", state="disabled")
+        self.cancel_btn.pack(side="left", padx=6)
+        self.queue_btn = ctk.CTkButton(bframe, text="Queue", command=self._show_queue,
+                                        width=90, height=40, font=("Segoe UI", 13),
+                                        fg_color="#555", hover_color="#666")
+        self.queue_btn.pack(side="left", padx=6)
+        self.history_btn = ctk.CTkButton(bframe, text="History", command=self._show_history,
+                                          width=90, height=40, font=("Segoe UI", 13),
+                                          fg_color="#555", hover_color="#666",
+                                          state="normal" if self._history else "disabled")
+        self.history_btn.pack(side="left", padx=6)
+        self._update_queue_button()
+
+    def _show_video_options(self):
+        """Show resolution, preset, and size estimate controls for Video mode."""
+        # Pack in order before the Save To label
+        self.resolution_label.pack(anchor="w", padx=20, before=self.saveto_label)
+        if self.quality_seg:
+            self.quality_seg.pack(fill="x", padx=20, pady=(4, 12), before=self.saveto_label)
+        self.preset_label.pack(anchor="w", padx=20, before=self.saveto_label)
+        self.preset_seg.pack(fill="x", padx=20, pady=(4, 4), before=self.saveto_label)
+        self._size_frame.pack(fill="x", padx=20, pady=(0, 12), before=self.saveto_label)
+        self._update_size_estimate()
+
+    def _hide_video_options(self):
+        """Hide resolution, preset, and size estimate controls."""
+        self.resolution_label.pack_forget()
+        if self.quality_seg:
+            self.quality_seg.pack_forget()
+        self.preset_label.pack_forget()
+        self.preset_seg.pack_forget()
+        self._size_frame.pack_forget()
+
+    def _show_audio_options(self):
+        """Show audio format selector."""
+        self.format_label.pack(anchor="w", padx=20, before=self.saveto_label)
+        self.format_seg.pack(fill="x", padx=20, pady=(4, 12), before=self.saveto_label)
+
+    def _hide_audio_options(self):
+        """Hide audio format selector."""
+        self.format_label.pack_forget()
+        self.format_seg.pack_forget()
+
+    def _show_options_for_mode(self):
+        """Show the appropriate options panel based on current mode."""
+        if not self._available_resolutions:
+            return
+        if self.mode_var.get() == "Video":
+            self._hide_audio_options()
+            self._show_video_options()
+        else:
+            self._hide_video_options()
+            self._show_audio_options()
+
+    def _on_mode_change(self, value):
+        self.mode_var.set(value)
+        self._show_options_for_mode()
+
+    def _on_quality_change(self, value):
+        self.quality_var.set(value.replace("p", ""))
+        self._update_size_estimate()
+
+    def _on_preset_change(self, value):
+        self.preset_var.set(value)
+        self._update_size_estimate()
+
+    def _on_format_change(self, value):
+        self.audio_format_var.set(value.lower())
+
+    def _on_workers_change(self, value):
+        self.workers_var.set(value)
+
+    def _on_connections_change(self, value):
+        self.connections_var.set(value)
+
+    def _on_limit_change(self, value):
+        self._limiter.set_rate(None if value == "Off" else mbit_to_bytes(float(value)))
+        self._update_bandwidth_label()
+
+    def _on_schedule_change(self, event=None):
+        text = self.schedule_var.get().strip()
+        try:
+            schedule = BandwidthSchedule.parse(text) if text else None
+        except ValueError:
+            self.schedule_entry.configure(border_color="#c0392b")
+            return
+        self.schedule_entry.configure(border_color=self._schedule_border)
+        self._limiter.set_schedule(schedule)
+        self._update_bandwidth_label()
+
+    def _on_range_change(self, event=None):
+        """Parse the Time Range fields; an invalid one is outlined in red and blocks Download."""
+        values, error = [], None
+        for entry in (self.clip_start_entry, self.clip_end_entry):
+            try:
+                values.append(parse_time(entry.get()))
+            except ValueError as e:
+                values.append(None)
+                error = error or str(e)
+                entry.configure(border_color="#c0392b")
+            else:
+                entry.configure(border_color=self._range_border)
+        if error is None:
+            # A playlist's videos each have their own length; the engine checks them one by one
+            duration = None if isinstance(self._format_index, PlaylistSummary) else self._video_duration
+            try:
+                validate_range(*values, duration)
+            except ValueError as e:
+                error = str(e)
+                for entry in (self.clip_start_entry, self.clip_end_entry):
+                    entry.configure(border_color="#c0392b")
+        self._clip_range = (None, None) if error else tuple(values)
+        self._clip_error = error
+        self._update_size_estimate()
+
+    def _clip_share(self, index):
+        """Fraction of the fetched video(s) the time range covers; 1 without a range."""
+        start, end = self._clip_range
+        if (start is None and end is None) or not index.duration:
+            return 1.0
+        return index.clip_seconds(start, end) / index.duration
+
+    def _update_bandwidth_label(self):
+        """Show the limit in force and, while downloading, each job's measured rate."""
+        rate, scheduled = self._limiter.effective_rate()
+        if rate is None and not scheduled and not self._downloading:
+            self.bandwidth_label.configure(text="")
+            return
+        parts = [f"Limit: {format_limit(rate)}{' (scheduled)' if scheduled else ''}"]
+        job_rates = self._limiter.job_rates()
+        if len(job_rates) == 1:
+            parts.append(f"Job: {format_rate(job_rates[0][1])}")
+        elif job_rates:
+            parts.append("Jobs: " + ", ".join(format_rate(r) for _, r in job_rates))
+        self.bandwidth_label.configure(text="  |  ".join(parts))
+
+    def _poll_bandwidth(self, generation):
+        if generation != self._job_generation:
+            return
+        self._update_bandwidth_label()
+        if self._downloading:
+            self.root.after(self.BANDWIDTH_REFRESH_MS, self._poll_bandwidth, generation)
+
+    def _update_size_estimate(self):
+        """Display the estimated file size precomputed by the format index."""
+        index = self._format_index
+        if index is None or not self._available_resolutions:
+            self.size_label.configure(text="")
+            return
+
+        size_bytes = index.estimate(int(self.quality_var.get()), self.preset_var.get()) * self._clip_share(index)
+        if size_bytes <= 0:
+            self.size_label.configure(text="")
+            return
+
+        text = f"Estimated size: ~{format_size(size_bytes)}"
+        start, end = self._clip_range
+        if start or end:
+            text += f" for {format_time(index.clip_seconds(start, end))}"
+        if isinstance(index, PlaylistSummary):
+            resolved, failed = index.resolved
+            if resolved + failed < index.count:
+                text += f"  (first {resolved} of {index.count} videos)"
+        self.size_label.configure(text=text)
+
+    # ── Engine start-up (background thread) ───────────────────
+
+    def _load_engine(self):
+        """Import yt_dlp and warm a YoutubeDL while the window is already up."""
+        if self._daemon is not None:
+            self._connect_daemon()
+            return
+        try:
+            from .engine import DownloadEngine
+
+            engine = DownloadEngine(metadata_cache=self._metadata_cache, archive=self._archive,
+                                    limiter=self._limiter, history=self._history, library=self._library,
+                                    disk_budget=self._disk_budget)
+        except Exception as e:
+            self._engine_error = f"yt-dlp failed to load: {e}"
+            self._engine_ready.set()
+            return
+        try:
+            engine.warm_up()
+        except Exception:
+            pass  # warming is an optimization; the first fetch will do the work instead
+        self._engine = engine
+        self._engine_ready.set()
+
+        # Callbacks come from the runner thread; the UI is only touched on the main thread.
+        # Once closing, the main thread is waiting on the runner and must not be called into.
+        self._runner = QueueRunner(
+            self._queue, engine,
+            on_start=lambda job, channel: self._closing or self.root.after(0, self._on_job_started, job, channel),
+            on_finish=lambda job, result: self._closing or self.root.after(0, self._on_job_finished, job, result),
+        )
+        self._runner.start()
+        waiting = self._queue.counts().get(PENDING, 0)
+        if waiting:
+            text = f"Resuming {waiting} queued download{'s' if waiting != 1 else ''}..."
+            self.root.after(0, lambda: self.status_label.configure(text=text))
+
+    def _connect_daemon(self):
+        """Fetch and download through the daemon; its event stream drives the progress bar and queue."""
+        self._engine = RemoteEngine(self._daemon)
+        self._engine_ready.set()
+
+        def on_connection(error):
+            text = f"Connected to {self._daemon.base_url}" if error is None else f"{error} — retrying..."
+            self._closing or self.root.after(0, lambda: self._downloading or self.status_label.configure(text=text))
+
+        self._runner = RemoteRunner(
+            self._daemon, self._queue, self._limiter,
+            on_start=lambda job, channel: self._closing or self.root.after(0, self._on_job_started, job, channel),
+            on_finish=lambda job, result: self._closing or self.root.after(0, self._on_job_finished, job, result),
+            on_connection=on_connection,
+            on_jobs_changed=lambda: self._closing or self.root.after(0, self._update_queue_button),
+        )
+        self._runner.start()
+
+    def _wait_for_engine(self):
+        """The engine, once loaded; Fetch/Download threads started before that wait here."""
+        self._engine_ready.wait()
+        if self._engine is None:
+            raise RuntimeError(self._engine_error)
+        return self._engine
+
+    # ── Fetch video info ────────────────────────────────────────
+
+    def _fetch_info(self):
+        url = self.url_var.get().strip()
+        if not url:
+            messagebox.showwarning("Input Required", "Please enter a YouTube URL.")
+            return
+        if self._fetching:
+            return
+
+        self._fetching = True
+        self._fetch_generation += 1
+        self._resolve_cancel.set()  # stop resolving the previous playlist
+        self._resolve_cancel = threading.Event()
+        self.fetch_btn.configure(state="disabled", text="...")
+        self.status_label.configure(text="Fetching video info...")
+        self.download_btn.configure(state="disabled")
+
+        # Hide any previous options
+        self._hide_video_options()
+        self._hide_audio_options()
+        self.info_label.pack_forget()
+        self.mode_label.pack_forget()
+        self.mode_seg.pack_forget()
+        self.range_label.pack_forget()
+        self._range_frame.pack_forget()
+
+        thread = threading.Thread(target=self._fetch_thread,
+                                  args=(url, self._fetch_generation, self._resolve_cancel), daemon=True)
+        thread.start()
+
+    def _fetch_thread(self, url, generation, cancel_event):
+        try:
+            info = self._wait_for_engine().fetch_listing(url)
+            if info.get("_type") in ("playlist", "multi_video"):
+                self._resolve_playlist(url, info, generation, cancel_event)
+                return
+            duration = info.get("duration", 0) or 0
+            title = info.get("title", "Unknown")
+            index = FormatIndex(info.get("formats", []), duration)
+            self.root.after(0, self._on_fetch_complete, True, url, title, duration, index)
+        except Exception as e:
+            self.root.after(0, self._on_fetch_complete, False, url, str(e), 0, None)
+
+    def _resolve_playlist(self, url, info, generation, cancel_event):
+        """Show the entry count right away, then stream per-entry totals in as they resolve."""
+        entries = info["entries"]
+        summary = PlaylistSummary(info.get("title") or "Playlist", len(entries))
+        self.root.after(0, self._on_fetch_complete, True, url, summary.title, 0, summary)
+        if not entries:
+            return
+
+        def on_resolved(index, entry_info, error):
+            if entry_info:
+                summary.add(entry_info)
+            else:
+                summary.add_failure()
+            self.root.after(0, self._on_playlist_progress, generation, summary)
+
+        try:
+            self._wait_for_engine().resolve_entries(entries, on_resolved, cancel_event)
+        except Exception:
+            pass  # the listing is already shown; totals just stay partial
+
+    def _on_playlist_progress(self, generation, summary):
+        if generation != self._fetch_generation:
+            return
+        self.info_label.configure(text=self._describe_playlist(summary))
+        available = summary.available_resolutions
+        if available != self._available_resolutions:
+            self._available_resolutions = available
+            self._build_quality_selector(keep_selection=True)
+            self._show_options_for_mode()
+        else:
+            self._update_size_estimate()
+
+    def _describe_playlist(self, summary):
+        resolved, failed = summary.resolved
+        text = f"{summary.title}  ({summary.count} videos"
+        if resolved:
+            text += f", {self._format_duration(summary.duration)} total"
+        if resolved + failed < summary.count:
+            text += f" — resolving {resolved + failed}/{summary.count}"
+        elif failed:
+            text += f", {failed} unavailable"
+        return text + ")"
+
+    @staticmethod
+    def _format_duration(duration):
+        mins, secs = divmod(duration, 60)
+        hours, mins = divmod(mins, 60)
+        if hours:
+            return f"{int(hours)}h {int(mins)}m {int(secs)}s"
+        return f"{int(mins)}m {int(secs)}s"
+
+    def _on_fetch_complete(self, success, url, title_or_error, duration, index):
+        self._fetching = False
+        self.fetch_btn.configure(state="normal", text="Fetch")
+
+        if not success:
+            self.status_label.configure(text="Ready")
+            messagebox.showerror("Fetch Failed", title_or_error)
+            return
+
+        self._video_duration = duration
+        self._available_resolutions = index.available_resolutions
+        self._format_index = index
+        self._fetched_url = url
+
+        # Show video info
+        if isinstance(index, PlaylistSummary):
+            self.info_label.configure(text=self._describe_playlist(index))
+        else:
+            self.info_label.configure(text=f"{title_or_error}  ({self._format_duration(duration)})")
+        self.info_label.pack(fill="x", padx=20, pady=(0, 8), before=self.saveto_label)
+
+        # Show mode selector
+        self.mode_label.pack(anchor="w", padx=20, before=self.saveto_label)
+        self.mode_seg.pack(fill="x", padx=20, pady=(4, 12), before=self.saveto_label)
+
+        # Show the time range, checked against the new video's length
+        self.range_label.pack(anchor="w", padx=20, before=self.saveto_label)
+        self._range_frame.pack(fill="x", padx=20, pady=(4, 12), before=self.saveto_label)
+        self._on_range_change()
+
+        self._build_quality_selector()
+        self.preset_var.set("Best")
+        self.preset_seg.set("Best")
+
+        # Show options based on current mode
+        self._show_options_for_mode()
+
+        self.download_btn.configure(state="normal")
+        self.status_label.configure(text="Ready to download")
+
+    def _build_quality_selector(self, keep_selection=False):
+        """(Re)build the resolution segmented button with the available options."""
+        res_values = [f"{r}p" for r in self._available_resolutions]
+        if self.quality_seg:
+            self.quality_seg.destroy()
+        self.quality_seg = ctk.CTkSegmentedButton(self._card, values=res_values,
+                                                    command=self._on_quality_change, font=("Segoe UI", 12))
+        current = int(self.quality_var.get())
+        if keep_selection and current in self._available_resolutions:
+            self.quality_seg.set(f"{current}p")
+        else:
+            # Default to highest available
+            default_res = res_values[-1]
+            self.quality_seg.set(default_res)
+            self.quality_var.set(str(self._available_resolutions[-1]))
+
+    # ── Actions ───────────────────────────────────────────────
+
+    def _browse_folder(self):
+        current = self.folder_var.get()
+        initial = current if os.path.isdir(current) else os.path.expanduser("~")
+        chosen = filedialog.askdirectory(title="Select Download Folder", initialdir=initial)
+        if chosen:
+            self.folder_var.set(os.path.normpath(chosen))
+
+    def _start_download(self):
+        url = self.url_var.get().strip()
+        if not url:
+            messagebox.showwarning("Input Required", "Please enter a YouTube URL.")
+            return
+
+        output_dir = self.folder_var.get().strip()
+        if not output_dir:
+            messagebox.showwarning("Input Required", "Please select a download folder.")
+            return
+        if self._daemon is None:
+            try:
+                os.makedirs(output_dir, exist_ok=True)
+            except OSError as e:
+                messagebox.showerror("Invalid Folder", f"Cannot create folder:\n{output_dir}\n\n{e}")
+                return
+
+        if self._engine_error is not None:
+            messagebox.showerror("Download Failed", self._engine_error)
+            return
+        if self._clip_error:
+            messagebox.showwarning("Invalid Time Range", self._clip_error)
+            return
+        clip_start, clip_end = self._clip_range
+        deadline = None
+        deadline_text = self.deadline_entry.get().strip()
+        if self.mode_var.get() == "Video" and deadline_text:
+            try:
+                deadline = parse_deadline(deadline_text)
+            except ValueError as e:
+                messagebox.showwarning("Invalid Deadline", str(e))
+                return
+
+        options = DownloadOptions(
+            output_dir=output_dir,
+            mode=self.mode_var.get(),
+            quality=int(self.quality_var.get()),
+            preset=self.preset_var.get(),
+            audio_format=self.audio_format_var.get(),
+            workers=int(self.workers_var.get()),
+            connections=int(self.connections_var.get()),
+            force_refresh=self.force_refresh_var.get(),
+            clip_start=clip_start,
+            clip_end=clip_end,
+            deadline=deadline,
+        )
+        if options.mode == "Video" and self._format_index and url == self._fetched_url:
+            # Download exactly the streams the size estimate was computed from
+            options.format_selection = self._format_index.format_selector(options.quality, options.preset)
+            if not self._check_disk_space(options):
+                return
+        try:
+            self._queue.add(url, options)
+        except OSError as e:
+            # Only a daemon's queue fails here: unreachable, or it refused the options
+            messagebox.showerror("Download Failed", str(e))
+            return
+        if self._runner:
+            self._runner.wake()
+        if self._downloading:
+            waiting = self._queue.counts().get(PENDING, 0)
+            self.speed_label.configure(text=f"Queued — {waiting} waiting")
+        else:
+            self.status_label.configure(text="Starting download..." if self._runner else "Queued — loading yt-dlp...")
+        self._update_queue_button()
+        self._refresh_queue_window()
+
+    def _check_disk_space(self, options):
+        """Refuse a download the fetched estimate says can't fit; the engine checks each video again."""
+        if self._disk_budget is None:
+            return True  # the daemon's drive; it checks each video itself
+        index = self._format_index
+        count = index.resolved[0] if isinstance(index, PlaylistSummary) else 1  # the estimate covers these
+        size = index.estimate(options.quality, options.preset) * self._clip_share(index)
+        need = job_need(size, count, options.workers)
+        try:
+            self._disk_budget.check(options.output_dir, need)
+        except InsufficientSpace as e:
+            messagebox.showerror("Not Enough Disk Space", f"{e}.\n\nFree up space or choose another folder.")
+            return False
+        except OSError:
+            pass  # can't tell; the engine's own check still applies
+        return True
+
+    def _cancel_download(self):
+        if self._downloading and self._runner:
+            try:
+                self._runner.cancel_current()
+            except OSError as e:
+                messagebox.showerror("Cancel Failed", str(e))
+                return
+            self.status_label.configure(text="Cancelling...")
+
+    def _cancel_job(self, job_id):
+        if not self._runner:
+            return
+        try:
+            self._runner.cancel(job_id)
+        except OSError as e:
+            messagebox.showerror("Cancel Failed", str(e))
+            return
+        self._update_queue_button()
+        self._refresh_queue_window()
+
+    def _on_close(self):
+        if self._downloading and self._daemon is None:
+            if messagebox.askokcancel("Download in Progress",
+                                      "A download is running. Stop it and exit?\n\n"
+                                      "It stays in the queue and resumes the next time the app starts."):
+                self._destroy()
+        else:
+            self._destroy()
+
+    def _destroy(self):
+        self._closing = True
+        if self._profile is not None:
+            self._toggle_profiler()  # written out rather than lost
+        if self._loop_monitor is not None:
+            self._loop_monitor.detach()
+        if self._runner:
+            self._runner.stop(self.SHUTDOWN_TIMEOUT)  # the interrupted job is released, not failed
+        self._queue.close()
+        if self._engine:
+            self._engine.close()
+        if self._metadata_cache:
+            self._metadata_cache.close()
+        if self._archive:
+            self._archive.close()
+        if self._library:
+            self._library.close()
+        self.root.destroy()
+
+    # ── UI updates (main thread) ──────────────────────────────
+
+    def _poll_progress(self, generation, audio_format):
+        """Fold everything the download threads reported since the last frame into one redraw."""
+        if generation != self._job_generation or self._progress_channel is None:
+            return
+        snapshot = self._progress_channel.snapshot()
+        if snapshot is not None:
+            status_text, speed_text = format_progress(snapshot, audio_format)
+            self._update_progress(snapshot.percent, status_text, speed_text)
+        self.root.after(self.PROGRESS_FRAME_MS, self._poll_progress, generation, audio_format)
+
+    def _update_progress(self, percent, status_text, speed_text):
+        self.progress_bar.set(percent / 100)
+        self.status_label.configure(text=status_text)
+        self.speed_label.configure(text=speed_text)
+
+    def _on_job_started(self, job, channel):
+        self._downloading = True
+        self._job_generation += 1
+        self._progress_channel = channel
+        self.cancel_btn.configure(state="normal")
+        self.progress_bar.set(0)
+        attempt = f" (attempt {job.attempts} of {job.max_attempts})" if job.attempts > 1 else ""
+        self.status_label.configure(text=f"Starting {job.title or job.url}{attempt}...")
+        self.speed_label.configure(text="")
+        self.root.after(self.PROGRESS_FRAME_MS, self._poll_progress, self._job_generation, job.options.audio_format)
+        self.root.after(self.BANDWIDTH_REFRESH_MS, self._poll_bandwidth, self._job_generation)
+        self._update_queue_button()
+        self._refresh_queue_window()
+
+    def _on_job_finished(self, job, result):
+        self._downloading = False
+        self._job_generation += 1
+        self._progress_channel = None
+        self.cancel_btn.configure(state="disabled")
+        self.progress_bar.set(1.0 if job.state == DONE else 0.0)
+        # Where the job's time went, e.g. "extract 1.2 s · download 34.0 s · ..."
+        self.speed_label.configure(text=describe_phases(result.record) if result and result.record else "")
+        self._update_bandwidth_label()
+        self._update_queue_button()
+        self._refresh_queue_window()
+
+        name = job.title or job.url
+        error = (job.last_error or "").splitlines()[0] if job.last_error else ""
+        if job.state == DONE:
+            message = "Download complete!"
+            if result and (result.total > 1 or result.skipped):
+                message += f" {result.summary()}."
+            if result and result.audio_summary():
+                message += f" Audio: {result.audio_summary()}."
+            self.status_label.configure(text=message)
+        elif job.state == CANCELLED:
+            self.status_label.configure(text="Download cancelled.")
+        elif job.state == PENDING:
+            # Backing off; the Queue window shows the countdown and can retry it right away
+            wait = format_duration(max(job.next_attempt_at - time.time(), 0))
+            self.status_label.configure(text=f"Failed, retrying in {wait}: {error}")
+        elif job.state == FAILED:
+            # No dialog: with an unattended queue it would just pile up; the Queue window keeps the error
+            self.status_label.configure(text=f"Gave up on {name} after {job.attempts} attempts: {error}")
+
+    # ── Diagnostics (hidden) ──────────────────────────────────
+
+    def _toggle_overlay(self, event=None):
+        """Ctrl+Shift+D: show or hide main-loop lag, pending callbacks and the slowest recent callbacks."""
+        if self._overlay is not None:
+            self.root.after_cancel(self._overlay_after)
+            self._overlay.destroy()
+            self._overlay = None
+            self._loop_monitor.detach()
+            self._loop_monitor = None
+            return
+        self._loop_monitor = LoopMonitor()
+        self._loop_monitor.attach(self.root)
+        self._overlay = tk.Label(self.root, font=("Consolas", 9), justify="left", anchor="nw",
+                                 bg="#111", fg="#8f8", padx=6, pady=4)
+        self._overlay.place(relx=1.0, x=-24, y=24, anchor="ne")
+        self._refresh_overlay()
+
+    def _refresh_overlay(self):
+        text = format_loop_stats(self._loop_monitor.snapshot())
+        if self._profile is not None:
+            text += "\nProfiling (Ctrl+Shift+P to stop)"
+        self._overlay.configure(text=text)
+        self._overlay.lift()
+        self._overlay_after = self.root.after(self.OVERLAY_REFRESH_MS, self._refresh_overlay)
+
+    def _toggle_profiler(self, event=None):
+        """Ctrl+Shift+P: profile the UI thread and sample every thread's stack until pressed again."""
+        if self._profile is None:
+            self._profile = ProfileSession(os.path.join(app_data_dir(), "profiles"))
+            self._profile.start()
+            self.status_label.configure(text="Profiling — press Ctrl+Shift+P to stop and save")
+            return
+        profile, self._profile = self._profile, None
+        try:
+            ui_path, threads_path = profile.stop()
+        except OSError as e:
+            if not self._closing:
+                messagebox.showerror("Profile Not Saved", str(e))
+            return
+        if not self._closing:
+            self.status_label.configure(text=f"Profile saved: {ui_path}, {os.path.basename(threads_path)}")
+
+    # ── Queue window ──────────────────────────────────────────
+
+    def _update_queue_button(self):
+        counts = self._queue.counts()
+        active = counts.get(PENDING, 0) + counts.get(RUNNING, 0)
+        self.queue_btn.configure(text=f"Queue ({active})" if active else "Queue")
+
+    def _show_queue(self):
+        if self._queue_window is not None and self._queue_window.winfo_exists():
+            self._queue_window.focus()
+            return
+        window = self._queue_window = ctk.CTkToplevel(self.root)
+        window.title("Download Queue")
+        window.geometry("760x460")
+        self._queue_rows = ctk.CTkScrollableFrame(window)
+        self._queue_rows.pack(fill="both", expand=True, padx=12, pady=(12, 6))
+        self._queue_rows.grid_columnconfigure(1, weight=1)
+        ctk.CTkButton(window, text="Clear Finished", width=120, command=self._clear_finished_jobs).pack(pady=(0, 12))
+        self._refresh_queue_window()
+        self.root.after(self.QUEUE_REFRESH_MS, self._poll_queue_window)
+
+    def _poll_queue_window(self):
+        if self._queue_window is None or not self._queue_window.winfo_exists():
+            return
+        self._refresh_queue_window()
+        self.root.after(self.QUEUE_REFRESH_MS, self._poll_queue_window)
+
+    def _refresh_queue_window(self):
+        if self._queue_window is None or not self._queue_window.winfo_exists():
+            return
+        for child in self._queue_rows.winfo_children():
+            child.destroy()
+        jobs = self._queue.jobs()
+        if not jobs:
+            ctk.CTkLabel(self._queue_rows, text="Nothing queued.", text_color="#888").grid(row=0, column=0, sticky="w")
+            return
+        colors = {RUNNING: "#4a9eff", PENDING: "#aaa", DONE: "#2ecc71", FAILED: "#c0392b", CANCELLED: "#888"}
+        for row, job in enumerate(jobs):
+            ctk.CTkLabel(self._queue_rows, text=job.state, width=70, anchor="w", text_color=colors[job.state],
+                         font=("Segoe UI", 12, "bold")).grid(row=row, column=0, sticky="nw", padx=(0, 8), pady=2)
+            ctk.CTkLabel(self._queue_rows, text=self._describe_job(job), anchor="w", justify="left",
+                         font=("Segoe UI", 11)).grid(row=row, column=1, sticky="ew", pady=2)
+            if job.state == RUNNING:
+                ctk.CTkButton(self._queue_rows, text="Cancel", width=70, fg_color="#555", hover_color="#666",
+                              command=lambda job_id=job.id: self._cancel_job(job_id)).grid(
+                    row=row, column=2, padx=(8, 0), pady=2)
+                continue
+            if job.state != DONE and (job.state != PENDING or job.attempts):
+                ctk.CTkButton(self._queue_rows, text="Retry", width=70,
+                              command=lambda job_id=job.id: self._retry_job(job_id)).grid(
+                    row=row, column=2, padx=(8, 0), pady=2)
+            ctk.CTkButton(self._queue_rows, text="Remove", width=70, fg_color="#555", hover_color="#666",
+                          command=lambda job_id=job.id: self._remove_job(job_id)).grid(
+                row=row, column=3, padx=(8, 0), pady=2)
+
+    @staticmethod
+    def _describe_job(job):
+        lines = [job.title or job.url]
+        details = [f"{job.options.mode}, attempt {job.attempts}/{job.max_attempts}" if job.attempts
+                   else job.options.mode]
+        if job.state == PENDING and job.attempts:
+            details.append(f"retry in {format_duration(max(job.next_attempt_at - time.time(), 0))}")
+        if job.summary:
+            details.append(job.summary)
+        lines.append(", ".join(details))
+        if job.last_error and job.state != DONE:
+            lines.append(job.last_error.splitlines()[0][:120])
+        return "\n".join(lines)
+
+    def _retry_job(self, job_id):
+        try:
+            self._queue.retry(job_id)
+        except OSError as e:
+            messagebox.showerror("Retry Failed", str(e))
+            return
+        if self._runner:
+            self._runner.wake()
+        self._update_queue_button()
+        self._refresh_queue_window()
+
+    def _remove_job(self, job_id):
+        try:
+            self._queue.remove(job_id)
+        except OSError as e:
+            messagebox.showerror("Remove Failed", str(e))
+            return
+        self._update_queue_button()
+        self._refresh_queue_window()
+
+    def _clear_finished_jobs(self):
+        try:
+            self._queue.clear_finished()
+        except OSError as e:
+            messagebox.showerror("Clear Failed", str(e))
+            return
+        self._refresh_queue_window()
+
+    # ── History window ────────────────────────────────────────
+
+    def _show_history(self):
+        if self._history_window is not None and self._history_window.winfo_exists():
+            self._history_window.focus()
+        else:
+            window = self._history_window = ctk.CTkToplevel(self.root)
+            window.title("Download History")
+            window.geometry("760x460")
+            self._history_text = ctk.CTkTextbox(window, font=("Consolas", 12), wrap="none")
+            self._history_text.pack(fill="both", expand=True, padx=12, pady=(12, 6))
+            ctk.CTkButton(window, text="Refresh", width=90, command=self._show_history).pack(pady=(0, 12))
+        self._history_text.configure(state="normal")
+        self._history_text.delete("1.0", "end")
+        self._history_text.insert("end", "Loading...")
+        self._history_text.configure(state="disabled")
+        # The file grows with every job; read it off the UI thread
+        threading.Thread(target=self._load_history, daemon=True).start()
+
+    def _load_history(self):
+        try:
+            records = self._history.recent(self.HISTORY_JOBS)
+        except OSError as e:
+            text = f"Cannot read the history: {e}"
+        else:
+            text = "\n\n".join(self._format_history_entry(r) for r in records) or "No downloads recorded yet."
+        self.root.after(0, self._fill_history, text)
+
+    @staticmethod
+    def _format_history_entry(record):
+        started = time.strftime("%Y-%m-%d %H:%M", time.localtime(record.get("started", 0)))
+        lines = [f"{started}  {record.get('title') or record.get('url')}",
+                 f"    {describe_record(record)}"]
+        phases = describe_phases(record)
+        if phases:
+            lines.append(f"    {phases}")
+        if record.get("error"):
+            lines.append(f"    error: {record['error'].splitlines()[0]}")
+        return "\n".join(lines)
+
+    def _fill_history(self, text):
+        if self._history_window is None or not self._history_window.winfo_exists():
+            return
+        self._history_text.configure(state="normal")
+        self._history_text.delete("1.0", "end")
+        self._history_text.insert("end", text)
+        self._history_text.configure(state="disabled")
+
+
+def _missing_dependency(name):
+    root = tk.Tk()
+    root.withdraw()
+    messagebox.showerror(
+        "Missing Dependency",
+        f"{name} is not installed.\n\n"
+        f"Please run:\n  pip install {name}\n\n"
+        "Then restart this application."
+    )
+    sys.exit(1)
+
+
+def main(argv=None):
+    """``--connect URL`` runs the window as a client of a daemon (``python -m youtube_downloader daemon``)."""
+    parser = argparse.ArgumentParser(prog="youtube_downloader")
+    parser.add_argument("--connect", metavar="URL",
+                        help=f"use the download daemon at URL, e.g. http://127.0.0.1:{DEFAULT_PORT} "
+                             f"(token from ${TOKEN_ENV}, else the one a daemon of this user saved)")
+    parser.add_argument("--debug-ui", action="store_true", help=argparse.SUPPRESS)  # start with the overlay shown
+    args = parser.parse_args(argv)
+    daemon = DaemonClient(args.connect, read_token()) if args.connect else None
+    # Only checked here; yt_dlp itself is imported behind the window by _load_engine (a client never needs it)
+    if daemon is None and importlib.util.find_spec("yt_dlp") is None:
+        _missing_dependency("yt-dlp")
+    root = ctk.CTk()
+    YouTubeDownloaderApp(root, daemon, args.debug_ui)
+    root.mainloop()
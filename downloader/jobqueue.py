@@ -0,0 +1,347 @@
+"""Persistent download queue: jobs survive restarts and failed ones are retried with backoff.
+
+URLs are added to a ``JobQueue`` (SQLite, next to the archive) at any time;
+``QueueRunner`` threads (one per job allowed to run at once) take the next
+due job and run it through ``DownloadEngine.download``, the same path a
+one-off download uses. A job that fails goes back to the queue with an
+exponential, jittered delay and is given up on after ``max_attempts``; a
+job waiting for its retry never holds up the ones behind it. A cancelled
+job is stopped at once and its partial files removed; one interrupted by
+``stop`` keeps them and resumes on the next start.
+"""
+
+import dataclasses
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from .cache import app_data_dir
+from .cancel import CancelToken
+from .options import DownloadOptions
+from .progress import ProgressChannel
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 60.0  # seconds before the first retry
+BACKOFF_CAP = 3600.0
+MEMORY = ":memory:"  # a queue that lasts only as long as the process
+_OPTION_FIELDS = {f.name for f in dataclasses.fields(DownloadOptions)}
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Seconds to wait after failed attempt ``attempt`` (1-based).
+
+    Doubles per attempt up to ``cap``; the actual wait is drawn from the
+    upper half of that, so jobs that failed together don't retry together.
+    """
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+@dataclass
+class QueuedJob:
+    id: int
+    url: str
+    options: DownloadOptions
+    state: str
+    attempts: int  # runs started, including the current one
+    max_attempts: int
+    next_attempt_at: float
+    last_error: str = None
+    title: str = None
+    summary: str = None  # DownloadResult.summary() of the last run
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    def to_dict(self):
+        """JSON-able form, as the daemon API sends it."""
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        fields = {f.name for f in dataclasses.fields(cls)}
+        job = {k: v for k, v in data.items() if k in fields}
+        job["options"] = options_from_dict(job.get("options") or {})
+        return cls(**job)
+
+
+def options_from_dict(stored):
+    """DownloadOptions from stored JSON; fields this version doesn't know are dropped."""
+    return DownloadOptions(**{k: v for k, v in stored.items() if k in _OPTION_FIELDS})
+
+
+class JobQueue:
+    """SQLite-backed queue of download jobs, safe to use from several threads."""
+
+    _COLUMNS = ("id, url, options, state, attempts, max_attempts, next_attempt_at, last_error, title, summary,"
+                " created_at, updated_at")
+
+    def __init__(self, path, max_attempts=MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        if path != MEMORY:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " url TEXT NOT NULL,"
+                " options TEXT NOT NULL,"
+                " state TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " max_attempts INTEGER NOT NULL,"
+                " next_attempt_at REAL NOT NULL,"
+                " last_error TEXT,"
+                " title TEXT,"
+                " summary TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_due ON jobs (state, next_attempt_at)")
+            # Still marked running: the app exited or crashed mid-download, so the job runs again
+            self._conn.execute("UPDATE jobs SET state = ? WHERE state = ?", (PENDING, RUNNING))
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        return QueuedJob(row[0], row[1], options_from_dict(json.loads(row[2])), *row[3:])
+
+    def _get(self, job_id):
+        row = self._conn.execute(f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._get(job_id)
+
+    def add(self, url, options):
+        """Queue ``url`` to download with ``options``; returns the job."""
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (url, options, state, max_attempts, next_attempt_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, json.dumps(dataclasses.asdict(options)), PENDING, self.max_attempts, now, now, now),
+            )
+            return self._get(cursor.lastrowid)
+
+    def claim(self):
+        """Mark the next due pending job as running and return it, or None if nothing is due."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE state = ? AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT 1",
+                (PENDING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE jobs SET state = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                               (RUNNING, now, row[0]))
+            return self._get(row[0])
+
+    def next_due(self):
+        """When the earliest pending job becomes due (epoch seconds), or None if none is pending."""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(next_attempt_at) FROM jobs WHERE state = ?", (PENDING,)).fetchone()
+        return row[0]
+
+    def _update(self, job_id, **values):
+        values["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values.values(), job_id))
+            return self._get(job_id)
+
+    def complete(self, job_id, summary, title=None):
+        return self._update(job_id, state=DONE, summary=summary, last_error=None,
+                            **({"title": title} if title else {}))
+
+    def fail(self, job_id, error, summary=None, title=None):
+        """Record a failed attempt: back to pending after a backoff delay, or failed for good."""
+        extra = {"title": title} if title else {}
+        job = self.get(job_id)
+        if job is None:
+            return None  # removed meanwhile
+        if job.attempts >= job.max_attempts:
+            return self._update(job_id, state=FAILED, last_error=error, summary=summary, **extra)
+        return self._update(job_id, state=PENDING, last_error=error, summary=summary,
+                            next_attempt_at=time.time() + backoff_delay(job.attempts), **extra)
+
+    def cancel(self, job_id):
+        """Cancelled by the user: kept in the list, run again only through ``retry``."""
+        return self._update(job_id, state=CANCELLED)
+
+    def release(self, job_id):
+        """Put a job interrupted by shutdown back at the front, without counting the attempt."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, attempts = MAX(attempts - 1, 0), next_attempt_at = ?, updated_at = ?"
+                " WHERE id = ?", (PENDING, 0.0, time.time(), job_id))
+            return self._get(job_id)
+
+    def retry(self, job_id):
+        """Run a failed, cancelled or backing-off job again now, with a fresh set of attempts."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET state = ?, attempts = 0, next_attempt_at = ?, updated_at = ?"
+                               " WHERE id = ? AND state != ?", (PENDING, now, now, job_id, RUNNING))
+            return self._get(job_id)
+
+    def remove(self, job_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE id = ? AND state != ?", (job_id, RUNNING))
+
+    def clear_finished(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE state = ?", (DONE,))
+
+    def jobs(self, limit=200):
+        """Running and pending jobs (in run order), then the rest, most recently updated first."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM jobs ORDER BY"
+                " CASE state WHEN ? THEN 0 WHEN ? THEN 1 ELSE 2 END,"
+                " CASE WHEN state = ? THEN next_attempt_at ELSE -updated_at END, id LIMIT ?",
+                (RUNNING, PENDING, PENDING, limit),
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def counts(self):
+        """{state: number of jobs}."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class QueueRunner:
+    """Drains a JobQueue through ``engine.download``, running up to ``jobs`` jobs at once.
+
+    Each job runs on its own runner thread. ``on_start(job, channel)`` and
+    ``on_finish(job, result)`` are called on that thread; ``job`` is the
+    QueuedJob as stored after the run (its ``state`` tells how it ended) and
+    ``result`` the DownloadResult, or None.
+    """
+
+    def __init__(self, queue, engine, on_start=None, on_finish=None, jobs=1):
+        self.queue = queue
+        self.engine = engine
+        self.on_start = on_start
+        self.on_finish = on_finish
+        self.jobs = max(1, jobs)
+        self._cond = threading.Condition()
+        self._wakeups = 0  # bumped by wake(), so a wake-up between claim and wait isn't lost
+        self._running = {}  # job ID -> (QueuedJob, CancelToken)
+        self._stopping = False
+        self._threads = []
+
+    @property
+    def current(self):
+        """A running QueuedJob (the only one when ``jobs`` is 1), or None."""
+        with self._cond:
+            return next((job for job, _ in self._running.values()), None)
+
+    def running(self):
+        with self._cond:
+            return [job for job, _ in self._running.values()]
+
+    def start(self):
+        if not self._threads:
+            self._threads = [threading.Thread(target=self._run, daemon=True, name=f"queue-runner-{n}")
+                             for n in range(self.jobs)]
+            for thread in self._threads:
+                thread.start()
+
+    def wake(self):
+        """Look for due jobs now, e.g. after ``queue.add``."""
+        with self._cond:
+            self._wakeups += 1
+            self._cond.notify_all()
+
+    def cancel(self, job_id):
+        """Interrupt a running job, or take a waiting one out of the queue; the job, or None if unknown."""
+        with self._cond:  # runners claim under it too: a job is either registered here or still pending
+            running = self._running.get(job_id)
+            if running is not None:
+                running[1].cancel()  # stops it at once and removes its partial files
+                return running[0]
+            job = self.queue.get(job_id)
+            if job is not None and job.state == PENDING:
+                job = self.queue.cancel(job_id)
+            return job
+
+    def cancel_current(self):
+        with self._cond:
+            for _, token in self._running.values():
+                token.cancel()
+
+    def stop(self, timeout=None):
+        """Stop after interrupting the running jobs, which stay queued for the next start."""
+        with self._cond:
+            self._stopping = True
+            for _, token in self._running.values():
+                token.cancel(keep_partial=True)  # resumed from its partial files on the next start
+            self._cond.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0.0))
+
+    def _run(self):
+        import yt_dlp  # loaded by the engine already; importing it here keeps this module light
+
+        while not self._stopping:
+            with self._cond:
+                wakeups = self._wakeups
+                # Claimed and registered in one step, so a cancel can't slip in between
+                claimed = self.queue.claim()
+                if claimed is not None:
+                    token = CancelToken()
+                    if self._stopping:
+                        token.cancel(keep_partial=True)
+                    self._running[claimed.id] = (claimed, token)
+            if claimed is None:
+                due = self.queue.next_due()
+                with self._cond:
+                    if wakeups == self._wakeups and not self._stopping:
+                        self._cond.wait(None if due is None else max(due - time.time(), 0.0))
+                continue
+
+            job_id, job, result = claimed.id, None, None
+            try:
+                channel = ProgressChannel(claimed.options.is_audio)
+                if self.on_start:
+                    self.on_start(claimed, channel)
+                result = self.engine.download(claimed.url, claimed.options, token, channel)
+            except yt_dlp.utils.DownloadCancelled:
+                job = self.queue.release(job_id) if self._stopping else self.queue.cancel(job_id)
+            except Exception as e:
+                job = self.queue.fail(job_id, str(e))
+            else:
+                title = result.metrics.title if result.metrics else None
+                if result.failures:
+                    # With the archive, a retry only downloads the entries that failed this time
+                    errors = "; ".join(f"{name}: {error}" for name, error in result.failures[:3])
+                    job = self.queue.fail(job_id, errors, result.summary(), title)
+                else:
+                    job = self.queue.complete(job_id, result.summary(), title)
+            finally:
+                with self._cond:
+                    self._running.pop(job_id, None)
+            if self.on_finish:
+                # None if the job was deleted from the queue meanwhile
+                self.on_finish(job or dataclasses.replace(claimed, state=CANCELLED), result)
+
+def open_default_queue(name="queue.sqlite3"):
+    """Open the per-user job queue; if it can't be created, one that isn't persisted."""
+    path = os.path.join(app_data_dir(), name)
+    try:
+        return JobQueue(path)
+    except (OSError, sqlite3.Error):
+        return JobQueue(MEMORY)  # queued jobs are then lost on exit
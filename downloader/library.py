@@ -0,0 +1,133 @@
+"""Content-addressed index of finished media files, used to link instead of download.
+
+The archive answers "is this video already in this folder?"; the library
+answers "do we have this exact file anywhere?". Entries are keyed by
+(video ID, resolved format, kind), so the same lesson asked for in another
+playlist's folder is hardlinked (or copied, where links aren't supported)
+from a file already on disk rather than fetched and merged again.
+"""
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from .cache import app_data_dir
+
+LINK, COPY, DERIVED = "link", "copy", "derived"  # how a file was produced from the library
+
+
+class MediaLibrary:
+    """SQLite index of finished files, keyed by (video ID, format ID, kind, path).
+
+    ``format_id`` is what yt-dlp resolved (e.g. "137+140"), so two requests
+    that pick the same streams share a file whatever preset they came from;
+    ``kind`` is ``DownloadOptions.artifact_kind``. Several paths may hold the
+    same artifact; a path only counts while the file still has the recorded
+    size, and entries for missing files are dropped when looked up.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                " video_id TEXT NOT NULL,"
+                " format_id TEXT NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " path TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " completed_at REAL NOT NULL,"
+                " PRIMARY KEY (video_id, format_id, kind, path))"
+            )
+
+    def has(self, video_id):
+        """True if any file of the video is indexed (not checked on disk); cheap enough for every video."""
+        if not video_id:
+            return False
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM artifacts WHERE video_id = ? LIMIT 1",
+                                      (video_id,)).fetchone() is not None
+
+    def lookup(self, video_id, format_id, kind):
+        """Path of an intact file of exactly this artifact, or None."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size FROM artifacts WHERE video_id = ? AND format_id = ? AND kind = ?"
+                " ORDER BY completed_at DESC", (video_id, format_id, kind)).fetchall()
+        return self._first_intact(video_id, rows)
+
+    def find_video(self, video_id):
+        """Path of an intact video file of ``video_id`` in any format, or None (for deriving audio)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size FROM artifacts WHERE video_id = ? AND kind = ? ORDER BY completed_at DESC",
+                (video_id, "video")).fetchall()
+        return self._first_intact(video_id, rows)
+
+    def _first_intact(self, video_id, rows):
+        for path, size in rows:
+            try:
+                if os.path.getsize(path) == size:
+                    return path
+            except OSError:
+                pass
+            self._forget_path(video_id, path)  # deleted or changed since it was recorded
+        return None
+
+    def record(self, video_id, format_id, kind, path, size):
+        if not video_id or not format_id:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artifacts (video_id, format_id, kind, path, size, completed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, format_id, kind, os.path.abspath(path), size, time.time()),
+            )
+
+    def _forget_path(self, video_id, path):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM artifacts WHERE video_id = ? AND path = ?", (video_id, path))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def link_or_copy(source, target):
+    """Make ``target`` the same file as ``source``: a hardlink, or a copy where links fail.
+
+    Returns LINK or COPY. ``target`` is replaced atomically, so an existing
+    file of that name is never left half-written.
+    """
+    try:
+        if os.path.samefile(source, target):
+            return LINK
+    except OSError:
+        pass  # target doesn't exist yet
+    tmp = f"{target}.{os.getpid()}.library"
+    try:
+        os.link(source, tmp)
+        method = LINK
+    except OSError:
+        # Another drive, FAT/exFAT, a network share without link support...
+        shutil.copyfile(source, tmp)
+        method = COPY
+    try:
+        os.replace(tmp, target)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return method
+
+
+def open_default_library():
+    """Open the per-user library, or return None if it can't be created."""
+    path = os.path.join(app_data_dir(), "library.sqlite3")
+    try:
+        return MediaLibrary(path)
+    except (OSError, sqlite3.Error):
+        return None  # every request is then downloaded, as without the library
@@ -0,0 +1,269 @@
+"""Per-job timing breakdown, a JSON-lines job history and a Prometheus text-file export.
+
+The engine fills a ``JobMetrics`` while a job runs: metadata extraction,
+every stream download (bytes, seconds, retries, URL renewals), post-processing and the
+finalize step (moving into place, archiving) of each video. When the job
+ends its record is appended to a ``MetricsHistory`` file, one JSON object
+per line; with a ``textfile`` path the history also keeps a ``.prom`` file
+up to date for node_exporter's textfile collector. Nothing here imports
+yt-dlp, so the GUI can show the history before the engine is loaded.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from .cache import app_data_dir
+
+PHASES = ("extract", "download", "postprocess", "finalize")
+OK, PARTIAL, FAILED, CANCELLED = "ok", "partial", "failed", "cancelled"
+TEXTFILE_ENV = "YTDL_METRICS_TEXTFILE"  # default Prometheus text-file path, e.g. for the GUI
+
+
+class JobMetrics:
+    """Timings and byte counts for one download job; updated from any download thread."""
+
+    def __init__(self, url, mode, variant):
+        self.url = url
+        self.title = None  # the video's or playlist's, once extracted
+        self.mode = mode
+        self.variant = variant
+        self.started = time.time()
+        self.finished = None
+        self.status = None
+        self.error = None
+        self.total = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._job_phases = dict.fromkeys(PHASES, 0.0)  # not tied to one video (e.g. playlist listing)
+        self._items = {}  # video_id -> {"title", "extract", "streams", "postprocess", "finalize", "error"}
+
+    def _item(self, video_id):
+        item = self._items.get(video_id)
+        if item is None:
+            item = self._items[video_id] = {"id": video_id, "title": None, "extract": 0.0, "streams": [],
+                                            "postprocess": 0.0, "finalize": 0.0, "error": None}
+        return item
+
+    def add_phase(self, phase, seconds, video_id=None, title=None):
+        """Add ``seconds`` to ``phase`` ("extract", "postprocess" or "finalize") of a video or the job."""
+        with self._lock:
+            if video_id is None:
+                self._job_phases[phase] += seconds
+                return
+            item = self._item(video_id)
+            item[phase] += seconds
+            if title:
+                item["title"] = title
+
+    def add_stream(self, video_id, format_id, nbytes, seconds, retries=0, renewals=()):
+        """``renewals``: the stream's URL renewals, as ``renewal.Renewal.to_dict()`` dicts."""
+        with self._lock:
+            self._item(video_id)["streams"].append(
+                {"format_id": format_id, "bytes": nbytes, "seconds": round(seconds, 3), "retries": retries,
+                 "renewals": list(renewals)})
+
+    def stream_hook(self, d):
+        """Record a yt-dlp ``finished`` progress event (cheap no-op for every other event)."""
+        if d.get("status") != "finished" or d.get("elapsed") is None:
+            return  # no elapsed: the file was already on disk
+        info = d.get("info_dict") or {}
+        nbytes = d.get("total_bytes") or d.get("downloaded_bytes") or 0
+        self.add_stream(info.get("id"), info.get("format_id"), nbytes, d["elapsed"], d.get("retries", 0),
+                        d.get("renewals") or ())
+
+    def fail_item(self, video_id, title, error):
+        with self._lock:
+            item = self._item(video_id)
+            item["title"] = item["title"] or title
+            item["error"] = str(error)
+
+    def finish(self, status, error=None):
+        self.finished = time.time()
+        self.status = status
+        self.error = str(error) if error is not None else None
+
+    def record(self):
+        """The job as a JSON-able dict (the history line)."""
+        with self._lock:
+            items = [{**item, "extract": round(item["extract"], 3), "postprocess": round(item["postprocess"], 3),
+                      "finalize": round(item["finalize"], 3)} for item in self._items.values()]
+            phases = dict(self._job_phases)
+        for item in items:
+            phases["extract"] += item["extract"]
+            phases["download"] += sum(s["seconds"] for s in item["streams"])
+            phases["postprocess"] += item["postprocess"]
+            phases["finalize"] += item["finalize"]
+        streams = [s for item in items for s in item["streams"]]
+        nbytes = sum(s["bytes"] for s in streams)
+        seconds = (self.finished or time.time()) - self.started
+        return {
+            "url": self.url,
+            "title": self.title,
+            "mode": self.mode,
+            "variant": self.variant,
+            "status": self.status,
+            "error": self.error,
+            "started": round(self.started, 3),
+            "seconds": round(seconds, 3),
+            "videos": self.total,
+            "skipped": self.skipped,
+            "failed": sum(1 for item in items if item["error"]),
+            "bytes": nbytes,
+            # Over the whole job, so parallel playlist downloads count once
+            "throughput": round(nbytes / seconds) if seconds > 0 else 0,
+            "retries": sum(s["retries"] for s in streams),
+            "renewals": sum(len(s["renewals"]) for s in streams),
+            "phases": {phase: round(value, 3) for phase, value in phases.items()},  # summed over videos
+            "items": items,
+        }
+
+
+class MetricsHistory:
+    """Append-only JSON-lines file of job records, plus an optional Prometheus text file."""
+
+    def __init__(self, path, textfile=None):
+        self.path = path
+        self.textfile = textfile
+        self._lock = threading.Lock()
+        self._totals = None  # cumulative counters for the text file, loaded from the history on first use
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def append(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            if self.textfile:
+                if self._totals is None:
+                    self._totals = _Totals()
+                    for old in self._read():
+                        self._totals.add(old)  # already includes ``record``
+                else:
+                    self._totals.add(record)
+                self._write_textfile(record)
+
+    def recent(self, limit=50):
+        """The last ``limit`` records, newest first."""
+        with self._lock:
+            return list(reversed(deque(self._read(), maxlen=limit)))
+
+    def _read(self):
+        try:
+            f = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+
+    def _write_textfile(self, last):
+        # node_exporter may read at any moment: write a temp file and rename it over the old one
+        tmp = f"{self.textfile}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self._totals.render(last))
+        os.replace(tmp, self.textfile)
+
+
+class _Totals:
+    """Counters accumulated over every job in the history."""
+
+    def __init__(self):
+        self.jobs = dict.fromkeys((OK, PARTIAL, FAILED, CANCELLED), 0)
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.bytes = 0
+        self.videos = 0
+        self.failed_videos = 0
+        self.retries = 0
+        self.renewals = 0
+
+    def add(self, record):
+        self.jobs[record.get("status")] = self.jobs.get(record.get("status"), 0) + 1
+        for phase, seconds in (record.get("phases") or {}).items():
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        self.bytes += record.get("bytes", 0)
+        self.videos += record.get("videos", 0)
+        self.failed_videos += record.get("failed", 0)
+        self.retries += record.get("retries", 0)
+        self.renewals += record.get("renewals", 0)
+
+    def render(self, last):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP ytdl_{name} {help_text}")
+            lines.append(f"# TYPE ytdl_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"ytdl_{name}{{{label_text}}} {value}" if label_text else f"ytdl_{name} {value}")
+
+        metric("jobs_total", "counter", "Download jobs by final status.",
+               [({"status": status}, count) for status, count in self.jobs.items()])
+        metric("videos_total", "counter", "Videos in finished jobs, including skipped ones.", [({}, self.videos)])
+        metric("failed_videos_total", "counter", "Videos that failed to download.", [({}, self.failed_videos)])
+        metric("downloaded_bytes_total", "counter", "Bytes of media downloaded.", [({}, self.bytes)])
+        metric("stream_retries_total", "counter", "Retried stream requests.", [({}, self.retries)])
+        metric("stream_renewals_total", "counter", "Stream URLs resolved again after a throttled slowdown.",
+               [({}, self.renewals)])
+        metric("phase_seconds_total", "counter", "Time spent per job phase, summed over videos.",
+               [({"phase": phase}, round(seconds, 3)) for phase, seconds in self.phases.items()])
+        metric("last_job_timestamp_seconds", "gauge", "When the last job finished.",
+               [({}, round(last["started"] + last["seconds"], 3))])
+        metric("last_job_duration_seconds", "gauge", "Wall time of the last job.", [({}, last["seconds"])])
+        metric("last_job_throughput_bytes", "gauge", "Bytes per second over the last job.",
+               [({}, last["throughput"])])
+        metric("last_job_success", "gauge", "1 if the last job downloaded everything.",
+               [({}, 1 if last["status"] == OK else 0)])
+        return "\n".join(lines) + "\n"
+
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.1f} s"
+    mins, secs = divmod(int(seconds), 60)
+    hours, mins = divmod(mins, 60)
+    return f"{hours}:{mins:02d}:{secs:02d}" if hours else f"{mins}:{secs:02d}"
+
+
+def describe_phases(record):
+    """E.g. "extract 1.2 s · download 34.0 s · post-process 3.1 s · finalize 0.1 s"."""
+    phases = record.get("phases") or {}
+    parts = [f"{phase.replace('postprocess', 'post-process')} {format_duration(phases[phase])}"
+             for phase in PHASES if phases.get(phase)]
+    if record.get("retries"):
+        parts.append(f"{record['retries']} retries")
+    if record.get("renewals"):
+        parts.append(f"{record['renewals']} URL renewals")
+    return " · ".join(parts)
+
+
+def describe_record(record):
+    """One line per job for history views, e.g. "ok  3 videos  412 MB in 2:31 (2.7 MB/s)"."""
+    mb = record.get("bytes", 0) / 1_048_576
+    videos = record.get("videos", 0)
+    parts = [record.get("status") or "?", f"{videos} video{'s' if videos != 1 else ''}"]
+    if record.get("failed"):
+        parts.append(f"{record['failed']} failed")
+    if record.get("skipped"):
+        parts.append(f"{record['skipped']} skipped")
+    parts.append(f"{mb:.0f} MB in {format_duration(record.get('seconds', 0))} "
+                 f"({record.get('throughput', 0) / 1_048_576:.1f} MB/s)")
+    return "  ".join(parts)
+
+
+def open_default_history(textfile=None):
+    """Open the per-user job history, or return None if it can't be created.
+
+    ``textfile`` (default: the YTDL_METRICS_TEXTFILE environment variable)
+    turns on the Prometheus export.
+    """
+    try:
+        return MetricsHistory(os.path.join(app_data_dir(), "history.jsonl"),
+                              textfile or os.environ.get(TEXTFILE_ENV) or None)
+    except OSError:
+        return None  # jobs still run, they just aren't recorded
@@ -0,0 +1,56 @@
+"""Download choices shared by the GUI, batch mode and the engine.
+
+Kept free of yt-dlp imports so the GUI can build its controls (and show the
+window) before the engine is loaded.
+"""
+
+from dataclasses import dataclass
+
+from . import timerange
+from .renewal import DEFAULT_RENEW_BELOW
+
+DEFAULT_WORKERS = 3
+DEFAULT_CONNECTIONS = 4  # range requests per stream; 1 leaves it to yt-dlp's single-connection downloader
+
+
+@dataclass
+class DownloadOptions:
+    """What to download and where; mirrors the choices offered in the GUI."""
+    output_dir: str
+    mode: str = "Video"  # "Video" or "Audio"
+    quality: int = 1080
+    preset: str = "Best"
+    audio_format: str = "mp3"
+    workers: int = DEFAULT_WORKERS
+    connections: int = DEFAULT_CONNECTIONS  # parallel range requests per stream
+    force_refresh: bool = False  # ignore the archive and download everything again
+    format_selection: str = None  # explicit format IDs from the fetched video's FormatIndex
+    clip_start: float = None  # seconds; with clip_end, download only this part of each video
+    clip_end: float = None
+    deadline: float = None  # epoch seconds; Video mode lowers quality/preset per video to finish by then
+    renew_below: float = DEFAULT_RENEW_BELOW  # renew a stream's URL when its speed stays below this share; 0 = never
+
+    @property
+    def is_audio(self):
+        return self.mode == "Audio"
+
+    @property
+    def is_clip(self):
+        return self.clip_start is not None or self.clip_end is not None
+
+    @property
+    def clip_label(self):
+        """E.g. "1m35s-3m00s", added to file names and keys; None for whole videos."""
+        return timerange.clip_label(self.clip_start, self.clip_end) if self.is_clip else None
+
+    @property
+    def variant(self):
+        """Archive key for what is being asked for; a different variant is a different file."""
+        variant = f"audio:{self.audio_format}" if self.is_audio else f"video:{self.quality}:{self.preset}"
+        return f"{variant}:{self.clip_label}" if self.is_clip else variant
+
+    @property
+    def artifact_kind(self):
+        """Library key for the kind of file produced; which streams went into it is keyed separately."""
+        kind = f"audio:{self.audio_format}" if self.is_audio else "video"
+        return f"{kind}:{self.clip_label}" if self.is_clip else kind
@@ -0,0 +1,194 @@
+"""Post-processing (merge, audio extraction) as a pipeline stage on a process pool.
+
+A playlist worker downloads a video's streams, hands the merge or extract
+job to ``PostprocessPipeline`` and goes straight on to the next video, so the
+network isn't idle while ffmpeg runs. The pipeline holds at most ``workers +
+backlog`` jobs; a worker that finishes a download while it is full waits,
+which keeps downloads from piling up unmerged files on disk.
+
+A job submitted with a CancelToken is withdrawn when the token is set, or,
+if a pool process already runs it, that process terminates its ffmpeg:
+cancelled job numbers are written to an array shared with the pool, which
+a thread in the process watches while the job runs.
+"""
+
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import yt_dlp
+from yt_dlp.globals import postprocessors
+
+from . import audio  # noqa: F401  registers AudioExtractPP, also in pool processes
+from . import cancel
+from .segmented import SegmentedYoutubeDL
+
+# yt-dlp params a post-processing run needs; the rest (hooks, meters) can't cross a process boundary
+POSTPROCESS_PARAMS = (
+    "outtmpl", "paths", "postprocessors", "merge_output_format", "final_ext", "keepvideo", "overwrites",
+    "windowsfilenames", "trim_file_name", "ffmpeg_location", "postprocessor_args", "quiet", "no_warnings",
+)
+DEFERRED_KEY = "__deferred_postprocess"
+TIMING_KEY = "postprocess_timing"  # {"seconds", "finished_at"}, set wherever post-processing ran
+SUBMIT_POLL = 0.2  # seconds between cancel checks while waiting for a free slot
+CANCEL_SLOTS = 64  # recently cancelled job numbers the pool processes can see
+
+_cancelled = None  # in pool processes: the pipeline's shared array of cancelled job numbers
+
+
+class PipelinedYoutubeDL(SegmentedYoutubeDL):
+    """YoutubeDL that returns right after the download and leaves post-processing to the caller.
+
+    With the ``defer_postprocessing`` param, ``post_process`` doesn't run the
+    merger/fixups/extractors; it stores a picklable job under
+    ``DEFERRED_KEY`` in the info dict (``requested_downloads[0]`` after
+    ``process_ie_result``) for ``run_postprocess`` to execute elsewhere.
+    """
+
+    def post_process(self, filename, info, files_to_move=None):
+        files = self.params.get("partial_files")  # the merge writes here, extraction next to it
+        if files is not None:
+            files.add(info.get("id"), filename)
+        pps = info.get("__postprocessors") or []
+        if not self.params.get("defer_postprocessing") or not (pps or self._pps["post_process"]):
+            return _timed_post_process(super().post_process, filename, info, files_to_move)
+        job_info = {k: v for k, v in info.items() if k != "__postprocessors"}
+        job = {
+            "params": {k: self.params[k] for k in POSTPROCESS_PARAMS if k in self.params},
+            "filename": filename,
+            "info": self.sanitize_info(job_info, remove_private_keys=False),
+            # Registry names (pp_key() drops the "FFmpeg" prefix, so it can't be looked up again)
+            "postprocessors": [type(pp).__name__ for pp in pps],
+            "files_to_move": dict(files_to_move or {}),
+        }
+        info["filepath"] = filename
+        info[DEFERRED_KEY] = job
+        return info
+
+
+def _timed_post_process(post_process, filename, info, files_to_move):
+    started = time.perf_counter()
+    info = post_process(filename, info, files_to_move)
+    info[TIMING_KEY] = {"seconds": round(time.perf_counter() - started, 3), "finished_at": time.time()}
+    return info
+
+
+def postprocess_timing(info):
+    """The ``TIMING_KEY`` record of a processed info dict, or None."""
+    downloads = (info or {}).get("requested_downloads") or [info or {}]
+    return downloads[0].get(TIMING_KEY)
+
+
+def deferred_job(info):
+    """The job ``PipelinedYoutubeDL`` left in a processed info dict, or None."""
+    downloads = (info or {}).get("requested_downloads") or [info or {}]
+    return downloads[0].get(DEFERRED_KEY)
+
+
+def _init_worker(cancelled):
+    global _cancelled
+    _cancelled = cancelled
+
+
+def _is_cancelled(number):
+    if _cancelled is None:
+        return False
+    with _cancelled.get_lock():
+        return number in _cancelled[1:]
+
+
+def run_postprocess(job):
+    """Run a deferred job (in a pool process); returns the final info dict.
+
+    Raises ``yt_dlp.utils.DownloadCancelled`` if the job was cancelled while it ran.
+    """
+    number = job.get("number")
+    with cancel.watch(lambda: _is_cancelled(number)) as token, cancel.scope(token):
+        try:
+            with yt_dlp.YoutubeDL(job["params"]) as ydl:
+                info = job["info"]
+                info["__postprocessors"] = [postprocessors.value[name](ydl) for name in job["postprocessors"]]
+                info = _timed_post_process(ydl.post_process, job["filename"], info, job["files_to_move"])
+                info.pop("__postprocessors", None)
+                return ydl.sanitize_info(info)
+        except Exception:
+            if token.is_set():
+                raise yt_dlp.utils.DownloadCancelled("Download cancelled by user") from None
+            raise
+
+
+class PostprocessPipeline:
+    """Bounded process pool for deferred post-processing jobs."""
+
+    def __init__(self, workers=None, backlog=None):
+        self.workers = workers or os.cpu_count() or 2
+        self.backlog = self.workers if backlog is None else backlog
+        self._slots = threading.BoundedSemaphore(self.workers + self.backlog)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._numbers = itertools.count(1)
+        self._cancelled = None  # [next slot, job numbers...], shared with the pool processes
+        self._active = {}  # job number -> Future, until it is done
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:  # started on first use; spawning is slow on Windows
+                self._cancelled = multiprocessing.Array("q", CANCEL_SLOTS + 1)
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self._cancelled,))
+            return self._pool
+
+    def submit(self, job, cancel_event=None):
+        """Queue ``job``, blocking while the pipeline is full. Returns a Future of the final info.
+
+        Raises ``yt_dlp.utils.DownloadCancelled`` if ``cancel_event`` is set while waiting.
+        With a CancelToken, setting it later stops the job wherever it is.
+        """
+        while not self._slots.acquire(timeout=SUBMIT_POLL):
+            if cancel_event is not None and cancel_event.is_set():
+                raise yt_dlp.utils.DownloadCancelled("Download cancelled by user")
+        number = next(self._numbers)
+        try:
+            future = self._executor().submit(run_postprocess, {**job, "number": number})
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._active[number] = future
+        unregister = None
+        if isinstance(cancel_event, cancel.CancelToken):
+            unregister = cancel_event.on_cancel(lambda: self._cancel(number, future))
+
+        def done(_):
+            with self._lock:
+                self._active.pop(number, None)
+            if unregister is not None:
+                unregister()
+            self._slots.release()
+
+        future.add_done_callback(done)
+        return future
+
+    def _cancel(self, number, future):
+        if future.cancel():
+            return  # it hadn't started
+        with self._lock:
+            if self._cancelled is None:
+                return
+        with self._cancelled.get_lock():
+            self._cancelled[1 + self._cancelled[0] % CANCEL_SLOTS] = number
+            self._cancelled[0] += 1
+
+    def close(self):
+        """Shut the pool down, stopping the jobs it is running."""
+        with self._lock:
+            active = list(self._active.items())
+        for number, future in active:
+            self._cancel(number, future)
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -0,0 +1,78 @@
+"""Quality presets and the yt-dlp format selection they map to."""
+
+ALL_RESOLUTIONS = [480, 720, 1080, 1440, 2160]
+
+# Video bitrate targets in Mbps per (preset, resolution)
+BITRATE_MAP = {
+    "Low":    {480: 1,   720: 2.5, 1080: 4,  1440: 8,  2160: 15},
+    "Medium": {480: 2,   720: 5,   1080: 8,  1440: 15, 2160: 30},
+    "High":   {480: 3,   720: 7.5, 1080: 12, 1440: 24, 2160: 45},
+    "Best":   {480: 0,   720: 0,   1080: 0,  1440: 0,  2160: 0},
+}
+
+AUDIO_BITRATE_KBPS = 128
+
+AUDIO_FORMATS = ["mp3", "m4a", "wav", "flac", "ogg"]
+
+# Audio streams tried first per target format: ones its container can take without a transcode
+AUDIO_COPY_SOURCES = {
+    "mp3": ["bestaudio[acodec=mp3]"],
+    "m4a": ["bestaudio[acodec^=mp4a]"],
+    "ogg": ["bestaudio[acodec=opus]", "bestaudio[acodec=vorbis]"],
+    "flac": ["bestaudio[acodec=flac]"],
+    "wav": [],
+}
+
+
+def format_options(mode, quality, preset, audio_format, selection=None):
+    """Return the yt-dlp format/postprocessor options for a mode and preset.
+
+    ``selection`` is an explicit format ID expression (from a FormatIndex);
+    it is tried first, with the preset's format string as the fallback.
+    """
+    opts = {}
+    if mode == "Audio":
+        # A stream that can be copied into the target beats a better one that must be transcoded
+        opts["format"] = "/".join([*AUDIO_COPY_SOURCES.get(audio_format, []), "bestaudio/best"])
+        opts["postprocessors"] = [{
+            "key": "AudioExtract",  # downloader.audio.AudioExtractPP: stream copy when possible
+            "preferredcodec": audio_format,
+            "preferredquality": "0",  # best quality when transcoding
+        }]
+        if selection:
+            opts["format"] = f"{selection}/{opts['format']}"
+        return opts
+
+    if preset == "Best":
+        opts["format"] = (
+            f"bestvideo[height<={quality}][vcodec^=avc1]+bestaudio[acodec^=mp4a]/"
+            f"bestvideo[height<={quality}]+bestaudio/"
+            f"best[height<={quality}]/best"
+        )
+        opts["format_sort"] = [f"res:{quality}", "vcodec:h264", "acodec:m4a"]
+    else:
+        target_br = BITRATE_MAP[preset][int(quality)]
+        target_kbps = int(target_br * 1000)
+        opts["format"] = (
+            f"bestvideo[height<={quality}][vbr<={target_kbps}]+bestaudio/"
+            f"bestvideo[height<={quality}]+bestaudio/"
+            f"best[height<={quality}]/best"
+        )
+        opts["format_sort"] = [f"res:{quality}", f"tbr:{target_kbps}", "vcodec:h264", "acodec:m4a"]
+
+    if selection:
+        opts["format"] = f"{selection}/{opts['format']}"
+    opts["merge_output_format"] = "mp4"
+    return opts
+
+
+def available_resolutions(formats):
+    """Resolutions from ALL_RESOLUTIONS that at least one video stream can satisfy."""
+    available = set()
+    for f in formats:
+        h = f.get("height")
+        if h and f.get("vcodec", "none") != "none":
+            for res in ALL_RESOLUTIONS:
+                if h >= res:
+                    available.add(res)
+    return sorted(available) if available else [720]
@@ -0,0 +1,240 @@
+"""Progress channel between download threads and the thread that displays progress.
+
+Download threads only append small tuples of numbers to a deque (atomic, no
+lock, no string formatting). The display side calls ``snapshot()`` once per
+UI frame, folds every pending event into per-video state and gets back one
+aggregate to render, however many callbacks fired in between.
+"""
+
+import time
+from collections import deque, namedtuple
+
+# Event kinds (first element of every event tuple)
+TOTAL, REGISTER, PROGRESS, STREAM_DONE, FINISH, POSTPROCESS, WAITING, PLAN, PROJECTION, RENEWED = range(10)
+
+ProgressSnapshot = namedtuple(
+    "ProgressSnapshot",
+    ["percent", "total", "completed", "active", "title", "speed", "eta", "stage", "postprocessing",
+     "quality", "finish_at", "deadline", "renewals"],
+    # deadline mode: the latest video's planned quality, projected finish, deadline; then URL renewals in the job
+    defaults=("", None, None, 0),
+)
+
+
+class ProgressChannel:
+    """Multi-producer, single-consumer progress queue for one download job."""
+
+    def __init__(self, is_audio=False):
+        self.is_audio = is_audio
+        self._events = deque()
+        # Consumer-side state; only touched from snapshot()
+        self._videos = {}  # video_id -> [index, title, phase, percent, speed, eta, planned quality]
+        self._postprocessing = set()  # video IDs downloaded and waiting for/in the post-processing pool
+        self._waiting = set()  # video IDs waiting for disk space
+        self._total = 0
+        self._completed = 0
+        self._finish_at = None
+        self._deadline = None
+        self._renewals = 0
+
+    # ── Producer side (download threads) ──────────────────────
+
+    def set_total(self, total):
+        self._events.append((TOTAL, total))
+
+    def register(self, video_id, index, title):
+        self._events.append((REGISTER, video_id, index, title or ""))
+
+    def postprocess(self, video_id):
+        """The video's streams are on disk and its merge/extract job was handed to the pool."""
+        self._events.append((POSTPROCESS, video_id))
+
+    def waiting(self, video_id, waiting):
+        """The video is (or no longer is) waiting for disk space before it starts."""
+        self._events.append((WAITING, video_id, waiting))
+
+    def finish(self, video_id):
+        self._events.append((FINISH, video_id))
+
+    def plan(self, video_id, quality):
+        """Deadline mode picked ``quality`` (e.g. "720p Medium") for the video."""
+        self._events.append((PLAN, video_id, quality))
+
+    def projection(self, finish_at, deadline):
+        """Deadline mode's projected finish (epoch seconds; None while the throughput is unknown)."""
+        self._events.append((PROJECTION, finish_at, deadline))
+
+    def stream_hook(self, d):
+        """Translate a yt-dlp progress dict into a numeric event."""
+        status = d.get("status")
+        video_id = (d.get("info_dict") or {}).get("id")
+        if status == "downloading":
+            total = d.get("total_bytes") or d.get("total_bytes_estimate") or 0
+            self._events.append((PROGRESS, video_id, d.get("downloaded_bytes") or 0, total,
+                                 d.get("speed") or 0.0, d.get("eta")))
+        elif status == "finished":
+            self._events.append((STREAM_DONE, video_id))
+        elif status == "renewed":
+            self._events.append((RENEWED, video_id))
+
+    # ── Consumer side (UI thread) ─────────────────────────────
+
+    def snapshot(self):
+        """Apply pending events; return a ProgressSnapshot, or None if nothing changed."""
+        events = self._events
+        if not events:
+            return None
+        videos = self._videos
+        while events:
+            event = events.popleft()
+            kind = event[0]
+            if kind == PROGRESS:
+                state = videos.get(event[1])
+                if state is None:
+                    continue
+                downloaded, total = event[2], event[3]
+                stream_percent = (downloaded / total * 100) if total > 0 else 0
+                if self.is_audio:
+                    # Audio: single stream → 90%, remaining 10% for conversion
+                    state[3] = stream_percent * 0.90
+                elif state[2] == 0:
+                    # Video: video stream (85%) + audio stream (15%)
+                    state[3] = stream_percent * 0.85
+                else:
+                    state[3] = 85 + stream_percent * 0.15
+                state[4] = event[4]
+                state[5] = event[5]
+            elif kind == STREAM_DONE:
+                state = videos.get(event[1])
+                if state is None:
+                    continue
+                state[2] += 1
+                state[4] = 0.0
+                state[5] = None
+                if self.is_audio:
+                    state[3] = 90
+                elif state[2] < 2:
+                    state[3] = 85
+                else:
+                    state[3] = 100  # both streams done, merging
+            elif kind == REGISTER:
+                videos[event[1]] = [event[2], event[3], 0, 0.0, 0.0, None, ""]
+            elif kind == POSTPROCESS:
+                state = videos.get(event[1])
+                if state is None:
+                    continue
+                self._postprocessing.add(event[1])
+                state[3] = 90 if self.is_audio else 100
+                state[4] = 0.0
+                state[5] = None
+            elif kind == WAITING:
+                if event[2]:
+                    self._waiting.add(event[1])
+                else:
+                    self._waiting.discard(event[1])
+            elif kind == FINISH:
+                self._postprocessing.discard(event[1])
+                self._waiting.discard(event[1])
+                if videos.pop(event[1], None) is not None:
+                    self._completed += 1
+            elif kind == PLAN:
+                state = videos.get(event[1])
+                if state is not None:
+                    state[6] = event[2]
+            elif kind == PROJECTION:
+                self._finish_at, self._deadline = event[1], event[2]
+            elif kind == RENEWED:
+                self._renewals += 1
+            elif kind == TOTAL:
+                self._total = event[1]
+        return self._aggregate()
+
+    def _aggregate(self):
+        videos = self._videos.values()
+        total = max(self._total, 1)
+        percent = (self._completed * 100 + sum(v[3] for v in videos)) / total
+        downloading = [v for vid, v in self._videos.items() if vid not in self._postprocessing]
+        latest = max(downloading or videos, key=lambda v: v[0], default=None)
+
+        stage = "downloading"
+        eta = None
+        if downloading and len(self._waiting) >= len(downloading):
+            stage = "waiting"  # nothing can start until disk space frees up
+        elif self._total <= 1 and latest is not None:
+            eta = latest[5]
+            if self.is_audio and latest[2] >= 1:
+                stage = "converting"
+            elif not self.is_audio and latest[2] >= 2:
+                stage = "merging"
+
+        return ProgressSnapshot(
+            percent=percent,
+            total=self._total,
+            completed=self._completed,
+            active=len(downloading),
+            title=latest[1] if latest else "",
+            speed=sum(v[4] for v in videos),
+            eta=eta,
+            stage=stage,
+            postprocessing=len(self._postprocessing),
+            quality=latest[6] if latest else "",
+            finish_at=self._finish_at,
+            deadline=self._deadline,
+            renewals=self._renewals,
+        )
+
+
+def format_rate(bytes_per_sec):
+    if bytes_per_sec >= 1_048_576:
+        return f"{bytes_per_sec / 1_048_576:.1f} MiB/s"
+    if bytes_per_sec > 0:
+        return f"{bytes_per_sec / 1024:.0f} KiB/s"
+    return "N/A"
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "N/A"
+    mins, secs = divmod(int(seconds), 60)
+    hours, mins = divmod(mins, 60)
+    return f"{hours}:{mins:02d}:{secs:02d}" if hours else f"{mins:02d}:{secs:02d}"
+
+
+def format_clock(timestamp):
+    """Local time of day for epoch seconds, with the date when it isn't today."""
+    moment = time.localtime(timestamp)
+    if time.strftime("%Y-%m-%d", moment) == time.strftime("%Y-%m-%d"):
+        return time.strftime("%H:%M", moment)
+    return time.strftime("%a %H:%M", moment)
+
+
+def format_progress(snapshot, audio_format="mp3"):
+    """Render a snapshot as the (status_text, speed_text) pair shown under the progress bar."""
+    if snapshot.total > 1:
+        post = f", {snapshot.postprocessing} post-processing" if snapshot.postprocessing else ""
+        status_text = (f"Videos {snapshot.completed} of {snapshot.total} done, "
+                       f"{snapshot.active} downloading{post}: {snapshot.title}")
+    else:
+        status_text = f"Downloading: {snapshot.title}"
+    if snapshot.quality:
+        status_text += f" ({snapshot.quality})"
+
+    if snapshot.stage == "waiting":
+        return status_text, "Waiting for disk space..."
+    if snapshot.stage == "converting":
+        return status_text, f"Converting to {audio_format.upper()}..."
+    if snapshot.stage == "merging":
+        return status_text, "Merging streams..."
+
+    parts = [f"Speed: {format_rate(snapshot.speed)}"]
+    if snapshot.total <= 1:
+        parts.append(f"ETA: {format_eta(snapshot.eta)}")
+    parts.append(f"{snapshot.percent:.0f}%")
+    if snapshot.renewals:
+        parts.append(f"Reconnected {snapshot.renewals}x after slowdowns")
+    if snapshot.deadline is not None:
+        if snapshot.finish_at is None:
+            parts.append(f"Measuring speed (deadline {format_clock(snapshot.deadline)})")
+        else:
+            parts.append(f"Finish ~{format_clock(snapshot.finish_at)} (deadline {format_clock(snapshot.deadline)})")
+    return status_text, "  |  ".join(parts)
@@ -0,0 +1,159 @@
+"""Throttle detection for one stream, and the URL renewals it triggers.
+
+A stream URL can fall from full speed to a trickle partway through a long
+download and stay there: the CDN throttles that one signed URL, while a
+freshly resolved one is fast again. A ``StallDetector`` follows a stream's
+byte count over a sliding WINDOW and remembers the best window rate of the
+last BASELINE_SPAN seconds as its baseline; once the rate has stayed below
+``fraction`` of that baseline for SUSTAIN seconds, the stream is throttled.
+``StreamRenewal`` then re-resolves the URL (up to MAX_RENEWALS times per
+stream) and keeps a ``Renewal`` record of each attempt; the downloader
+reconnects from the bytes it already has on disk.
+
+No yt-dlp imports here: resolving the URL is the downloader's callable.
+"""
+
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+
+DEFAULT_RENEW_BELOW = 0.2  # fraction of the baseline rate below which a stream counts as throttled
+WINDOW = 3.0  # seconds of transfer behind the current rate
+SAMPLE_INTERVAL = 0.25  # seconds between samples; downloaders may report far more often
+BASELINE_SPAN = 60.0  # how far back the baseline (best window rate) reaches
+SUSTAIN = 5.0  # seconds the rate must stay low before the stream counts as throttled
+MIN_BASELINE = 64 * 1024  # bytes/s; on a link slower than this a drop can't be told from noise
+MAX_RENEWALS = 3  # per stream
+
+
+@dataclass
+class Renewal:
+    """One URL renewal of a stream, as recorded in its ``finished`` progress event and the job history."""
+    at: float  # seconds into the stream's download
+    offset: int  # bytes on disk when the URL was renewed; the download went on from there
+    rate: float  # bytes/s over the window that tripped the detector
+    baseline: float  # bytes/s the stream had reached before
+    error: str = None  # why the renewal failed (the download kept its old URL)
+
+    def to_dict(self):
+        return {k: round(v, 3) if isinstance(v, float) else v for k, v in asdict(self).items()}
+
+
+class StallDetector:
+    """Sliding-window throughput of one stream, compared against its own recent baseline."""
+
+    def __init__(self, fraction=DEFAULT_RENEW_BELOW, clock=time.monotonic):
+        self.fraction = fraction
+        self._clock = clock
+        self._samples = deque()  # (time, bytes), oldest first
+        self._window_rates = deque()  # (time, rate) over the last BASELINE_SPAN
+        self._low_since = None
+        self.rate = None  # bytes/s over the last window, once a full window was seen
+
+    @property
+    def baseline(self):
+        return max((rate for _, rate in self._window_rates), default=None)
+
+    def update(self, downloaded):
+        """Feed the stream's byte count; True once it has been throttled for SUSTAIN seconds."""
+        now = self._clock()
+        samples = self._samples
+        if not samples:
+            samples.append((now, downloaded))
+            return False
+        if now - samples[-1][0] < SAMPLE_INTERVAL:
+            return self._throttled(now)
+        samples.append((now, downloaded))
+        # Keep the last sample before the window so the window is always covered
+        while len(samples) > 2 and samples[1][0] <= now - WINDOW:
+            samples.popleft()
+        (t0, b0), (t1, b1) = samples[0], samples[-1]
+        if t1 - t0 < min(WINDOW, 1.0):
+            return False
+        self.rate = (b1 - b0) / (t1 - t0)
+        baseline = self.baseline
+        if baseline is not None and baseline >= MIN_BASELINE and self.rate < baseline * self.fraction:
+            if self._low_since is None:
+                self._low_since = now
+        else:
+            self._low_since = None
+        self._window_rates.append((now, self.rate))
+        while self._window_rates[0][0] < now - BASELINE_SPAN:
+            self._window_rates.popleft()
+        return self._throttled(now)
+
+    def _throttled(self, now):
+        return self._low_since is not None and now - self._low_since >= SUSTAIN
+
+    def restart(self):
+        """Measure afresh from the next update, e.g. on a new connection; the baseline is kept."""
+        self._samples.clear()
+        self._low_since = None
+        self.rate = None
+
+    def reset(self):
+        """Forget the baseline too, e.g. while a bandwidth limit makes the rate meaningless."""
+        self.restart()
+        self._window_rates.clear()
+
+
+class StreamRenewal:
+    """Decides when a stream's URL is renewed and records every renewal.
+
+    ``resolve()`` returns a fresh URL for the stream (or None if it can't);
+    it runs on the thread that calls ``check``.
+    """
+
+    def __init__(self, resolve, fraction=DEFAULT_RENEW_BELOW, max_renewals=MAX_RENEWALS, clock=time.monotonic):
+        self.resolve = resolve
+        self.max_renewals = max_renewals
+        self.detector = StallDetector(fraction, clock)
+        self.renewals = []
+        self._clock = clock
+        self._started = clock()
+
+    @property
+    def enabled(self):
+        return self.detector.fraction > 0 and len(self.renewals) < self.max_renewals
+
+    def start(self, downloaded=0):
+        """The transfer starts now with ``downloaded`` bytes already on disk.
+
+        Without it the first ``check`` is the starting point, and whatever
+        arrived before it (a fast first burst) never counts toward the baseline.
+        """
+        self._started = self._clock()
+        self.detector.update(downloaded)
+
+    def check(self, downloaded, limited=False):
+        """Feed the stream's bytes on disk; returns a fresh URL when the stream should reconnect to it.
+
+        ``limited``: a bandwidth limit is pacing the job, so a slowdown says
+        nothing about the URL and the baseline is measured again afterwards.
+        """
+        if not self.enabled:
+            return None
+        if limited:
+            self.detector.reset()
+            return None
+        if not self.detector.update(downloaded):
+            return None
+        renewal = Renewal(at=self._clock() - self._started, offset=downloaded, rate=self.detector.rate,
+                          baseline=self.detector.baseline)
+        self.renewals.append(renewal)
+        self.detector.restart()
+        try:
+            url = self.resolve()
+        except Exception as e:
+            renewal.error = str(e)
+            return None
+        if not url:
+            renewal.error = "the stream is no longer offered"
+        return url or None
+
+    def failed(self, error):
+        """The downloader couldn't use the URL ``check`` returned; recorded on the latest renewal."""
+        self.renewals[-1].error = str(error)
+
+    def to_list(self):
+        return [renewal.to_dict() for renewal in self.renewals]
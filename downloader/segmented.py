@@ -0,0 +1,585 @@
+"""Multi-connection ranged HTTP downloads with a crash-safe resume sidecar.
+
+A stream is split into fixed-size segments that several connections fetch
+in parallel with ``Range`` requests, each writing at its own offset of a
+preallocated ``.part`` file. A segment is recorded as done in
+``<file>.part.segments.json`` only after its bytes are flushed to disk, so
+after a crash, a cancel or an app restart the next attempt re-fetches only
+the segments that are missing.
+
+``SegmentedDownload`` only needs an ``open_range(start, end)`` callable and
+works against any HTTP server that honours Range requests; ``SegmentedHttpFD``
+plugs it into yt-dlp. Both it and ``ThrottledHttpFD`` (the single-connection
+path) charge every block to the job's bandwidth meter, if there is one, and
+watch the stream's speed: when it stays far below what the stream reached
+before (see ``renewal``), the URL is resolved again and the download goes
+on from the bytes already on disk over the fresh URL.
+
+yt-dlp starts ffmpeg (time-range and HLS downloads, merges, audio
+extraction) through ``yt_dlp.utils.Popen``; the copies its downloader and
+post-processor modules hold are replaced with ``TrackedPopen``, which
+terminates the process when the job of the thread that started it is
+cancelled (see ``cancel``).
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.request
+
+import yt_dlp
+from yt_dlp.downloader import external
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.postprocessor import ffmpeg
+from yt_dlp.utils import Popen
+
+from . import cancel
+from .renewal import StreamRenewal
+
+SEGMENT_SIZE = 4 * 1024 * 1024
+BLOCK_SIZE = 64 * 1024
+THROTTLED_BLOCK_SIZE = 256 * 1024  # read size cap for HttpFD while a bandwidth limit applies
+WATCHED_BLOCK_SIZE = 64 * 1024  # read size cap for HttpFD while URL renewal is on: 1 s at a 64 KiB/s trickle
+SEGMENT_RETRIES = 3
+STATE_SUFFIX = ".segments.json"
+
+
+class RangeNotSupported(Exception):
+    """The server ignored the Range header or didn't report the total size."""
+
+
+def _header(response, name):
+    return response.headers.get(name)
+
+
+def probe(open_range):
+    """Return (total_size, validator) from a one-byte range request.
+
+    ``validator`` is the ETag or Last-Modified header (or None) and guards
+    resuming against a file that changed on the server.
+    """
+    response = open_range(0, 0)
+    try:
+        content_range = _header(response, "Content-Range") or ""
+        if response.status != 206 or "/" not in content_range:
+            raise RangeNotSupported(f"HTTP {response.status}, Content-Range {content_range!r}")
+        total = content_range.rsplit("/", 1)[1].strip()
+        if not total.isdigit():
+            raise RangeNotSupported(f"unknown total size in {content_range!r}")
+        return int(total), _header(response, "ETag") or _header(response, "Last-Modified")
+    finally:
+        response.close()
+
+
+def ydl_range_opener(ydl, url, headers):
+    """``open_range`` through a YoutubeDL instance (its proxy, cookies and impersonation settings)."""
+    def open_range(start, end):
+        request = yt_dlp.networking.Request(url, headers={**headers, "Range": f"bytes={start}-{end}"})
+        return ydl.urlopen(request)
+    return open_range
+
+
+def fresh_url(ydl, info_dict):
+    """The stream's current URL from a new extraction of its page, or None if the format is gone."""
+    page = info_dict.get("webpage_url") or info_dict.get("original_url")
+    if not page:
+        return None
+    fresh = ydl.extract_info(page, download=False, process=False)
+    for fmt in fresh.get("formats") or ():
+        if fmt.get("format_id") == info_dict.get("format_id"):
+            return fmt.get("url")
+    return None
+
+
+def stream_renewal(fd, info_dict):
+    """The StreamRenewal of one stream a yt-dlp file downloader fetches, set up from its params."""
+    return StreamRenewal(lambda: fresh_url(fd.ydl, info_dict), fd.params.get("renew_below", 0))
+
+
+def urllib_range_opener(url, headers=None):
+    """``open_range`` for plain urllib, for use outside yt-dlp."""
+    def open_range(start, end):
+        request = urllib.request.Request(url, headers={
+            **(headers or {}), "Range": f"bytes={start}-{end}", "Accept-Encoding": "identity"})
+        return urllib.request.urlopen(request, timeout=30)
+    return open_range
+
+
+class SegmentState:
+    """Sidecar JSON recording which segments of a preallocated file are on disk."""
+
+    def __init__(self, path, size, segment_size, validator, done=()):
+        self.path = path
+        self.size = size
+        self.segment_size = segment_size
+        self.validator = validator
+        self.done = set(done)
+        self._lock = threading.Lock()
+
+    @property
+    def segment_count(self):
+        return max(1, -(-self.size // self.segment_size))
+
+    def segment_range(self, index):
+        start = index * self.segment_size
+        return start, min(start + self.segment_size, self.size) - 1
+
+    @classmethod
+    def load(cls, path, size, validator):
+        """Return the saved state if it describes the same remote file, else None."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("size") != size or (validator and data.get("validator") not in (None, validator)):
+            return None
+        return cls(path, size, data["segment_size"], validator, data.get("done", ()))
+
+    def mark_done(self, index):
+        with self._lock:
+            self.done.add(index)
+            self._save_locked()
+
+    def save(self):
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self):
+        data = {"size": self.size, "segment_size": self.segment_size,
+                "validator": self.validator, "done": sorted(self.done)}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)  # atomic, so a crash never leaves a torn state file
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SegmentedDownload:
+    """Fetch one URL into ``filename`` over ``connections`` parallel range requests."""
+
+    def __init__(self, open_range, filename, connections=4, segment_size=SEGMENT_SIZE, retries=SEGMENT_RETRIES,
+                 throttle=None):
+        self.open_range = open_range
+        self.throttle = throttle  # called with each block's size before it's read (e.g. JobMeter.consume)
+        self.filename = filename
+        self.connections = max(1, connections)
+        self.segment_size = segment_size
+        self.retries = retries
+        self.size = None
+        self.resumed_bytes = 0
+        self._segment_bytes = {}  # index -> bytes written so far (in-flight segments)
+        self._errors = []
+        self.retry_errors = []  # one per retried segment request
+        self._stop_event = None
+        self._responses = set()  # open range responses, closed by abort() and renew()
+        self._responses_lock = threading.Lock()
+        self._generation = 0  # bumped by renew(); a connection opened before is closed and reopened
+
+    @property
+    def state_path(self):
+        return self.filename + STATE_SUFFIX
+
+    @property
+    def downloaded_bytes(self):
+        done = self._state.done
+        complete = sum(self._segment_length(i) for i in done)
+        return complete + sum(n for i, n in list(self._segment_bytes.items()) if i not in done)
+
+    def _segment_length(self, index):
+        start, end = self._state.segment_range(index)
+        return end - start + 1
+
+    def prepare(self):
+        """Probe the size, load or create the resume state and preallocate the file."""
+        self.size, validator = probe(self.open_range)
+        state = SegmentState.load(self.state_path, self.size, validator)
+        if state is None or not os.path.isfile(self.filename) or os.path.getsize(self.filename) != self.size:
+            segment_size = max(self.segment_size, -(-self.size // (self.connections * 64)))
+            state = SegmentState(self.state_path, self.size, segment_size, validator)
+            with open(self.filename, "wb") as f:
+                f.truncate(self.size)
+            state.save()
+        self._state = state
+        self.resumed_bytes = sum(self._segment_length(i) for i in state.done)
+        return self.size
+
+    def run(self, on_progress=None, stop_event=None, report_interval=0.25):
+        """Download the missing segments; ``on_progress(downloaded, total)`` runs on this thread.
+
+        ``on_progress`` may raise to abort (e.g. yt-dlp's DownloadCancelled):
+        the workers are stopped, and the finished segments stay recorded.
+        """
+        if self.size is None:
+            self.prepare()
+        stop_event = self._stop_event = stop_event or threading.Event()
+        pending = [i for i in range(self._state.segment_count) if i not in self._state.done]
+        pending_lock = threading.Lock()
+
+        def next_segment():
+            with pending_lock:
+                return pending.pop(0) if pending else None
+
+        workers_left = [min(self.connections, len(pending))]
+        all_finished = threading.Event()
+        if not workers_left[0]:
+            all_finished.set()
+
+        def worker():
+            try:
+                with open(self.filename, "r+b") as f:
+                    while not stop_event.is_set():
+                        index = next_segment()
+                        if index is None:
+                            return
+                        self._fetch_segment(f, index, stop_event)
+            except Exception as e:
+                self._errors.append(e)
+                stop_event.set()
+            finally:
+                with pending_lock:
+                    workers_left[0] -= 1
+                    if not workers_left[0]:
+                        all_finished.set()
+
+        threads = [threading.Thread(target=worker, daemon=True, name=f"segment-{n}")
+                   for n in range(workers_left[0])]
+        for t in threads:
+            t.start()
+        try:
+            while not all_finished.wait(report_interval):
+                if on_progress:
+                    on_progress(self.downloaded_bytes, self.size)
+        except BaseException:
+            stop_event.set()
+            for t in threads:
+                t.join()
+            raise
+        if self._errors:
+            raise self._errors[0]
+        if stop_event.is_set() and len(self._state.done) < self._state.segment_count:
+            raise InterruptedError("segmented download stopped")
+        self._state.remove()
+        return self.size
+
+    def abort(self):
+        """Stop the workers from another thread, closing their connections mid-read."""
+        if self._stop_event is not None:
+            self._stop_event.set()
+        self._close_responses()
+
+    def renew(self, open_range):
+        """Go on over another URL of the same file, e.g. a freshly resolved one; callable from any thread.
+
+        Raises if ``open_range`` doesn't serve a file of the same size and
+        validator. Otherwise the open connections are closed and their
+        segments reconnect at once from the bytes already written.
+        """
+        size, validator = probe(open_range)
+        if size != self.size or (validator and self._state.validator not in (None, validator)):
+            raise RangeNotSupported(f"the new URL serves a different file ({size} bytes, {validator})")
+        self.open_range = open_range
+        self._generation += 1
+        self._close_responses()
+
+    def _close_responses(self):
+        with self._responses_lock:
+            responses = list(self._responses)
+        for response in responses:
+            try:
+                response.close()
+            except Exception:
+                pass
+
+    def _fetch_segment(self, f, index, stop_event):
+        start, end = self._state.segment_range(index)
+        attempt = 0
+        while True:
+            offset = start + self._segment_bytes.get(index, 0)
+            generation = self._generation
+            try:
+                response = self.open_range(offset, end)
+                with self._responses_lock:
+                    self._responses.add(response)
+                    renewed = generation != self._generation  # renew() ran while this one was opening
+                if renewed:
+                    response.close()
+                try:
+                    content_range = _header(response, "Content-Range") or ""
+                    if response.status != 206 or not content_range.startswith(f"bytes {offset}-"):
+                        raise RangeNotSupported(f"unexpected response for bytes {offset}-{end}")
+                    f.seek(offset)
+                    while offset <= end:
+                        if stop_event.is_set():
+                            return
+                        size = min(BLOCK_SIZE, end - offset + 1)
+                        if self.throttle:
+                            self.throttle(size)
+                            if stop_event.is_set():
+                                return
+                        block = response.read(size)
+                        if not block:
+                            raise ConnectionError(f"connection closed at byte {offset}")
+                        f.write(block)
+                        offset += len(block)
+                        self._segment_bytes[index] = offset - start
+                finally:
+                    with self._responses_lock:
+                        self._responses.discard(response)
+                    response.close()
+                break
+            except RangeNotSupported:
+                raise
+            except Exception as e:
+                if stop_event.is_set():
+                    return  # aborted: the read failed because its connection was closed
+                if generation != self._generation:
+                    continue  # renew() closed the connection: reopen over the new URL, not a retry
+                if attempt >= self.retries:
+                    raise
+                self.retry_errors.append(e)
+                time.sleep(min(2 ** attempt, 8))
+                attempt += 1
+        # Durable before it is recorded, so a crash can't mark unwritten bytes as done
+        f.flush()
+        os.fsync(f.fileno())
+        self._state.mark_done(index)
+        self._segment_bytes.pop(index, None)
+
+
+class SegmentedHttpFD(FileDownloader):
+    """yt-dlp file downloader that runs plain HTTP(S) streams through SegmentedDownload."""
+
+    FD_NAME = "segmented"
+
+    @staticmethod
+    def supports(info_dict):
+        return info_dict.get("protocol", "https") in ("http", "https") and bool(info_dict.get("url"))
+
+    def real_download(self, filename, info_dict):
+        headers = {**(info_dict.get("http_headers") or {}), "Accept-Encoding": "identity"}
+        tmpfilename = self.temp_name(filename)
+        meter = self.params.get("bandwidth_meter")
+        download = SegmentedDownload(ydl_range_opener(self.ydl, info_dict["url"], headers), tmpfilename,
+                                     self.params.get("segment_connections", 4),
+                                     throttle=meter.consume if meter else None)
+        try:
+            download.prepare()
+        except (RangeNotSupported, yt_dlp.networking.exceptions.HTTPError):
+            # No usable Range support: fall back to yt-dlp's single-connection downloader
+            fd = ThrottledHttpFD(self.ydl, self.params)
+            for ph in self._progress_hooks:
+                fd.add_progress_hook(ph)
+            return fd.real_download(filename, info_dict)
+
+        start_time = time.time()
+        renewal = stream_renewal(self, info_dict)
+        renewal.start(download.resumed_bytes)
+
+        def report(downloaded, total):
+            elapsed = time.time() - start_time
+            speed = self.calc_speed(start_time, time.time(), downloaded - download.resumed_bytes)
+            self._hook_progress({
+                "status": "downloading",
+                "downloaded_bytes": downloaded,
+                "total_bytes": total,
+                "tmpfilename": tmpfilename,
+                "filename": filename,
+                "elapsed": elapsed,
+                "speed": speed,
+                "eta": self.calc_eta(speed, total - downloaded),
+            }, info_dict)
+            url = renewal.check(downloaded, meter is not None and meter.limited)
+            if url:
+                try:
+                    download.renew(ydl_range_opener(self.ydl, url, headers))
+                except Exception as e:
+                    renewal.failed(e)
+                else:
+                    self._hook_progress({"status": "renewed", "renewal": renewal.renewals[-1].to_dict(),
+                                         "filename": filename}, info_dict)
+
+        with cancel.stopping(download.abort):
+            download.run(on_progress=report)
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress({
+            "status": "finished",
+            "downloaded_bytes": download.size,
+            "total_bytes": download.size,
+            "filename": filename,
+            "elapsed": time.time() - start_time,
+            "retries": len(download.retry_errors),  # read by the engine's job metrics
+            "renewals": renewal.to_list(),
+        }, info_dict)
+        return True
+
+
+class _RenewUrl(Exception):
+    """Raised inside HttpFD's download loop to restart it over a fresh URL."""
+
+    def __init__(self, url):
+        super().__init__(url)
+        self.url = url
+
+
+class ThrottledHttpFD(HttpFD):
+    """yt-dlp's single-connection HTTP downloader, paced by the job's bandwidth meter.
+
+    Also counts its retries and URL renewals and reports them in the
+    ``finished`` progress event. A renewal stops HttpFD's download loop and
+    starts it again over the fresh URL, resuming from the ``.part`` file.
+    """
+
+    _throttle_start = None
+    _throttled_bytes = 0
+    _retry_count = 0
+    _renewal = None
+    _download_started = None
+
+    def real_download(self, filename, info_dict):
+        self._renewal = stream_renewal(self, info_dict)
+        self._download_started = time.time()
+        tmpfilename = self.temp_name(filename)
+        resume_len = 0
+        if self.params.get("continuedl", True) and os.path.isfile(tmpfilename):
+            resume_len = os.path.getsize(tmpfilename)  # HttpFD resumes from here
+        self._renewal.start(resume_len)
+        while True:
+            try:
+                return super().real_download(filename, info_dict)
+            except _RenewUrl as renew:
+                info_dict = {**info_dict, "url": renew.url}
+
+    def report_retry(self, err, count, retries, *args, **kwargs):
+        self._retry_count += 1
+        super().report_retry(err, count, retries, *args, **kwargs)
+
+    def _hook_progress(self, status, info_dict):
+        renewal = self._renewal
+        if status.get("status") == "finished":
+            status["retries"] = self._retry_count
+            if renewal is not None:
+                status["renewals"] = renewal.to_list()
+                if renewal.renewals and status.get("elapsed") is not None:
+                    status["elapsed"] = time.time() - self._download_started  # over every URL, not the last
+        super()._hook_progress(status, info_dict)
+        if status.get("status") == "downloading" and renewal is not None:
+            meter = self.params.get("bandwidth_meter")
+            url = renewal.check(status["downloaded_bytes"], meter is not None and meter.limited)
+            if url:
+                self._switch_url(url, status, info_dict)
+
+    def _switch_url(self, url, status, info_dict):
+        headers = {**(info_dict.get("http_headers") or {}), "Accept-Encoding": "identity"}
+        try:
+            size, _ = probe(ydl_range_opener(self.ydl, url, headers))
+            if status.get("total_bytes") and size != status["total_bytes"]:
+                raise RangeNotSupported(f"the new URL serves a different file ({size} bytes)")
+        except Exception as e:
+            self._renewal.failed(e)
+            return
+        super()._hook_progress({"status": "renewed", "renewal": self._renewal.renewals[-1].to_dict(),
+                                "filename": status.get("filename")}, info_dict)
+        raise _RenewUrl(url)  # HttpFD closes the .part file on its way out
+
+    def slow_down(self, start_time, now, byte_counter):
+        meter = self.params.get("bandwidth_meter")
+        if meter is not None:
+            # byte_counter is cumulative since start_time, which restarts on every retry
+            if start_time != self._throttle_start:
+                self._throttle_start = start_time
+                self._throttled_bytes = 0
+            meter.consume(byte_counter - self._throttled_bytes)
+            self._throttled_bytes = byte_counter
+        super().slow_down(start_time, now, byte_counter)
+
+    def best_block_size(self, elapsed_time, bytes):
+        size = super().best_block_size(elapsed_time, bytes)
+        meter = self.params.get("bandwidth_meter")
+        # HttpFD grows reads to 4 MiB; keep them small under a limit so pacing stays smooth
+        if meter is not None and meter.limited:
+            return min(size, THROTTLED_BLOCK_SIZE)
+        # and smaller still while a slowdown can renew the URL: a read blocks until it is full, and
+        # at a throttled rate a larger one would hide the stream from the detector for many seconds
+        if self._renewal is not None and self._renewal.enabled:
+            return min(size, WATCHED_BLOCK_SIZE)
+        return size
+
+
+class SegmentedYoutubeDL(yt_dlp.YoutubeDL):
+    """YoutubeDL that hands plain HTTP(S) streams to SegmentedHttpFD or ThrottledHttpFD.
+
+    Segmenting is enabled by the ``segment_connections`` param (> 1); other
+    plain HTTP(S) streams go through ThrottledHttpFD, which paces them by a
+    ``bandwidth_meter`` param if there is one. DASH/HLS fragments and the
+    rest go through yt-dlp's own downloaders, as do time ranges (ffmpeg
+    fetches only the part it needs).
+    """
+
+    def dl(self, name, info, subtitle=False, test=False):
+        files = self.params.get("partial_files")  # a cancel.PartialFiles
+        if files is not None and not test and name != "-":
+            files.add(info.get("id"), name)
+        clip = info.get("section_start") or info.get("section_end")
+        if subtitle or test or name == "-" or clip or not SegmentedHttpFD.supports(info):
+            return super().dl(name, info, subtitle=subtitle, test=test)
+        fd_class = SegmentedHttpFD if self.params.get("segment_connections", 1) > 1 else ThrottledHttpFD
+        new_info = dict(info)
+        if new_info.get("http_headers") is None:
+            new_info["http_headers"] = self._calc_headers(new_info)
+        fd = fd_class(self, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        return fd.download(name, new_info, subtitle)
+
+
+class TrackedPopen(Popen):
+    """yt-dlp's Popen, terminated when the job of the thread that started it is cancelled.
+
+    The stop function is dropped as soon as the process is reaped, whether
+    through ``wait`` (which ``communicate`` and ``Popen.run`` end with),
+    ``poll`` or the ``with`` block: yt-dlp doesn't always use one.
+    """
+
+    _unregister = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        token = cancel.current()
+        self._unregister = token.on_cancel(self.terminate) if token is not None else None
+
+    def _reaped(self):
+        unregister, self._unregister = self._unregister, None
+        if unregister is not None:
+            unregister()
+
+    def wait(self, timeout=None):
+        returncode = super().wait(timeout)
+        self._reaped()
+        return returncode
+
+    def poll(self):
+        returncode = super().poll()
+        if returncode is not None:
+            self._reaped()
+        return returncode
+
+    def __exit__(self, *exc_info):
+        try:
+            return super().__exit__(*exc_info)
+        finally:
+            self._reaped()
+
+
+# Every ffmpeg/ffprobe run goes through these module globals, also in
+# post-processing pool processes (which import this module via pipeline)
+external.Popen = ffmpeg.Popen = TrackedPopen
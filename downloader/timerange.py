@@ -0,0 +1,87 @@
+"""Time ranges ("clips"): downloading only part of a video.
+
+A clip goes through yt-dlp's ``download_ranges``: ffmpeg seeks in each
+stream with HTTP range requests (or takes only the HLS/DASH fragments that
+cover the window) and stream-copies from the keyframe before the start, so
+about the window's bytes are fetched and nothing is re-encoded. The frames
+between that keyframe and the start stay in the MP4 only to decode from;
+its edit list skips them on playback, so the clip still starts on the
+requested frame.
+"""
+
+import math
+
+TIME_FORMAT_HINT = "seconds, M:SS or H:MM:SS"
+
+
+def parse_time(text):
+    """Seconds from "95", "1:35", "1:02:03" or "1:35.5"; None for a blank field. Raises ValueError."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    parts = text.split(":")
+    if len(parts) > 3:
+        raise ValueError(f"Invalid time {text!r}: use {TIME_FORMAT_HINT}")
+    try:
+        values = [float(part) for part in parts]
+    except ValueError:
+        raise ValueError(f"Invalid time {text!r}: use {TIME_FORMAT_HINT}") from None
+    if any(not math.isfinite(v) or v < 0 for v in values) or any(v >= 60 for v in values[1:]):
+        raise ValueError(f"Invalid time {text!r}: use {TIME_FORMAT_HINT}")
+    seconds = 0.0
+    for value in values:
+        seconds = seconds * 60 + value
+    return seconds
+
+
+def _split(seconds):
+    """(hours, minutes, seconds, ".5"-style tenths or "")."""
+    whole = int(seconds)
+    tenths = round((seconds - whole) * 10)
+    if tenths == 10:
+        whole, tenths = whole + 1, 0
+    mins, secs = divmod(whole, 60)
+    hours, mins = divmod(mins, 60)
+    return hours, mins, secs, f".{tenths}" if tenths else ""
+
+
+def format_time(seconds):
+    """E.g. "1:35", "1:02:03" or "1:35.5"."""
+    hours, mins, secs, fraction = _split(seconds)
+    if hours:
+        return f"{hours}:{mins:02d}:{secs:02d}{fraction}"
+    return f"{mins}:{secs:02d}{fraction}"
+
+
+def clip_label(start, end):
+    """A file-name-safe name for a range, e.g. "1m35s-3m00s" or "1h02m03s-end"."""
+
+    def label(seconds):
+        hours, mins, secs, fraction = _split(seconds)
+        return f"{hours}h{mins:02d}m{secs:02d}{fraction}s" if hours else f"{mins}m{secs:02d}{fraction}s"
+
+    return f"{label(start or 0)}-{label(end) if end is not None else 'end'}"
+
+
+def clip_seconds(start, end, duration):
+    """Seconds of a ``duration``-long video that the range covers."""
+    stop = duration if end is None else min(end, duration)
+    return max(stop - (start or 0), 0)
+
+
+def clip_share(start, end, duration):
+    """Fraction of a ``duration``-long video the range covers; 1 without a range (or a known duration)."""
+    if (start is None and end is None) or not duration:
+        return 1.0
+    return clip_seconds(start, end, duration) / duration
+
+
+def validate_range(start, end, duration=None):
+    """Raise ValueError if the range is empty, or starts after a video of ``duration`` ends."""
+    if end is not None and end <= 0:
+        raise ValueError(f"The end ({format_time(end)}) must be after the start of the video")
+    if start is not None and end is not None and end <= start:
+        raise ValueError(f"The end ({format_time(end)}) must be after the start ({format_time(start)})")
+    if duration and start and start >= duration:
+        raise ValueError(f"The range starts at {format_time(start)}, but the video is only "
+                         f"{format_time(duration)} long")
@@ -0,0 +1,263 @@
+"""UI-thread responsiveness: Tk main-loop latency, callback timings and an on-demand profiler.
+
+While a ``LoopMonitor`` is attached to the Tk root, every ``after``
+callback records its lag (how much later than due it ran), every callback
+Tk runs (``after`` callbacks, event bindings, widget commands) records how
+long it took, and the number of ``after`` callbacks scheduled but not run
+yet is kept as a queue-depth gauge. A heartbeat every HEARTBEAT_MS keeps
+the lag measured while nothing else is scheduled. ``snapshot()``
+summarises the last WINDOW seconds for the debug overlay. Attaching
+patches ``tkinter.Misc.after``/``after_cancel`` and
+``tkinter.CallWrapper``; detaching restores them, so an app that never
+shows the overlay pays nothing.
+
+``ProfileSession`` records the UI thread with cProfile and every thread
+with a sampling profiler (``sys._current_frames`` every SAMPLE_INTERVAL)
+until stopped, then writes ``<stamp>-ui.prof`` (pstats, e.g. for
+snakeviz) and ``<stamp>-threads.txt`` (collapsed stacks, "thread;frame;...
+count" per line, for flamegraph.pl or speedscope).
+"""
+
+import cProfile
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+HEARTBEAT_MS = 100
+WINDOW = 10.0  # seconds of lag and callback samples a snapshot covers
+SLOWEST = 5  # callbacks listed in a snapshot
+SAMPLE_INTERVAL = 0.01  # seconds between stack samples of all threads
+MAX_DEPTH = 128  # frames kept per sampled stack, innermost first
+
+
+def callback_name(func):
+    """Short name for a Tk callback: the function or method name, with the line for lambdas."""
+    name = getattr(func, "__name__", None) or type(func).__name__
+    code = getattr(func, "__code__", None)
+    if name == "<lambda>" and code is not None:
+        return f"<lambda>:{code.co_firstlineno}"
+    return name
+
+
+@dataclass
+class LoopStats:
+    lag: float = 0.0  # seconds the latest heartbeat ran late
+    lag_p95: float = 0.0  # over the window, every after callback
+    lag_max: float = 0.0
+    pending: int = 0  # after callbacks scheduled and not run yet
+    calls: int = 0  # callbacks Tk ran in the window
+    slowest: list = field(default_factory=list)  # [(name, seconds)] longest callbacks in the window, longest first
+
+
+def format_loop_stats(stats):
+    """Overlay text for a LoopStats."""
+    lines = [f"Loop lag {stats.lag * 1000:.0f} ms (p95 {stats.lag_p95 * 1000:.0f}, max {stats.lag_max * 1000:.0f})",
+             f"{stats.pending} pending, {stats.calls} callbacks in {WINDOW:.0f} s"]
+    lines += [f"{seconds * 1000:6.1f} ms  {name}" for name, seconds in stats.slowest]
+    return "\n".join(lines)
+
+
+class LoopMonitor:
+    """Tk main-loop latency and callback durations; attach to one root at a time."""
+
+    _attached = None  # the monitor currently patching tkinter
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._lags = deque()  # (time, lag)
+        self._calls = deque()  # (time, name, duration)
+        self._pending = set()  # after IDs
+        self._heartbeat_lag = 0.0
+        self._root = None
+        self._originals = None
+
+    @property
+    def attached(self):
+        return self._root is not None
+
+    def attach(self, root):
+        """Start measuring ``root``'s main loop; call on the UI thread."""
+        import tkinter
+
+        if LoopMonitor._attached is not None:
+            raise RuntimeError("another LoopMonitor is attached")
+        LoopMonitor._attached = self
+        self._root = root
+        original_after = tkinter.Misc.after
+        original_cancel = tkinter.Misc.after_cancel
+        original_call = tkinter.CallWrapper.__call__
+        self._originals = (original_after, original_cancel, original_call)
+        monitor = self
+
+        def after(widget, ms, func=None, *args):
+            if func is None:
+                return original_after(widget, ms)
+            due = monitor._clock() + (0 if ms == "idle" else ms / 1000)
+            entry = [None, False]  # after ID, ran; after may be called from other threads
+
+            def timed(*call_args):
+                monitor._ran(entry, monitor._clock() - due)
+                return func(*call_args)
+
+            timed.__name__ = callback_name(func)  # the name Tk's wrapper (and so the call timing) sees
+            after_id = original_after(widget, ms, timed, *args)
+            monitor._scheduled(entry, after_id)
+            return after_id
+
+        def after_cancel(widget, after_id):
+            with monitor._lock:
+                monitor._pending.discard(after_id)
+            return original_cancel(widget, after_id)
+
+        def call(wrapper, *args):
+            started = monitor._clock()
+            try:
+                return original_call(wrapper, *args)
+            finally:
+                monitor._record_call(callback_name(wrapper.func), monitor._clock() - started)
+
+        tkinter.Misc.after = after
+        tkinter.Misc.after_cancel = after_cancel
+        tkinter.CallWrapper.__call__ = call
+        self._beat_id = root.after(HEARTBEAT_MS, self._beat, self._clock() + HEARTBEAT_MS / 1000)
+
+    def detach(self):
+        import tkinter
+
+        if self._root is None:
+            return
+        root, self._root = self._root, None
+        try:
+            root.after_cancel(self._beat_id)
+        except tkinter.TclError:
+            pass  # the window is gone
+        tkinter.Misc.after, tkinter.Misc.after_cancel, tkinter.CallWrapper.__call__ = self._originals
+        LoopMonitor._attached = None
+        with self._lock:
+            self._pending.clear()
+
+    def _beat(self, due):
+        self._heartbeat_lag = max(self._clock() - due, 0.0)
+        if self._root is not None:
+            self._beat_id = self._root.after(HEARTBEAT_MS, self._beat, self._clock() + HEARTBEAT_MS / 1000)
+
+    def _scheduled(self, entry, after_id):
+        with self._lock:
+            entry[0] = after_id
+            if not entry[1]:
+                self._pending.add(after_id)
+
+    def _ran(self, entry, lag):
+        now = self._clock()
+        with self._lock:
+            entry[1] = True
+            self._pending.discard(entry[0])
+            self._lags.append((now, max(lag, 0.0)))
+            self._trim(self._lags, now)
+
+    def _record_call(self, name, duration):
+        now = self._clock()
+        with self._lock:
+            self._calls.append((now, name, duration))
+            self._trim(self._calls, now)
+
+    @staticmethod
+    def _trim(samples, now):
+        while samples and samples[0][0] < now - WINDOW:
+            samples.popleft()
+
+    def snapshot(self):
+        """LoopStats over the last WINDOW seconds."""
+        now = self._clock()
+        with self._lock:
+            self._trim(self._lags, now)
+            self._trim(self._calls, now)
+            lags = [lag for _, lag in self._lags]
+            calls = list(self._calls)
+            pending = len(self._pending)
+        slowest = sorted(calls, key=lambda call: call[2], reverse=True)[:SLOWEST]
+        return LoopStats(
+            lag=self._heartbeat_lag,
+            lag_p95=statistics.quantiles(lags, n=20)[-1] if len(lags) >= 2 else (lags[0] if lags else 0.0),
+            lag_max=max(lags, default=0.0),
+            pending=pending,
+            calls=len(calls),
+            slowest=[(name, duration) for _, name, duration in slowest],
+        )
+
+
+class StackSampler:
+    """Collapsed stacks of every thread, sampled on a background thread."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self._counts = Counter()  # (thread name, frames outermost first) -> samples
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="stack-sampler")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self._counts[(names.get(ident, str(ident)), tuple(reversed(stack)))] += 1
+            self.samples += 1
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for (thread, stack), count in self._counts.most_common():
+                frames = ";".join(frame.replace(";", ",") for frame in stack)
+                f.write(f"{thread};{frames} {count}\n")
+
+
+class ProfileSession:
+    """cProfile of the UI thread plus stack samples of all threads, written to ``folder`` when stopped.
+
+    ``start`` and ``stop`` must be called on the UI thread: cProfile only
+    follows the thread that enables it.
+    """
+
+    def __init__(self, folder, interval=SAMPLE_INTERVAL):
+        self.folder = folder
+        self.started = None
+        self._profile = cProfile.Profile()
+        self._sampler = StackSampler(interval)
+
+    def start(self):
+        self.started = time.time()
+        self._sampler.start()
+        self._profile.enable()
+
+    def stop(self):
+        """Stop recording and write the files; returns their paths. Raises OSError if they can't be written."""
+        self._profile.disable()
+        self._sampler.stop()
+        os.makedirs(self.folder, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        ui_path = os.path.join(self.folder, f"{stamp}-ui.prof")
+        threads_path = os.path.join(self.folder, f"{stamp}-threads.txt")
+        self._profile.dump_stats(ui_path)
+        self._sampler.write(threads_path)
+        return ui_path, threads_path
@@ -0,0 +1,75 @@
+"""Long-lived YoutubeDL instances for metadata extraction.
+
+Building a YoutubeDL and loading its extractors costs tens of milliseconds,
+and each instance keeps its own HTTP connections (kept alive when yt-dlp's
+``requests`` handler is installed), cookies and per-extractor caches such as
+YouTube's player code. Fetches, playlist resolution and the extraction step
+of downloads therefore borrow an instance from ``YoutubeDLPool`` instead of
+building one per call.
+"""
+
+import threading
+from contextlib import contextmanager
+
+import yt_dlp
+
+MAX_IDLE = 8  # instances kept for reuse; extra ones made under load are closed on return
+WARM_EXTRACTORS = ("Youtube", "YoutubeTab")
+_MISSING = object()
+
+
+class YoutubeDLPool:
+    """Hands out YoutubeDL instances, one borrower at a time each, and takes them back."""
+
+    def __init__(self, params=None, max_idle=MAX_IDLE):
+        self.params = {"quiet": True, "no_warnings": True, **(params or {})}
+        self.max_idle = max_idle
+        self._idle = []  # most recently returned last: its connections are the warmest
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return yt_dlp.YoutubeDL(dict(self.params))
+
+    def _release(self, ydl):
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_idle:
+                self._idle.append(ydl)
+                return
+        ydl.close()
+
+    @contextmanager
+    def borrow(self, **overrides):
+        """Borrow an instance with ``overrides`` applied to its params for the duration.
+
+        Only params yt-dlp reads per call (``noplaylist``, ``extract_flat``, ...)
+        may be overridden; hooks and postprocessors are fixed at construction.
+        """
+        ydl = self._acquire()
+        saved = {key: ydl.params.get(key, _MISSING) for key in overrides}
+        ydl.params.update(overrides)
+        try:
+            yield ydl
+        finally:
+            for key, value in saved.items():
+                if value is _MISSING:
+                    ydl.params.pop(key, None)
+                else:
+                    ydl.params[key] = value
+            self._release(ydl)
+
+    def warm(self):
+        """Build an instance and load the YouTube extractors ahead of the first fetch."""
+        with self.borrow() as ydl:
+            for key in WARM_EXTRACTORS:
+                ydl.get_info_extractor(key)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for ydl in idle:
+            ydl.close()
@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)  # the repository is run from its folder, not installed
+
+from benchmarks import extractor  # noqa: E402
+from benchmarks.fixtures import write_random_file  # noqa: E402
+from benchmarks.server import FakeMediaServer  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def app_data(tmp_path, monkeypatch):
+    """Keep caches, archives and histories out of the user's app data folder."""
+    path = tmp_path / "appdata"
+    monkeypatch.setenv("LOCALAPPDATA", str(path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(path))
+    return path
+
+
+@pytest.fixture
+def media_dir(tmp_path):
+    path = tmp_path / "media"
+    path.mkdir()
+    return str(path)
+
+
+@pytest.fixture
+def server(media_dir):
+    extractor.register()
+    with FakeMediaServer(media_dir) as server:
+        yield server
+
+
+@pytest.fixture
+def add_video(server, media_dir):
+    """``add_video(video_id, size)``: register a video with one progressive format of ``size`` random bytes."""
+    def add(video_id, size, title=None, seed=0):
+        name = f"{video_id}.bin"
+        write_random_file(os.path.join(media_dir, name), size, seed=seed)
+        return server.add_video(video_id, title or f"Video {video_id}", 60, [
+            {"format_id": "prog-720", "path": name, "ext": "mp4", "vcodec": "avc1.64001F",
+             "acodec": "mp4a.40.2", "height": 720, "width": 1280, "filesize": size}])
+    return add
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from downloader.archive import DownloadArchive
+from downloader.engine import DownloadEngine
+from downloader.options import DownloadOptions
+
+SIZE = 256 * 1024
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = DownloadArchive(str(tmp_path / "archive.sqlite3"))
+    yield archive
+    archive.close()
+
+
+@pytest.fixture
+def engine(archive):
+    engine = DownloadEngine(archive=archive)
+    yield engine
+    engine.close()
+
+
+@pytest.fixture
+def playlist(server, add_video):
+    for n in range(3):
+        add_video(f"v{n}", SIZE, title=f"Video {n}", seed=n)
+    return server.add_playlist("pl", "Playlist", ["v0", "v1", "v2"])
+
+
+def test_record_and_lookup(tmp_path, archive):
+    path = tmp_path / "a.mp4"
+    path.write_bytes(b"x" * 10)
+    archive.record("a", "video:720:Best", str(tmp_path), "18", str(path), 10)
+    assert archive.is_complete("a", "video:720:Best", str(tmp_path))
+    assert not archive.is_complete("a", "video:1080:Best", str(tmp_path))  # another variant
+    assert not archive.is_complete("a", "video:720:Best", str(tmp_path / "other"))  # another folder
+    path.write_bytes(b"x" * 5)
+    assert not archive.is_complete("a", "video:720:Best", str(tmp_path))  # the file changed
+    path.unlink()
+    assert not archive.is_complete("a", "video:720:Best", str(tmp_path))
+
+
+def test_resync_skips_archived_entries_without_downloading(tmp_path, server, engine, playlist):
+    options = DownloadOptions(str(tmp_path / "out"), quality=720)
+    first = engine.download(playlist, options)
+    assert (first.total, first.skipped, first.failures) == (3, 0, [])
+    requests = server.requests
+
+    second = engine.download(playlist, options)
+    assert (second.total, second.skipped) == (3, 3)
+    assert server.requests - requests == 1  # the playlist listing; no entry metadata, no media
+
+
+def test_missing_file_and_new_variant_download_again(tmp_path, engine, playlist):
+    out = tmp_path / "out"
+    engine.download(playlist, DownloadOptions(str(out), quality=720))
+    os.remove(out / "Video 1.mp4")
+
+    result = engine.download(playlist, DownloadOptions(str(out), quality=720))
+    assert result.skipped == 2
+    assert (out / "Video 1.mp4").stat().st_size == SIZE
+
+    result = engine.download(playlist, DownloadOptions(str(out), quality=720, preset="Medium"))
+    assert result.skipped == 0
+
+
+def test_force_refresh_ignores_the_archive(tmp_path, engine, playlist):
+    options = DownloadOptions(str(tmp_path / "out"), quality=720)
+    engine.download(playlist, options)
+    options.force_refresh = True
+    assert engine.download(playlist, options).skipped == 0
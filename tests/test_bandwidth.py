@@ -0,0 +1,114 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from downloader.bandwidth import BandwidthLimiter, BandwidthSchedule, mbit_to_bytes, parse_mbit
+
+MB = 1024 * 1024
+
+
+def at(clock):
+    hours, minutes = map(int, clock.split(":"))
+    return datetime(2026, 1, 1, hours, minutes)
+
+
+def test_schedule_parse_and_format():
+    schedule = BandwidthSchedule.parse("08:00-18:00=20, 18:00-08:00=off")
+    assert schedule.windows == [(480, 1080, mbit_to_bytes(20)), (1080, 480, None)]
+    assert str(schedule) == "08:00-18:00=20, 18:00-08:00=off"
+
+
+def test_schedule_window_wraps_past_midnight():
+    schedule = BandwidthSchedule.parse("22:00-06:00=5")
+    assert schedule.window_at(at("23:30"))[2] == mbit_to_bytes(5)
+    assert schedule.window_at(at("05:59")) is not None
+    assert schedule.window_at(at("06:00")) is None
+    assert schedule.window_at(at("12:00")) is None
+
+
+def test_schedule_first_matching_window_wins():
+    schedule = BandwidthSchedule.parse("08:00-18:00=20; 12:00-13:00=off")
+    assert schedule.window_at(at("12:30"))[2] == mbit_to_bytes(20)
+
+
+@pytest.mark.parametrize("text", ["10:75-11:00=5", "10:-5-11:00=5", "25:00-01:00=5", "24:30-01:00=5",
+                                  "10:-11:00=5", "08:00=5", "08:00-09:00", "08:00-09:00=0", "a-b=5"])
+def test_schedule_rejects_invalid_specs(text):
+    with pytest.raises(ValueError):
+        BandwidthSchedule.parse(text)
+
+
+def test_parse_mbit():
+    assert parse_mbit("off") is None
+    assert parse_mbit(" 12.5 ") == 12.5
+    with pytest.raises(ValueError):
+        parse_mbit("-1")
+
+
+@pytest.mark.parametrize("text", ["0", "nan", "NaN", "inf", "-inf", "1e999", "fast"])
+def test_parse_mbit_rejects_non_positive_and_non_finite(text):
+    with pytest.raises(ValueError):
+        parse_mbit(text)
+
+
+def test_unlimited_consume_does_not_wait():
+    limiter = BandwidthLimiter()
+    started = time.monotonic()
+    for _ in range(100):
+        limiter.consume(MB)
+    assert time.monotonic() - started < 0.1
+    assert not limiter.limited
+
+
+def test_token_bucket_paces_to_the_rate():
+    limiter = BandwidthLimiter(4 * MB)
+    started = time.monotonic()
+    for _ in range(128):
+        limiter.consume(64 * 1024)  # 8 MiB at 4 MiB/s, starting from an empty bucket
+    elapsed = time.monotonic() - started
+    assert 1.8 <= elapsed <= 2.8
+
+
+def test_rate_change_applies_to_waiting_connections():
+    limiter = BandwidthLimiter(64 * 1024)  # the bucket starts empty: 256 KiB would take 4 s
+    threading.Timer(0.3, limiter.set_rate, (None,)).start()
+    started = time.monotonic()
+    limiter.consume(256 * 1024)
+    assert time.monotonic() - started < 1.0
+
+
+def test_cancel_releases_a_waiting_connection():
+    limiter = BandwidthLimiter(64 * 1024)
+    cancelled = threading.Event()
+    threading.Timer(0.2, cancelled.set).start()
+    started = time.monotonic()
+    limiter.consume(4 * MB, cancelled)
+    limiter.consume(4 * MB, cancelled)
+    assert time.monotonic() - started < 1.0
+
+
+def test_jobs_share_the_limit_regardless_of_connections():
+    limiter = BandwidthLimiter(8 * MB)
+    busy, light = limiter.meter("busy"), limiter.meter("light")
+    stop = threading.Event()
+    granted = {"busy": 0, "light": 0}
+    lock = threading.Lock()
+
+    def connection(meter, name):
+        while not stop.is_set():
+            meter.consume(64 * 1024)
+            with lock:
+                granted[name] += 64 * 1024
+
+    threads = [threading.Thread(target=connection, args=(busy, "busy")) for _ in range(6)]
+    threads.append(threading.Thread(target=connection, args=(light, "light")))
+    for thread in threads:
+        thread.start()
+    time.sleep(1.5)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    # Split per connection it would get 1/7; per job it gets about half, less the one bucket of slack
+    assert granted["light"] / (granted["busy"] + granted["light"]) > 0.25
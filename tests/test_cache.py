@@ -0,0 +1,85 @@
+import pytest
+
+from downloader import cache as cache_module
+from downloader.cache import MetadataCache
+
+
+class Clock:
+    def __init__(self, now=1_800_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"), ttl=3600, max_bytes=10_000)
+    yield cache
+    cache.close()
+
+
+def info(video_id, expire=None, padding=0):
+    url = f"https://cdn.example/{video_id}" + (f"?expire={expire}" if expire else "")
+    return {"id": video_id, "title": "x" * padding, "formats": [{"format_id": "18", "url": url}]}
+
+
+def test_hit_within_ttl(cache, clock):
+    cache.put(info("a"))
+    clock.now += 3599
+    assert cache.get("a")["id"] == "a"
+
+
+def test_entry_expires_after_ttl_and_is_deleted(cache, clock):
+    cache.put(info("a"))
+    clock.now += 3601
+    assert cache.get("a") is None
+    clock.now -= 3601  # the expired row was removed, not just hidden
+    assert cache.get("a") is None
+
+
+def test_signed_url_expiry_only_matters_for_downloads(cache, clock):
+    cache.put(info("a", expire=int(clock.now) + MetadataCache.URL_EXPIRY_MARGIN + 60))
+    assert cache.get("a", require_fresh_urls=True) is not None
+    clock.now += 120  # within the margin of the URL's expiry, long before the TTL
+    assert cache.get("a", require_fresh_urls=True) is None
+    assert cache.get("a") is not None
+
+
+def test_unsigned_urls_never_go_stale(cache, clock):
+    cache.put(info("a"))
+    clock.now += 3000
+    assert cache.get("a", require_fresh_urls=True) is not None
+
+
+def test_least_recently_used_entries_are_evicted(cache, clock):
+    for video_id in ("a", "b", "c"):
+        cache.put(info(video_id, padding=3000))
+        clock.now += 1
+    cache.get("a")  # now "b" is the least recently used
+    clock.now += 1
+    cache.put(info("d", padding=3000))
+    assert cache.get("b") is None
+    assert all(cache.get(video_id) is not None for video_id in ("a", "c", "d"))
+
+
+def test_invalidate_and_persistence(tmp_path, clock):
+    path = str(tmp_path / "metadata.sqlite3")
+    first = MetadataCache(path, ttl=3600, max_bytes=10_000)
+    first.put(info("a"))
+    first.put(info("b"))
+    first.invalidate("b")
+    first.close()
+    second = MetadataCache(path, ttl=3600, max_bytes=10_000)
+    try:
+        assert second.get("a") is not None
+        assert second.get("b") is None
+    finally:
+        second.close()
@@ -0,0 +1,92 @@
+import subprocess
+import sys
+
+import pytest
+from yt_dlp.utils import DownloadCancelled
+
+from downloader import cancel
+from downloader.audio import AudioExtractPP
+from downloader.cancel import PartialFiles
+from downloader.segmented import TrackedPopen
+
+
+def touch(path):
+    path.write_bytes(b"x")
+    return path
+
+
+def test_remove_deletes_what_the_job_wrote(tmp_path):
+    files = PartialFiles(("mp3",))
+    stream = tmp_path / "Song.webm"
+    files.add("a", str(stream))
+    written = [touch(stream), touch(tmp_path / "Song.webm.part"), touch(tmp_path / "Song.webm.part.segments.json"),
+               touch(tmp_path / "Song.temp.mp3"), touch(tmp_path / "Song.mp3")]
+
+    assert files.remove() == len(written)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_remove_keeps_outputs_that_were_there_before(tmp_path):
+    files = PartialFiles(("mp3",))
+    earlier = touch(tmp_path / "Song.mp3")  # finished by an earlier run; this one is a re-download
+    files.add("a", str(tmp_path / "Song.webm"))
+    touch(tmp_path / "Song.webm")
+    touch(tmp_path / "Song.temp.mp3")
+    files.add("a", str(tmp_path / "Song.webm"))  # post-processing starts: the mp3 is still the old one
+
+    assert files.remove() == 2
+    assert list(tmp_path.iterdir()) == [earlier]
+
+
+def test_finished_video_is_kept(tmp_path):
+    files = PartialFiles()
+    done = tmp_path / "Done.mp4"
+    files.add("a", str(done))
+    touch(done)
+    files.finished("a")
+
+    assert files.remove() == 0
+    assert done.exists()
+
+
+def test_cancelled_transcode_leaves_earlier_output_alone(tmp_path, monkeypatch):
+    files = PartialFiles(("mp3",))
+    earlier = tmp_path / "Song.mp3"
+    earlier.write_bytes(b"finished mp3 from an earlier run")
+    stream = tmp_path / "Song.webm"
+    files.add("a", str(stream))  # a forced re-download: the stream comes in again
+    touch(stream)
+    files.add("a", str(stream))  # post-processing starts
+
+    written = []
+
+    def run_ffmpeg(path, out_path, codec, opts):
+        written.append(out_path)
+        with open(out_path, "wb") as f:
+            f.write(b"half")  # ffmpeg is terminated mid-transcode
+        raise DownloadCancelled("Download cancelled by user")
+
+    pp = AudioExtractPP(None, "mp3")
+    monkeypatch.setattr(pp, "get_audio_codec", lambda path: "opus")
+    monkeypatch.setattr(pp, "run_ffmpeg", run_ffmpeg)
+    with pytest.raises(DownloadCancelled):
+        pp.run({"filepath": str(stream), "ext": "webm"})
+
+    assert written == [str(tmp_path / "Song.temp.mp3")]
+    files.remove()
+    assert earlier.read_bytes() == b"finished mp3 from an earlier run"
+    assert list(tmp_path.iterdir()) == [earlier]
+
+
+def test_tracked_process_is_forgotten_once_reaped():
+    token = cancel.CancelToken()
+    with cancel.scope(token):
+        TrackedPopen([sys.executable, "-c", "pass"]).wait()
+        TrackedPopen([sys.executable, "-c", "print(1)"], stdout=subprocess.PIPE).communicate()
+        TrackedPopen.run([sys.executable, "-c", "pass"])
+        running = TrackedPopen([sys.executable, "-c", "import time; time.sleep(30)"])
+    assert len(token._stops) == 1
+
+    token.cancel()
+    assert running.wait(timeout=5) is not None
+    assert token._stops == {}
@@ -0,0 +1,159 @@
+import http.client
+import json
+import os
+import stat
+import threading
+
+import pytest
+
+from downloader import daemon
+from downloader.bandwidth import BandwidthLimiter
+from downloader.client import DaemonClient, DaemonError
+from downloader.daemon import DownloadService, create_token, make_server, parse_options, read_token, token_path
+from downloader.jobqueue import MEMORY, JobQueue
+
+TOKEN = "secret-token"
+
+
+@pytest.fixture
+def root(tmp_path):
+    path = tmp_path / "Downloads"
+    path.mkdir()
+    return str(path)
+
+
+@pytest.fixture
+def api(root):
+    """(host:port, job queue) of a daemon whose runner never starts, so queued jobs stay queued."""
+    job_queue = JobQueue(MEMORY)
+    service = DownloadService(None, job_queue, BandwidthLimiter(), root=root)
+    server = make_server(service, TOKEN, port=0)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f"127.0.0.1:{server.server_address[1]}", job_queue
+    server.shutdown()
+    server.server_close()
+    job_queue.close()
+
+
+def call(address, method, path, body=None, **headers):
+    """(status, JSON payload); sends the right token and a JSON body unless told otherwise."""
+    headers = {"Authorization": f"Bearer {TOKEN}", "Content-Type": "application/json",
+               **{name.replace("_", "-"): value for name, value in headers.items()}}
+    connection = http.client.HTTPConnection(address, timeout=5)
+    connection.putrequest(method, path, skip_host="Host" in headers)
+    data = json.dumps(body).encode() if body is not None else b""
+    for name, value in {**headers, "Content-Length": str(len(data))}.items():
+        if value is not None:
+            connection.putheader(name, value)
+    connection.endheaders(data)
+    response = connection.getresponse()
+    try:
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def job(output_dir):
+    return {"url": "https://example.com/watch?v=a", "options": {"output_dir": output_dir}}
+
+
+def test_token_is_required(api):
+    address, _ = api
+    assert call(address, "GET", "/status")[0] == 200
+    assert call(address, "GET", "/status", Authorization=None)[0] == 401
+    assert call(address, "GET", "/status", Authorization="Bearer wrong")[0] == 401
+
+
+def test_browser_requests_are_refused(api):
+    address, job_queue = api
+    assert call(address, "POST", "/jobs", job("music"), Origin="https://evil.example")[0] == 403
+    assert call(address, "POST", "/jobs", job("music"), Origin="null")[0] == 403
+    assert job_queue.jobs() == []
+
+
+@pytest.mark.parametrize("host, status", [("localhost:8765", 200), ("127.0.0.1", 200), ("[::1]:8765", 200),
+                                          ("evil.example:8765", 403), ("192.168.1.5:8765", 403)])
+def test_host_must_be_loopback(api, host, status):
+    address, _ = api
+    assert call(address, "GET", "/status", Host=host)[0] == status
+
+
+def test_post_body_must_be_json(api):
+    address, job_queue = api
+    assert call(address, "POST", "/jobs", job("music"), Content_Type="text/plain")[0] == 415
+    assert call(address, "POST", "/jobs/clear", Content_Type=None)[0] == 415
+    assert job_queue.jobs() == []
+
+
+def test_output_dir_stays_inside_root(api, root, tmp_path):
+    address, _ = api
+    status, queued = call(address, "POST", "/jobs", job("music"))
+    assert status == 201
+    assert queued["options"]["output_dir"] == os.path.join(os.path.realpath(root), "music")
+    assert call(address, "POST", "/jobs", job(str(tmp_path / "elsewhere")))[0] == 400
+    assert call(address, "POST", "/jobs", job("../elsewhere"))[0] == 400
+
+
+def test_client_sends_token_and_json(api):
+    address, job_queue = api
+    client = DaemonClient(f"http://{address}", TOKEN)
+    queued = client.request("POST", "/jobs", job("music"))
+    assert client.request("POST", f"/jobs/{queued['id']}/cancel")["state"] == "cancelled"
+    assert client.request("POST", "/jobs/clear") == {}
+    with pytest.raises(DaemonError) as error:
+        DaemonClient(f"http://{address}").request("GET", "/status")
+    assert error.value.status == 401
+
+
+def test_make_server_requires_a_token():
+    with pytest.raises(ValueError):
+        make_server(None, None, port=0)
+
+
+def test_token_is_saved_for_clients(monkeypatch):
+    monkeypatch.delenv(daemon.TOKEN_ENV, raising=False)
+    assert read_token() is None
+    token = create_token()
+    assert len(token) >= 32
+    assert read_token() == token
+    if os.name == "posix":
+        assert stat.S_IMODE(os.stat(token_path()).st_mode) == 0o600
+    monkeypatch.setenv(daemon.TOKEN_ENV, "from-env")
+    assert read_token() == "from-env"
+
+
+@pytest.mark.parametrize("field, value", [("workers", True), ("connections", 2.0), ("quality", 1080.0),
+                                          ("clip_start", float("nan")), ("clip_end", float("inf")),
+                                          ("deadline", float("inf")), ("deadline", False),
+                                          ("renew_below", float("nan"))])
+def test_options_reject_bools_and_non_finite_numbers(root, field, value):
+    with pytest.raises(ValueError):
+        parse_options({"output_dir": "music", field: value}, root)
+
+
+def test_non_finite_numbers_in_a_request_are_refused(api):
+    address, job_queue = api
+    connection = http.client.HTTPConnection(address, timeout=5)
+    for body in ('{"url": "https://example.com/a", "options": {"output_dir": "music", "clip_start": NaN}}',
+                 '{"url": "https://example.com/a", "options": {"output_dir": "music", "deadline": 1e999}}'):
+        connection.request("POST", "/jobs", body, {"Authorization": f"Bearer {TOKEN}",
+                                                   "Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        assert response.status == 400
+    connection.close()
+    assert job_queue.jobs() == []
+
+
+@pytest.mark.parametrize("body", ['{"rate": NaN}', '{"rate": Infinity}', '{"rate": true}', '{"rate": 0}'])
+def test_bandwidth_rate_must_be_positive_and_finite(api, body):
+    address, _ = api
+    connection = http.client.HTTPConnection(address, timeout=5)
+    connection.request("PUT", "/bandwidth", body, {"Authorization": f"Bearer {TOKEN}",
+                                                   "Content-Type": "application/json"})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    assert response.status == 400
+    assert call(address, "GET", "/bandwidth")[1]["rate"] is None
@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import pytest
+
+from benchmarks.fixtures import synthetic_formats
+from downloader.deadline import SAFETY, DeadlinePlanner, parse_deadline, quality_ladder
+from downloader.formats import FormatIndex
+from downloader.options import DownloadOptions
+
+DURATION = 600
+RATE = 10 * 1_048_576  # bytes/s, the prior throughput
+NOW = 1_800_000_000.0
+
+
+class Clock:
+    def __init__(self, now=NOW):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def info(video_id):
+    return {"id": video_id, "duration": DURATION, "formats": synthetic_formats(DURATION)}
+
+
+SIZES = {height: FormatIndex(synthetic_formats(DURATION), DURATION).estimate(height, "Best")
+         for height in (480, 720, 1080)}
+
+
+def planner_for(budget, videos=3, clock=None):
+    """A 1080p/Best deadline planner whose deadline leaves exactly ``budget`` bytes to plan."""
+    clock = clock or Clock()
+    options = DownloadOptions(output_dir=".", quality=1080, preset="Best",
+                              deadline=NOW + budget / (RATE * SAFETY))
+    planner = DeadlinePlanner(options, prior_rate=RATE, clock=clock)
+    for n in range(videos):
+        planner.add(f"v{n}", info(f"v{n}"))
+    return planner
+
+
+def resolution(choice):
+    return choice[0]
+
+
+def report(planner, video_id, nbytes):
+    planner.stream_hook({"status": "downloading", "downloaded_bytes": nbytes, "tmpfilename": f"{video_id}.part",
+                         "info_dict": {"id": video_id}})
+
+
+def test_ladder_is_resolution_first_up_to_the_ceiling():
+    ladder = quality_ladder(720, "Medium")
+    assert ladder[0] == (480, "Low")
+    assert ladder[-2:] == [(720, "Low"), (720, "Medium")]
+    assert quality_ladder(480, "Low") == [(480, "Low")]
+
+
+@pytest.mark.parametrize("height", [480, 720, 1080])
+def test_every_video_gets_the_highest_rung_that_fits(height):
+    planner = planner_for(3 * SIZES[height] + 1)
+    choices = [planner.choose(f"v{n}") for n in range(3)]
+    assert [resolution(c) for c in choices] == [height] * 3
+    assert all(c[1] == "Best" for c in choices)  # the presets cost the same here, so the top one
+    assert choices[0][2] == FormatIndex(synthetic_formats(DURATION), DURATION).format_selector(height, "Best")
+
+
+def test_slack_lifts_the_earliest_videos():
+    planner = planner_for(3 * SIZES[480] + (SIZES[720] - SIZES[480]) + 1)
+    assert [resolution(planner.choose(f"v{n}")) for n in range(3)] == [720, 480, 480]
+
+
+def test_past_deadline_falls_back_to_the_lowest_rung():
+    clock = Clock()
+    planner = planner_for(3 * SIZES[1080], clock=clock)
+    clock.now = planner.deadline + 60
+    choice = planner.choose("v0")
+    assert choice[:2] == (480, "Low")
+    assert choice[3] == "480p Low"
+
+
+def test_running_videos_count_against_the_budget_until_downloaded():
+    planner = planner_for(SIZES[720] + SIZES[480] + 1, videos=2)
+    assert resolution(planner.choose("v0")) == 720  # lifted; v1 must then take 480
+    assert planner.projection() == pytest.approx(NOW + (SIZES[720] + SIZES[480]) / RATE)
+
+    report(planner, "v0", SIZES[720] / 2)
+    assert planner.projection() == pytest.approx(NOW + (SIZES[720] / 2 + SIZES[480]) / RATE)
+    report(planner, "v0", SIZES[720])
+    # v0 is on disk: all the budget is left for v1
+    assert resolution(planner.choose("v1")) == 720
+
+
+def test_finished_video_frees_its_share():
+    planner = planner_for(SIZES[720] + SIZES[480] + 1, videos=2)
+    planner.choose("v0")
+    planner.finish("v0")
+    assert resolution(planner.choose("v1")) == 720
+
+
+def test_unknown_rate_probes_at_the_lowest_rung():
+    options = DownloadOptions(output_dir=".", quality=1080, preset="Best", deadline=NOW + 3600)
+    planner = DeadlinePlanner(options, prior_rate=None, clock=Clock())
+    planner.add("v0", info("v0"))
+    assert planner.projection() is None
+    assert planner.choose("v0")[:2] == (480, "Low")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("08:00", datetime(2026, 10, 18, 8, 0)),  # later today
+    ("06:30", datetime(2026, 10, 19, 6, 30)),  # already past: tomorrow
+    ("07:00", datetime(2026, 10, 19, 7, 0)),  # right now: tomorrow
+    ("2026-10-20 06:30", datetime(2026, 10, 20, 6, 30)),
+])
+def test_parse_deadline(text, expected):
+    assert parse_deadline(text, now=datetime(2026, 10, 18, 7, 0)) == expected.timestamp()
+
+
+@pytest.mark.parametrize("text", ["", "25:00", "7", "tomorrow", "2026-10-20"])
+def test_parse_deadline_rejects(text):
+    with pytest.raises(ValueError):
+        parse_deadline(text, now=datetime(2026, 10, 18, 7, 0))
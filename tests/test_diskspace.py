@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import namedtuple
+
+import pytest
+
+from downloader import diskspace
+from downloader.diskspace import DiskBudget, InsufficientSpace, JobSpace, Reservation
+
+MB = 1_000_000
+RESERVE = 10 * MB
+Usage = namedtuple("Usage", "total used free")
+
+
+class Disk:
+    """Stands in for ``shutil.disk_usage``: ``free`` bytes on every drive."""
+
+    def __init__(self, free):
+        self.free = free
+
+    def __call__(self, path):
+        return Usage(10 * self.free, 9 * self.free, self.free)
+
+
+@pytest.fixture
+def disk(monkeypatch):
+    disk = Disk(RESERVE + 100 * MB)
+    monkeypatch.setattr(diskspace.shutil, "disk_usage", disk)
+    monkeypatch.setattr(diskspace, "WAIT_POLL", 0.01)
+    return disk
+
+
+@pytest.fixture
+def budget(disk):
+    return DiskBudget(RESERVE)
+
+
+def acquire_in_thread(budget, path, streams, output, acquired, **kwargs):
+    def run():
+        acquired.append((streams + output, budget.acquire(path, streams, output, **kwargs)))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_fitting_video_is_admitted_at_once(budget, tmp_path):
+    reservation = budget.acquire(str(tmp_path), 30 * MB, 30 * MB)
+    assert reservation.outstanding == 60 * MB
+    assert budget.check(str(tmp_path), 40 * MB)
+    assert not budget.check(str(tmp_path), 41 * MB)  # fits once the first video is done
+
+
+def test_output_folder_may_not_exist_yet(budget, tmp_path):
+    assert budget.acquire(str(tmp_path / "new" / "folder"), MB, MB) is not None
+
+
+def test_video_that_never_fits_is_refused(budget, tmp_path):
+    budget.acquire(str(tmp_path), 30 * MB, 30 * MB)
+    with pytest.raises(InsufficientSpace) as error:
+        budget.acquire(str(tmp_path), 40 * MB, 40 * MB)  # even with the first one's streams gone: 70 MB
+    assert error.value.needed == 80 * MB
+    assert error.value.available == 70 * MB
+    assert str(tmp_path) in str(error.value)
+
+
+def test_waits_for_others_then_first_come_first_served(budget, tmp_path):
+    path = str(tmp_path)
+    first = budget.acquire(path, 30 * MB, 30 * MB)
+    acquired, waits = [], []
+    big = acquire_in_thread(budget, path, 30 * MB, 30 * MB, acquired, on_wait=waits.append)
+    wait_for(lambda: waits == [True])
+    small = acquire_in_thread(budget, path, 5 * MB, 5 * MB, acquired)  # would fit now, but queues behind
+    time.sleep(0.1)
+    assert acquired == []
+
+    budget.release(first)
+    big.join(5)
+    small.join(5)
+    assert [need for need, _ in acquired] == [60 * MB, 10 * MB]
+    assert waits == [True, False]
+
+
+def test_cancel_while_waiting(budget, tmp_path):
+    budget.acquire(str(tmp_path), 30 * MB, 30 * MB)
+    cancel_event = threading.Event()
+    acquired, waits = [], []
+    thread = acquire_in_thread(budget, str(tmp_path), 30 * MB, 30 * MB, acquired, cancel_event=cancel_event,
+                               on_wait=waits.append)
+    wait_for(lambda: waits == [True])
+    cancel_event.set()
+    thread.join(5)
+    assert acquired == [(60 * MB, None)]
+    assert waits == [True, False]
+
+
+def test_space_freed_by_other_programs_admits_a_waiting_video(budget, disk, tmp_path):
+    budget.acquire(str(tmp_path), 30 * MB, 30 * MB)
+    acquired = []
+    thread = acquire_in_thread(budget, str(tmp_path), 30 * MB, 30 * MB, acquired)
+    time.sleep(0.05)
+    disk.free += 50 * MB
+    thread.join(5)
+    assert acquired and acquired[0][1] is not None
+
+
+def test_progress_events_reconcile_the_reservation(budget, tmp_path):
+    space = JobSpace(budget, str(tmp_path))
+    assert space.reserve("a", 30 * MB, 30 * MB)
+    reservation = space._reservations["a"]
+
+    def event(filename, nbytes, status="downloading"):
+        space.stream_hook({"status": status, "downloaded_bytes": nbytes, "filename": filename,
+                           "info_dict": {"id": "a"}})
+
+    event("a.f137.mp4", 20 * MB)
+    assert reservation.outstanding == 40 * MB
+    assert reservation.returned_at_most == 20 * MB - 30 * MB  # the output is still to come
+    event("a.f140.m4a", 10 * MB, "finished")
+    assert reservation.returned_at_most == 30 * MB
+    space.stream_hook({"status": "downloading", "downloaded_bytes": MB, "filename": "b.mp4",
+                       "info_dict": {"id": "b"}})  # not this job's video
+    assert reservation.written == 30 * MB
+
+    space.close()
+    assert budget.check(str(tmp_path), 100 * MB)
+
+
+def test_low_estimate_is_scaled_up_by_the_actual_bytes():
+    reservation = Reservation(0, 10 * MB, 10 * MB)
+    reservation.stream_progress("a.mp4", 15 * MB)
+    assert (reservation.streams, reservation.output) == (15 * MB, 15 * MB)
+    assert reservation.outstanding == 15 * MB
@@ -0,0 +1,123 @@
+import pytest
+
+from benchmarks.fixtures import synthetic_formats
+from downloader.formats import FormatIndex
+from downloader.presets import ALL_RESOLUTIONS, BITRATE_MAP
+
+
+def baseline_bitrate(fmt):
+    vbr = fmt.get("vbr")
+    if vbr:
+        return vbr
+    tbr = fmt.get("tbr") or 0
+    abr = fmt.get("abr") or 0
+    return tbr - abr if tbr > abr else 0
+
+
+def baseline_size(fmt, duration, bitrate_key):
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if size:
+        return size
+    br = baseline_bitrate(fmt) if bitrate_key == "vbr" else fmt.get("abr") or 0
+    return br * 1000 / 8 * duration
+
+
+def baseline_estimate(formats, duration, resolution, preset):
+    """The GUI's original per-selection scan: (video format dict, estimated bytes), or (None, 0)."""
+    video_only = [f for f in formats
+                  if f.get("vcodec", "none") != "none" and f.get("acodec", "none") == "none"
+                  and f.get("height") is not None and f["height"] <= resolution]
+    preferred_video = [f for f in video_only if "avc1" in (f.get("vcodec") or "")] or video_only
+    if not preferred_video:
+        return None, 0
+
+    def by_height_and_bitrate(f):
+        return f.get("height", 0), baseline_bitrate(f)
+
+    if preset == "Best":
+        video_stream = max(preferred_video, key=by_height_and_bitrate)
+    else:
+        target_kbps = int(BITRATE_MAP[preset][resolution] * 1000)
+        capped = [f for f in preferred_video if 0 < baseline_bitrate(f) <= target_kbps]
+        if capped:
+            video_stream = max(capped, key=by_height_and_bitrate)
+        else:
+            pool = [f for f in preferred_video if f.get("height") == resolution] or preferred_video
+            video_stream = min(pool, key=lambda f: baseline_bitrate(f) or float("inf"))
+
+    audio_only = [f for f in formats if f.get("acodec", "none") != "none" and f.get("vcodec", "none") == "none"]
+    preferred_audio = [f for f in audio_only if "mp4a" in (f.get("acodec") or "")] or audio_only
+    audio_size = 0
+    if preferred_audio:
+        audio_size = baseline_size(max(preferred_audio, key=lambda f: f.get("abr") or 0), duration, "abr")
+    return video_stream, baseline_size(video_stream, duration, "vbr") + audio_size
+
+
+def video(format_id, height, vcodec="avc1.4d401f", **fields):
+    return {"format_id": format_id, "vcodec": vcodec, "acodec": "none", "height": height, **fields}
+
+
+def audio(format_id, acodec, abr, **fields):
+    return {"format_id": format_id, "vcodec": "none", "acodec": acodec, "abr": abr, **fields}
+
+
+# Streams the synthetic ladder never produces: nothing under the caps, no H.264, bitrate
+# ties, and streams with a size but no bitrate at all
+HAND_BUILT = [
+    # Every H.264 stream is over every cap, so non-Best presets fall back to the lowest bitrate
+    [video("a", 720, tbr=20000), video("b", 720, vbr=16000), video("c", 480, vbr=16000),
+     audio("m", "mp4a.40.2", 128)],
+    # No H.264 at all; audio only in Opus
+    [video("v1", 480, "vp9", vbr=900), video("v2", 1080, "vp9", vbr=3000), video("v3", 1440, "vp9", tbr=9000),
+     audio("o1", "opus", 70, filesize=4_000_000), audio("o2", "opus", 160)],
+    # Identical (height, bitrate) pairs and bitrate-less streams
+    [video("t1", 720, vbr=1000, filesize=1), video("t2", 720, vbr=1000, filesize=2),
+     video("z1", 1080, filesize=3), video("z2", 1080, filesize_approx=4),
+     video("t3", 480, tbr=1000, filesize=5), audio("m1", "mp4a.40.2", 128), audio("m2", "mp4a.40.5", 128)],
+    # Muxed and storyboard entries only count for audio-less/video-less matching
+    [{"format_id": "18", "vcodec": "avc1.42001E", "acodec": "mp4a.40.2", "height": 360, "tbr": 600},
+     {"format_id": "sb0", "vcodec": "none", "acodec": "none", "height": 27},
+     video("137", 1080, vbr=4000, filesize_approx=300_000_000)],
+]
+
+CASES = ([pytest.param(synthetic_formats(600, languages, seed), 600, id=f"synthetic-{languages}-{seed}")
+          for languages, seed in [(1, 0), (1, 1), (1, 2), (3, 7), (1, 42)]]
+         + [pytest.param(synthetic_formats(5400, seed=3), 5400, id="synthetic-long")]
+         + [pytest.param(formats, 300, id=f"hand-built-{n}") for n, formats in enumerate(HAND_BUILT)])
+
+
+@pytest.mark.parametrize("formats, duration", CASES)
+def test_index_matches_baseline_estimate(formats, duration):
+    index = FormatIndex(formats, duration)
+    for resolution in ALL_RESOLUTIONS:
+        for preset in BITRATE_MAP:
+            expected_stream, expected_size = baseline_estimate(formats, duration, resolution, preset)
+            stream = index.video_stream(resolution, preset)
+            assert (stream and stream.format_id) == (expected_stream and expected_stream["format_id"]), \
+                (resolution, preset)
+            assert index.estimate(resolution, preset) == pytest.approx(expected_size), (resolution, preset)
+
+
+def test_bitrate_cap_steps_down_to_a_lower_frame_rate():
+    # Keeps the comparison above honest: with this seed the 60 fps streams are over the Low caps
+    index = FormatIndex(synthetic_formats(600, seed=1), 600)
+    assert index.video_stream(720, "Low").format_id == "avc1-720p30"
+    assert index.video_stream(1080, "Low").format_id == "avc1-1080p30"
+    assert index.video_stream(1080, "Best").format_id == "avc1-1080p60"
+
+
+def test_format_selector_names_the_estimated_streams():
+    formats = synthetic_formats(600)
+    index = FormatIndex(formats, 600)
+    audio_fmt = max((f for f in formats if f["vcodec"] == "none" and "mp4a" in f["acodec"]), key=lambda f: f["abr"])
+    for resolution in ALL_RESOLUTIONS:
+        for preset in BITRATE_MAP:
+            video_fmt, _ = baseline_estimate(formats, 600, resolution, preset)
+            assert index.format_selector(resolution, preset) == f"{video_fmt['format_id']}+{audio_fmt['format_id']}"
+
+
+def test_index_without_duration_or_video_estimates_nothing():
+    assert FormatIndex(synthetic_formats(600), 0).estimate(1080, "Best") == 0
+    index = FormatIndex([audio("m", "mp4a.40.2", 128)], 300)
+    assert (index.video_stream(720, "High"), index.estimate(720, "High"), index.format_selector(720, "High")) == \
+        (None, 0, None)
@@ -0,0 +1,197 @@
+import threading
+
+import pytest
+from yt_dlp.utils import DownloadCancelled
+
+from downloader import jobqueue as jobqueue_module
+from downloader.jobqueue import (BACKOFF_BASE, BACKOFF_CAP, CANCELLED, DONE, FAILED, MEMORY, PENDING, RUNNING,
+                                 JobQueue, QueueRunner, backoff_delay)
+from downloader.options import DownloadOptions
+
+
+class Clock:
+    def __init__(self, now=1_800_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(jobqueue_module.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(clock):
+    queue = JobQueue(MEMORY, max_attempts=3)
+    yield queue
+    queue.close()
+
+
+def options():
+    return DownloadOptions(output_dir="/downloads", mode="Audio", audio_format="opus")
+
+
+@pytest.mark.parametrize("attempt, full", [(1, BACKOFF_BASE), (2, 2 * BACKOFF_BASE), (3, 4 * BACKOFF_BASE),
+                                           (20, BACKOFF_CAP)])
+def test_backoff_delay_doubles_up_to_cap_with_jitter(monkeypatch, attempt, full):
+    monkeypatch.setattr(jobqueue_module.random, "uniform", lambda a, b: a)
+    assert backoff_delay(attempt) == full / 2
+    monkeypatch.setattr(jobqueue_module.random, "uniform", lambda a, b: b)
+    assert backoff_delay(attempt) == full
+
+
+def test_backoff_delay_stays_in_upper_half():
+    for attempt in range(1, 10):
+        full = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1))
+        assert all(full / 2 <= backoff_delay(attempt) <= full for _ in range(50))
+
+
+def test_failed_job_backs_off_before_running_again(queue, clock, monkeypatch):
+    monkeypatch.setattr(jobqueue_module.random, "uniform", lambda a, b: b)
+    job = queue.add("https://example.com/a", options())
+    assert queue.claim().state == RUNNING
+
+    job = queue.fail(job.id, "HTTP Error 503")
+    assert (job.state, job.attempts, job.last_error) == (PENDING, 1, "HTTP Error 503")
+    assert job.next_attempt_at == clock.now + BACKOFF_BASE
+    assert queue.next_due() == job.next_attempt_at
+    assert queue.claim() is None
+
+    clock.now += BACKOFF_BASE
+    assert queue.claim().id == job.id
+    job = queue.fail(job.id, "HTTP Error 503")
+    assert job.next_attempt_at == clock.now + 2 * BACKOFF_BASE
+
+
+def test_backing_off_job_does_not_block_later_ones(queue, clock):
+    first = queue.add("https://example.com/a", options())
+    second = queue.add("https://example.com/b", options())
+    queue.claim()
+    queue.fail(first.id, "timed out")
+
+    assert queue.claim().id == second.id
+    assert queue.claim() is None
+
+
+def test_gives_up_after_max_attempts(queue, clock):
+    job = queue.add("https://example.com/a", options())
+    for _ in range(queue.max_attempts):
+        clock.now += BACKOFF_CAP
+        assert queue.claim().id == job.id
+        job = queue.fail(job.id, "gone")
+    assert (job.state, job.attempts) == (FAILED, queue.max_attempts)
+    clock.now += BACKOFF_CAP
+    assert queue.claim() is None
+    assert queue.next_due() is None
+
+
+def test_retry_starts_over_with_fresh_attempts(queue, clock):
+    job = queue.add("https://example.com/a", options())
+    queue.claim()
+    queue.fail(job.id, "timed out")
+
+    job = queue.retry(job.id)
+    assert (job.state, job.attempts, job.next_attempt_at) == (PENDING, 0, clock.now)
+    assert queue.claim().id == job.id
+
+
+def test_release_does_not_count_the_attempt(queue):
+    job = queue.add("https://example.com/a", options())
+    queue.claim()
+    job = queue.release(job.id)
+    assert (job.state, job.attempts, job.next_attempt_at) == (PENDING, 0, 0.0)
+
+
+def test_cancelled_job_is_not_claimed(queue):
+    job = queue.add("https://example.com/a", options())
+    assert queue.cancel(job.id).state == CANCELLED
+    assert queue.claim() is None
+
+
+def test_jobs_survive_reopen_and_running_ones_run_again(tmp_path, clock):
+    path = str(tmp_path / "queue.sqlite3")
+    queue = JobQueue(path)
+    running = queue.add("https://example.com/a", options())
+    done = queue.add("https://example.com/b", options())
+    queue.claim()
+    queue.claim()
+    queue.complete(done.id, "1 downloaded", title="B")
+    queue.close()
+
+    queue = JobQueue(path)
+    try:
+        assert queue.get(running.id).state == PENDING
+        assert queue.get(running.id).options == options()
+        assert (queue.get(done.id).state, queue.get(done.id).title) == (DONE, "B")
+        assert queue.claim().id == running.id
+    finally:
+        queue.close()
+
+
+class WaitingEngine:
+    """Runs a job until its token is cancelled, then fails like a cancelled download."""
+
+    def download(self, url, options, token, channel):
+        if not token.wait(5):
+            raise AssertionError("the job was never cancelled")
+        raise DownloadCancelled("Download cancelled by user")
+
+
+class CancelOnClaim(JobQueue):
+    """A queue whose jobs a client cancels the moment they are marked running."""
+
+    runner = None
+    cancelled = None
+
+    def claim(self):
+        job = super().claim()
+        if job is not None:
+            thread = threading.Thread(target=lambda: setattr(self, "cancelled", self.runner.cancel(job.id)))
+            thread.start()
+            thread.join(0.2)  # before the runner has a token for it, unless it holds the cancel off
+        return job
+
+
+def run_one(queue, engine):
+    """Run a QueueRunner until its first job finishes; returns (runner, the job on_finish was given)."""
+    finished = []
+    done = threading.Event()
+    runner = QueueRunner(queue, engine, on_finish=lambda job, result: (finished.append(job), done.set()))
+    queue.runner = runner
+    runner.start()
+    try:
+        assert done.wait(10)
+    finally:
+        runner.stop(timeout=5)
+    return runner, finished[0]
+
+
+def test_cancel_right_after_claim_is_not_lost():
+    queue = CancelOnClaim(MEMORY)
+    job = queue.add("https://example.com/a", options())
+
+    runner, finished = run_one(queue, WaitingEngine())
+    assert queue.cancelled.id == job.id
+    assert finished.state == CANCELLED
+    assert queue.get(job.id).state == CANCELLED
+    queue.close()
+
+
+def test_job_deleted_while_running_still_finishes():
+    queue = JobQueue(MEMORY)
+    job = queue.add("https://example.com/a", options())
+
+    class DeletingEngine:
+        def download(self, url, options, token, channel):
+            with queue._conn:
+                queue._conn.execute("DELETE FROM jobs")
+            raise RuntimeError("disk full")
+
+    runner, finished = run_one(queue, DeletingEngine())
+    assert (finished.id, finished.state) == (job.id, CANCELLED)
+    assert runner.running() == []
+    queue.close()
@@ -0,0 +1,108 @@
+import os
+import shutil
+
+import pytest
+
+from downloader import audio as audio_module
+from downloader import library as library_module
+from downloader.audio import AudioExtractPP
+from downloader.engine import DownloadEngine
+from downloader.library import COPY, DERIVED, LINK, MediaLibrary, link_or_copy
+from downloader.options import DownloadOptions
+
+SIZE = 256 * 1024
+
+
+@pytest.fixture
+def library(tmp_path):
+    library = MediaLibrary(str(tmp_path / "library.sqlite3"))
+    yield library
+    library.close()
+
+
+@pytest.fixture
+def engine(library):
+    engine = DownloadEngine(library=library)
+    yield engine
+    engine.close()
+
+
+@pytest.fixture
+def video(server, add_video):
+    return add_video("v0", SIZE)
+
+
+def test_link_or_copy_links_when_it_can(tmp_path):
+    source = tmp_path / "a.mp4"
+    source.write_bytes(b"video")
+    target = tmp_path / "out" / "a.mp4"
+    target.parent.mkdir()
+    target.write_bytes(b"an older file of that name")
+
+    assert link_or_copy(str(source), str(target)) == LINK
+    assert os.path.samefile(source, target)
+    assert link_or_copy(str(source), str(target)) == LINK  # already the same file
+
+
+def test_link_or_copy_falls_back_to_a_copy(tmp_path, monkeypatch):
+    def no_links(source, target):
+        raise OSError(18, "Invalid cross-device link")
+
+    monkeypatch.setattr(library_module.os, "link", no_links)
+    source = tmp_path / "a.mp4"
+    source.write_bytes(b"video")
+    target = tmp_path / "out" / "a.mp4"
+    target.parent.mkdir()
+
+    assert link_or_copy(str(source), str(target)) == COPY
+    assert target.read_bytes() == b"video"
+    assert not os.path.samefile(source, target)
+    assert os.listdir(target.parent) == ["a.mp4"]  # no scratch file left behind
+
+
+def test_second_folder_is_linked_from_the_library(tmp_path, server, engine, library, video):
+    first = engine.download(video, DownloadOptions(str(tmp_path / "one"), quality=720))
+    assert first.reused == []
+    requests = server.requests
+
+    second = engine.download(video, DownloadOptions(str(tmp_path / "two"), quality=720))
+    assert second.reused == [LINK]
+    assert server.requests - requests == 1  # the metadata; no media
+    assert os.path.samefile(tmp_path / "one" / "Video v0.mp4", tmp_path / "two" / "Video v0.mp4")
+
+
+def test_stale_entry_is_dropped_and_the_video_downloaded_again(tmp_path, server, engine, library, video):
+    engine.download(video, DownloadOptions(str(tmp_path / "one"), quality=720))
+    os.remove(tmp_path / "one" / "Video v0.mp4")
+    requests = server.requests
+
+    result = engine.download(video, DownloadOptions(str(tmp_path / "two"), quality=720))
+    assert result.reused == []
+    assert server.requests - requests > 1  # the media came from the server
+    target = tmp_path / "two" / "Video v0.mp4"
+    assert target.stat().st_size == SIZE
+    assert library.lookup("v0", "prog-720", "video") == str(target)
+
+
+def test_audio_is_derived_from_a_library_video(tmp_path, server, engine, library, video, monkeypatch):
+    converted = []
+
+    def run_ffmpeg(self, path, out_path, codec, opts):
+        converted.append((os.path.basename(path), codec))
+        shutil.copyfile(path, out_path)  # stands in for the stream copy
+
+    monkeypatch.setattr(AudioExtractPP, "get_audio_codec", lambda self, path: "aac")
+    monkeypatch.setattr(AudioExtractPP, "run_ffmpeg", run_ffmpeg)
+    engine.download(video, DownloadOptions(str(tmp_path / "video"), quality=720))
+    source = tmp_path / "video" / "Video v0.mp4"
+    requests = server.requests
+
+    result = engine.download(video, DownloadOptions(str(tmp_path / "audio"), mode="Audio", audio_format="m4a"))
+    assert result.reused == [DERIVED]
+    assert result.audio_conversions[0][0] == audio_module.COPY
+    assert converted == [("source.mp4", "copy")]
+    assert server.requests - requests == 1  # the metadata; no media
+    assert (tmp_path / "audio" / "Video v0.m4a").read_bytes() == source.read_bytes()
+    assert source.stat().st_size == SIZE  # the library's file is not the one extraction consumed
+    assert os.listdir(tmp_path / "audio") == ["Video v0.m4a"]  # the scratch folder is gone
+    assert library.lookup("v0", "prog-720", "audio:m4a") == str(tmp_path / "audio" / "Video v0.m4a")
@@ -0,0 +1,92 @@
+import filecmp
+import os
+
+import pytest
+
+from benchmarks.fixtures import write_random_file
+from benchmarks.server import FakeMediaServer
+from downloader.engine import DownloadEngine
+from downloader.options import DownloadOptions
+from downloader.renewal import SUSTAIN, WINDOW, StallDetector
+
+MB = 1024 * 1024
+SIZE = 10 * MB
+RATE = 2 * MB  # per connection, until a URL is throttled
+THROTTLE_AFTER = 8 * MB  # bytes a URL serves at RATE; the rest comes at 64 KiB/s per connection
+MARGIN = 3.0  # seconds: a throttled stream only reports progress once per read (1 s here)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def feed(detector, clock, rate, seconds, downloaded=0):
+    """Update ``detector`` every 0.25 s for ``seconds`` at ``rate`` bytes/s; returns (bytes, throttled)."""
+    throttled = False
+    for _ in range(int(seconds * 4)):
+        clock.now += 0.25
+        downloaded += rate / 4
+        throttled = detector.update(downloaded)
+    return downloaded, throttled
+
+
+def test_detector_trips_after_sustained_drop():
+    clock = Clock()
+    detector = StallDetector(0.2, clock)
+    detector.update(0)
+    downloaded, throttled = feed(detector, clock, MB, 10)
+    assert not throttled and detector.baseline == pytest.approx(MB)
+
+    downloaded, throttled = feed(detector, clock, 64 * 1024, WINDOW)
+    assert not throttled  # the drop is still inside the window
+    _, throttled = feed(detector, clock, 64 * 1024, SUSTAIN, downloaded)
+    assert throttled
+
+
+def test_detector_ignores_a_slow_link():
+    clock = Clock()
+    detector = StallDetector(0.2, clock)
+    detector.update(0)
+    downloaded, _ = feed(detector, clock, 48 * 1024, 5)
+    _, throttled = feed(detector, clock, 4 * 1024, 20, downloaded)
+    assert not throttled  # below MIN_BASELINE a drop can't be told from noise
+
+
+@pytest.fixture
+def throttling_server(media_dir):
+    from benchmarks import extractor
+
+    extractor.register()
+    write_random_file(os.path.join(media_dir, "stream.bin"), SIZE, seed=3)
+    with FakeMediaServer(media_dir, throttle=RATE, throttle_after=THROTTLE_AFTER) as server:
+        server.add_video("stream", "Throttled stream", 600, [
+            {"format_id": "prog-720", "path": "stream.bin", "ext": "mp4", "vcodec": "avc1.64001F",
+             "acodec": "mp4a.40.2", "height": 720, "width": 1280, "filesize": SIZE}])
+        yield server
+
+
+@pytest.mark.parametrize("connections", [1, 4])
+def test_throttled_url_is_renewed_promptly(tmp_path, media_dir, throttling_server, connections):
+    out_dir = tmp_path / "out"
+    engine = DownloadEngine()
+    try:
+        result = engine.download(f"{throttling_server.base_url}/watch/stream",
+                                 DownloadOptions(str(out_dir), connections=connections))
+    finally:
+        engine.close()
+
+    [stream] = result.record["items"][0]["streams"]
+    [renewal] = stream["renewals"]
+    assert renewal["error"] is None
+    assert renewal["offset"] >= THROTTLE_AFTER
+    # Each connection fetches its own segment at RATE until the URL has served THROTTLE_AFTER
+    fast = THROTTLE_AFTER / (RATE * min(connections, -(-SIZE // (4 * MB))))
+    assert renewal["at"] <= fast + WINDOW + SUSTAIN + MARGIN
+    assert renewal["baseline"] > RATE / 2  # the first burst counts toward it
+    assert throttling_server.signatures == 2
+    [output] = out_dir.iterdir()
+    assert filecmp.cmp(output, os.path.join(media_dir, "stream.bin"), shallow=False)
@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.fixtures import write_random_file
+from benchmarks.server import FakeMediaServer
+from downloader.segmented import STATE_SUFFIX, SegmentedDownload, SegmentState, urllib_range_opener
+
+SIZE = 4 * 1024 * 1024
+SEGMENT = 256 * 1024  # 16 segments
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def slow_server(media_dir):
+    write_random_file(os.path.join(media_dir, "file.bin"), SIZE)
+    with FakeMediaServer(media_dir, throttle=1024 * 1024) as server:  # per connection
+        yield server
+
+
+def recording_opener(url, requested):
+    open_range = urllib_range_opener(url)
+
+    def opener(start, end):
+        requested.append((start, end))
+        return open_range(start, end)
+    return opener
+
+
+def interrupt_halfway(url, target):
+    """Run a download until about half of it is on disk; returns the segments recorded as done."""
+    def report(downloaded, total):
+        if downloaded >= total // 2:
+            raise Interrupted
+
+    download = SegmentedDownload(urllib_range_opener(url), target, connections=2, segment_size=SEGMENT)
+    with pytest.raises(Interrupted):
+        download.run(on_progress=report)
+    with open(target + STATE_SUFFIX, encoding="utf-8") as f:
+        return set(json.load(f)["done"])
+
+
+def test_resume_fetches_only_missing_segments(tmp_path, media_dir, slow_server):
+    url = f"{slow_server.base_url}/media/file.bin"
+    target = str(tmp_path / "file.bin.part")
+    done = interrupt_halfway(url, target)
+    assert 0 < len(done) < SIZE // SEGMENT
+    assert os.path.getsize(target) == SIZE  # preallocated
+
+    requested = []
+    download = SegmentedDownload(recording_opener(url, requested), target, connections=2, segment_size=SEGMENT)
+    download.prepare()
+    assert download.resumed_bytes == len(done) * SEGMENT
+    download.run()
+
+    probe, *fetched = requested
+    assert probe == (0, 0)
+    missing = {i * SEGMENT for i in range(SIZE // SEGMENT) if i not in done}
+    assert sorted(start for start, _ in fetched) == sorted(missing)
+    with open(target, "rb") as f, open(os.path.join(media_dir, "file.bin"), "rb") as source:
+        assert f.read() == source.read()
+    assert not os.path.exists(target + STATE_SUFFIX)
+
+
+def test_state_for_a_changed_file_is_discarded(tmp_path, media_dir, slow_server):
+    url = f"{slow_server.base_url}/media/file.bin"
+    target = str(tmp_path / "file.bin.part")
+    interrupt_halfway(url, target)
+    source = os.path.join(media_dir, "file.bin")
+    write_random_file(source, SIZE, seed=1)  # same size, new content
+    os.utime(source, (1, 1))  # and a different ETag, which the server derives from size and mtime
+
+    requested = []
+    download = SegmentedDownload(recording_opener(url, requested), target, connections=2, segment_size=SEGMENT)
+    download.prepare()
+    assert download.resumed_bytes == 0
+    download.run()
+    assert len(requested) - 1 == SIZE // SEGMENT  # every segment again
+    with open(target, "rb") as f, open(source, "rb") as expected:
+        assert f.read() == expected.read()
+
+
+def test_state_load_checks_size_and_validator(tmp_path):
+    path = str(tmp_path / "x.part") + STATE_SUFFIX
+    SegmentState(path, SIZE, SEGMENT, '"abc"', done=[0, 3]).save()
+    assert SegmentState.load(path, SIZE, '"abc"').done == {0, 3}
+    assert SegmentState.load(path, SIZE, None).done == {0, 3}  # the server stopped sending a validator
+    assert SegmentState.load(path, SIZE + 1, '"abc"') is None
+    assert SegmentState.load(path, SIZE, '"def"') is None
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"size": 4')  # torn
+    assert SegmentState.load(path, SIZE, '"abc"') is None
@@ -0,0 +1,36 @@
+import pytest
+
+from downloader.options import DownloadOptions
+from downloader.timerange import clip_share, validate_range
+
+
+@pytest.mark.parametrize("start, end, is_clip", [(None, None, False), (0, None, True), (None, 90, True),
+                                                 (0.0, 90, True)])
+def test_is_clip_counts_a_start_of_zero(start, end, is_clip):
+    options = DownloadOptions(output_dir=".", clip_start=start, clip_end=end)
+    assert options.is_clip is is_clip
+    assert (options.clip_label is not None) is is_clip
+
+
+def test_clip_label_from_zero():
+    assert DownloadOptions(output_dir=".", clip_start=0).clip_label == "0m00s-end"
+    assert DownloadOptions(output_dir=".", clip_end=90).clip_label == "0m00s-1m30s"
+
+
+@pytest.mark.parametrize("start, end", [(None, 0), (None, 0.0), (0, 0), (30, 30), (30, 10)])
+def test_empty_range_is_rejected(start, end):
+    with pytest.raises(ValueError):
+        validate_range(start, end)
+
+
+def test_range_starting_after_the_video_is_rejected():
+    validate_range(0, None, duration=60)
+    with pytest.raises(ValueError):
+        validate_range(60, None, duration=60)
+
+
+def test_clip_share():
+    assert clip_share(None, None, 100) == 1.0
+    assert clip_share(0, None, 100) == 1.0
+    assert clip_share(None, 25, 100) == 0.25
+    assert clip_share(50, 200, 100) == 0.5